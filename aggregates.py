@@ -0,0 +1,390 @@
+"""Per-day dashboard aggregates, kept warm across restarts.
+
+For every day with sales the store keeps what get_filtered_stats needs:
+
+    days["YYYY-MM-DD"] = {"ventas", "lineas", "cantidad",
+                          "horas": [24 counts],
+                          "platos": {dish: [lines, quantity, subtotal]},
+                          "pagos": {method: lines},
+                          "clientes": {key: [spend, lines, last fecha, spelling]}}
+
+and expense_days["YYYY-MM-DD"] = [total, count] for get_financials (money
+in cents). The store events move one day's cells per line, and a
+dashboard range bisects a sorted list of days and merges them instead of
+building a DataFrame and parsing every date in it. The dish cells also
+feed the recipes panel (`dish_sales`).
+
+On shutdown (or `flush()`) the cells are written to agregados.json with a
+data-version stamp: the signature of both workbooks and a fingerprint
+of the records in memory (count, last id, money total). On the next
+start the file is reused only if the stamp still matches the loaded
+data; a crash, a failed save or a workbook edited elsewhere changes it
+and the cells are rebuilt from the records.
+"""
+import bisect
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+import events
+from atomic import replace_file
+from catalog import file_signature
+from charts import weekday_hour_counts, weekday_hour_grid
+from customers import ANONYMOUS, normalize_name
+from daterange import day_key, records_between
+from managers import change, empty_stats, stats_deltas
+
+FORMAT = 2
+
+
+def _day(fecha):
+    return str(fecha)[:10]
+
+
+def _hour(fecha):
+    text = str(fecha)[11:13]
+    return int(text) if text.isdigit() else 0
+
+
+def _new_day():
+    return {"ventas": 0, "lineas": 0, "cantidad": 0, "horas": [0] * 24, "platos": {}, "pagos": {}, "clientes": {}}
+
+
+def _bump(counts, key, n):
+    counts[key] = counts.get(key, 0) + n
+    if counts[key] <= 0:
+        del counts[key]
+
+
+def _bounds(start_date, end_date):
+    return day_key(start_date), day_key(end_date)
+
+
+def _fingerprint(records, money_key):
+    return [len(records), max((r['id'] for r in records), default=0), int(sum(r[money_key] for r in records))]
+
+
+class DashboardAggregates:
+    def __init__(self, path="agregados.json"):
+        self.path = path
+        self.days = {}
+        self.expense_days = {}
+        # Sorted keys of days / expense_days, for bisecting a range
+        self._day_index = []
+        self._expense_index = []
+        # True when the cells were read from disk instead of rebuilt
+        self.warm = False
+        self._dirty = False
+        self._lock = threading.RLock()
+        self._managers = None
+
+    def attach(self, manager, cost_manager):
+        self._managers = (manager, cost_manager)
+        self.warm = self._load()
+        if not self.warm:
+            self.rebuild()
+        manager.bus.add_listener(self.on_event)
+        if cost_manager.bus is not manager.bus:
+            cost_manager.bus.add_listener(self.on_event)
+        return self
+
+    # --- persistence ---
+
+    def stamp(self):
+        """Data version the cells describe: workbook signatures plus record fingerprints."""
+        manager, cost_manager = self._managers
+        return {
+            "pedidos": list(file_signature(manager.filename) or []),
+            "gastos": list(file_signature(cost_manager.filename) or []),
+            "registros": _fingerprint(manager.orders, 'subtotal') + _fingerprint(cost_manager.expenses, 'total'),
+        }
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error cargando agregados: {e}")
+            return False
+        if data.get("formato") != FORMAT or data.get("version") != self.stamp():
+            return False
+        with self._lock:
+            self._swap(data["pedidos"], data["gastos"])
+            self._dirty = False
+        return True
+
+    def flush(self):
+        """Write the cells and their data version (on shutdown, or whenever asked)."""
+        if self._managers is None:
+            return
+        with self._lock:
+            if not self._dirty and os.path.exists(self.path):
+                return
+            data = {"formato": FORMAT, "version": self.stamp(), "pedidos": self.days, "gastos": self.expense_days}
+
+            def write(tmp):
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            try:
+                replace_file(self.path, write)
+                self._dirty = False
+            except OSError as e:
+                print(f"Error guardando agregados: {e}")
+
+    # --- building ---
+
+    def rebuild(self):
+        """Recompute every cell from both stores."""
+        manager, cost_manager = self._managers
+        days = {}
+        df = pd.DataFrame(manager.snapshot(), columns=['fecha', 'cliente', 'plato', 'cantidad', 'subtotal', 'metodo_pago'])
+        if not df.empty:
+            # Oldest first, so the last row of a client group carries its latest spelling
+            df = df.iloc[::-1]
+            fecha = df['fecha'].astype(str)
+            codes, spellings = pd.factorize(df['cliente'].fillna("").astype(str))
+            df = df.assign(fecha=fecha, dia=fecha.str[:10],
+                           hora=pd.to_numeric(fecha.str[11:13], errors='coerce').fillna(0).astype(int),
+                           clave=pd.Index([normalize_name(s) for s in spellings])[codes],
+                           metodo_pago=df['metodo_pago'].astype(str))
+            by_day = df.groupby('dia').agg(v=('subtotal', 'sum'), n=('subtotal', 'size'), q=('cantidad', 'sum'))
+            for day, v, n, q in zip(by_day.index, by_day['v'].tolist(), by_day['n'].tolist(), by_day['q'].tolist()):
+                cell = days[day] = _new_day()
+                cell["ventas"], cell["lineas"], cell["cantidad"] = int(v), int(n), int(q)
+            for (day, hour), n in df.groupby(['dia', 'hora']).size().items():
+                days[day]["horas"][hour] = int(n)
+            by_dish = df.groupby(['dia', 'plato']).agg(n=('subtotal', 'size'), q=('cantidad', 'sum'), v=('subtotal', 'sum'))
+            for (day, plato), n, q, v in zip(by_dish.index, by_dish['n'].tolist(), by_dish['q'].tolist(),
+                                             by_dish['v'].tolist()):
+                days[day]["platos"][plato] = [int(n), int(q), int(v)]
+            for (day, metodo), n in df.groupby(['dia', 'metodo_pago']).size().items():
+                days[day]["pagos"][metodo] = int(n)
+            clients = df.groupby(['dia', 'clave'], sort=False).agg(s=('subtotal', 'sum'), n=('subtotal', 'size'),
+                                                                   f=('fecha', 'last'), c=('cliente', 'last'))
+            for (day, key), s, n, f, c in zip(clients.index, clients['s'].tolist(), clients['n'].tolist(),
+                                              clients['f'].tolist(), clients['c'].tolist()):
+                days[day]["clientes"][key] = [int(s), int(n), f, str(c)]
+
+        expense_days = {}
+        ex = pd.DataFrame(cost_manager.expenses, columns=['fecha', 'total'])
+        if not ex.empty:
+            grouped = ex.groupby(ex['fecha'].astype(str).str[:10])['total'].agg(['sum', 'size'])
+            for day, total, n in zip(grouped.index, grouped['sum'].tolist(), grouped['size'].tolist()):
+                expense_days[day] = [int(total), int(n)]
+
+        with self._lock:
+            self._swap(days, expense_days)
+            self._dirty = True
+
+    def _swap(self, days, expense_days):
+        self.days, self.expense_days = days, expense_days
+        self._day_index, self._expense_index = sorted(days), sorted(expense_days)
+
+    def add_order(self, o, sign=1):
+        """Count (sign=1) or uncount (sign=-1) one order line."""
+        fecha = str(o['fecha'])
+        day = _day(fecha)
+        with self._lock:
+            cell = self.days.get(day)
+            if cell is None:
+                if sign < 0:
+                    return
+                cell = self.days[day] = _new_day()
+                bisect.insort(self._day_index, day)
+            cell["ventas"] += sign * o['subtotal']
+            cell["lineas"] += sign
+            cell["cantidad"] += sign * o['cantidad']
+            cell["horas"][_hour(fecha)] += sign
+            dish = cell["platos"].setdefault(o['plato'], [0, 0, 0])
+            dish[0] += sign
+            dish[1] += sign * o['cantidad']
+            dish[2] += sign * o['subtotal']
+            if dish[0] <= 0:
+                del cell["platos"][o['plato']]
+            _bump(cell["pagos"], str(o.get('metodo_pago', 'Efectivo')), sign)
+            key = normalize_name(o['cliente'])
+            client = cell["clientes"].setdefault(key, [0, 0, "", str(o['cliente'])])
+            client[0] += sign * o['subtotal']
+            client[1] += sign
+            if sign > 0 and fecha >= client[2]:
+                client[2], client[3] = fecha, str(o['cliente'])
+            if client[1] <= 0:
+                del cell["clientes"][key]
+            elif sign < 0 and fecha == client[2]:
+                # The client's latest line of the day is gone: read the new one from the store
+                client[2], client[3] = self._last_visit(day, key)
+            if cell["lineas"] <= 0:
+                del self.days[day]
+                del self._day_index[bisect.bisect_left(self._day_index, day)]
+            self._dirty = True
+
+    def _last_visit(self, day, key):
+        when = datetime.strptime(day, "%Y-%m-%d")
+        best = ("", "")
+        for o in records_between(self._managers[0].orders, when, when):
+            fecha = str(o['fecha'])
+            if fecha > best[0] and normalize_name(o['cliente']) == key:
+                best = (fecha, str(o['cliente']))
+        return list(best)
+
+    def add_expense(self, e, sign=1):
+        day = _day(e['fecha'])
+        with self._lock:
+            cell = self.expense_days.get(day)
+            if cell is None:
+                cell = self.expense_days[day] = [0, 0]
+                bisect.insort(self._expense_index, day)
+            cell[0] += sign * e['total']
+            cell[1] += sign
+            if cell[1] <= 0:
+                del self.expense_days[day]
+                del self._expense_index[bisect.bisect_left(self._expense_index, day)]
+            self._dirty = True
+
+    def on_event(self, event):
+        t, d = event.topic, event.data
+        if t == events.ORDER_ADDED:
+            for o in d['orders']:
+                self.add_order(o)
+        elif t == events.ORDER_DELETED:
+            self.add_order(d['order'], -1)
+        elif t == events.DATE_CHANGED:
+            self.add_order(d['previous'], -1)
+            self.add_order(d['order'])
+        elif t == events.EXPENSE_ADDED:
+            for e in d['expenses']:
+                self.add_expense(e)
+        elif t == events.EXPENSE_DELETED:
+            self.add_expense(d['expense'], -1)
+        elif t == events.EXPENSE_DATE_CHANGED:
+            self.add_expense(d['previous'], -1)
+            self.add_expense(d['expense'])
+        elif t == events.RESYNC:
+            self.rebuild()
+
+    # --- queries ---
+
+    @staticmethod
+    def _span(index, lo, hi):
+        return index[bisect.bisect_left(index, lo):bisect.bisect_right(index, hi)]
+
+    def _period(self, lo, hi):
+        with self._lock:
+            span = self._span(self._day_index, lo, hi)
+            cells = [self.days[day] for day in span]
+            if not cells:
+                return empty_stats()
+            total_sales = sum(c["ventas"] for c in cells)
+            lines = sum(c["lineas"] for c in cells)
+            qty = sum(c["cantidad"] for c in cells)
+            dishes, payments, clients = {}, {}, {}
+            hours = [0] * 24
+            for c in cells:
+                for name, (n, _, _) in c["platos"].items():
+                    dishes[name] = dishes.get(name, 0) + n
+                for method, n in c["pagos"].items():
+                    payments[method] = payments.get(method, 0) + n
+                for h, n in enumerate(c["horas"]):
+                    hours[h] += n
+                for key, (spend, _, fecha, spelling) in c["clientes"].items():
+                    merged = clients.get(key)
+                    if merged is None:
+                        clients[key] = [spend, fecha, spelling]
+                    else:
+                        merged[0] += spend
+                        if fecha >= merged[1]:
+                            merged[1], merged[2] = fecha, spelling
+            daily = {datetime.strptime(day, "%Y-%m-%d").date(): c["ventas"] for day, c in zip(span, cells)}
+
+        # Same order as period_stats: most sold first, ties by name
+        dish_counts = sorted(dishes.items(), key=lambda kv: (-kv[1], kv[0]))
+        total_items = sum(dishes.values())
+        # Biggest spend first, ties by the most recent visit
+        ranked = sorted(((k, v) for k, v in clients.items() if k not in ANONYMOUS), key=lambda kv: kv[1][1], reverse=True)
+        ranked.sort(key=lambda kv: kv[1][0], reverse=True)
+        total_spend = sum(v[0] for _, v in ranked)
+        return {
+            "total_sales": total_sales,
+            "ticket_average": total_sales / lines,
+            "order_count": lines,
+            "top_3_dishes": [{"name": name, "pct": (n / total_items) * 100} for name, n in dish_counts[:3]],
+            "bottom_3_dishes": [{"name": name, "pct": (n / total_items) * 100} for name, n in dish_counts[-3:]],
+            "top_3_clients": [{"name": " ".join(v[2].split()), "pct": (v[0] / total_spend) * 100 if total_spend else 0,
+                               "total": v[0]} for _, v in ranked[:3]],
+            "dish_mix": {name: (n / total_items) * 100 for name, n in dish_counts},
+            "avg_price_per_dish": total_sales / qty if qty > 0 else 0,
+            "payment_methods": dict(sorted(payments.items())),
+            "daily_sales_trend": daily,
+            "rush_hour": {h: hours[h] for h in range(24)},
+        }
+
+    def stats(self, start_date=None, end_date=None, compare=None):
+        """get_filtered_stats from the day cells (same keys, same defaults)."""
+        if not self._managers[0].orders:
+            return None
+        if not (start_date and end_date):
+            start_date = end_date = datetime.now()
+        stats = self._period(*_bounds(start_date, end_date))
+        if compare:
+            previous = self._period(*_bounds(*compare))
+            stats['comparison'] = previous
+            stats['deltas'] = stats_deltas(stats, previous)
+        return stats
+
+    def heatmap(self, start_date=None, end_date=None):
+        """7x24 order lines by weekday and hour from the day cells (whole history without a range)."""
+        lo, hi = _bounds(start_date, end_date) if start_date and end_date else ("", "\uffff")
+        with self._lock:
+            span = self._span(self._day_index, lo, hi)
+            hourly = [self.days[day]["horas"] for day in span]
+        return weekday_hour_grid(span, hourly)
+
+    def dish_sales(self, start_date=None, end_date=None):
+        """{dish: [quantity, subtotal]} for a range (today without one), from the day cells."""
+        if not (start_date and end_date):
+            start_date = end_date = datetime.now()
+        lo, hi = _bounds(start_date, end_date)
+        sold = {}
+        with self._lock:
+            for day in self._span(self._day_index, lo, hi):
+                for name, (_, q, v) in self.days[day]["platos"].items():
+                    cell = sold.setdefault(name, [0, 0])
+                    cell[0] += q
+                    cell[1] += v
+        return sold
+
+    def financials(self, start_date=None, end_date=None, compare=None):
+        """get_financials from the day cells."""
+        periods = [(start_date, end_date)] + ([compare] if compare else [])
+        totals = [0] * len(periods)
+        dailies = [{} for _ in periods]
+        with self._lock:
+            for p, (s, e) in enumerate(periods):
+                if not (s and e):
+                    continue
+                for day in self._span(self._expense_index, *_bounds(s, e)):
+                    total = self.expense_days[day][0]
+                    dailies[p][datetime.strptime(day, "%Y-%m-%d").date()] = total
+                    totals[p] += total
+        if not compare:
+            return totals[0], dailies[0]
+        return totals[0], dailies[0], {"total": totals[1], "daily": dailies[1], **change(totals[0], totals[1])}
+
+
+def demand_heatmap(manager, start_date=None, end_date=None, plato=None):
+    """7x24 order lines by weekday (Monday first) and hour, optionally for one dish.
+
+    Served from the day cells when the aggregates are attached; a dish (or
+    a bare manager) takes one bincount over the range's order stamps.
+    """
+    if plato is None and manager.aggregates is not None:
+        return manager.aggregates.heatmap(start_date, end_date)
+    orders = manager.snapshot()
+    if start_date and end_date:
+        orders = records_between(orders, start_date, end_date)
+    return weekday_hour_counts([o['fecha'] for o in orders if plato is None or o['plato'] == plato])
@@ -0,0 +1,30 @@
+"""Atomic file replacement for the workbooks, catalogs and caches.
+
+A save writes a temp file with a unique name next to the target and swaps
+it in with os.replace: readers never see a half-written file, and two
+processes saving the same file at once never move each other's temp file
+away. The new file keeps the target's permissions (0644 when it is new)
+rather than mkstemp's private 0600.
+"""
+import os
+import stat
+import tempfile
+
+
+def replace_file(path, write):
+    """Call write(tmp) with a fresh path in `path`'s directory, then move it over `path`."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                               prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
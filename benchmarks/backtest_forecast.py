@@ -0,0 +1,133 @@
+"""Walk-forward backtest of forecast.DemandForecast on synthetic orders.
+
+    python benchmarks/backtest_forecast.py
+    python benchmarks/backtest_forecast.py --filas 200000 --vida-media 14 --dias-prueba 56
+
+The profiles are built from every day before the test window. Then, day
+by day, tomorrow is predicted and compared with what was actually sold,
+and that day's orders are fed in one by one as store events would. The
+error is reported as WMAPE (sum |error| / sum actual) for tickets per
+hour and portions per dish, next to two baselines: the same weekday one
+week earlier and the plain average of all past days with no weekday
+profile.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forecast import DemandForecast, DEFAULT_HALF_LIFE_DAYS  # noqa: E402
+from synthetic import generate_orders, load_catalog  # noqa: E402
+
+# Quiet start of the week, busy weekend (Monday = 0)
+WEEKDAY_WEIGHTS = [0.6, 0.8, 0.9, 1.0, 1.2, 1.7, 1.8]
+
+
+def day_actuals(orders, dishes):
+    tickets = np.zeros(24)
+    portions = np.zeros(len(dishes))
+    col = {d: i for i, d in enumerate(dishes)}
+    for o in orders:
+        if o.get('ticket_id', o['id']) == o['id']:
+            tickets[int(o['fecha'][11:13])] += 1
+        portions[col[o['plato']]] += o['cantidad']
+    return tickets, portions
+
+
+def as_arrays(pred, dishes):
+    return np.array(pred["tickets_por_hora"]), np.array([pred["platos"].get(d, 0.0) for d in dishes])
+
+
+def wmape(errors, actuals):
+    total = sum(actuals)
+    return sum(errors) / total if total else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100_000, help="Pedidos sintéticos")
+    parser.add_argument("--por-dia", type=int, default=200, help="Pedidos por día en promedio")
+    parser.add_argument("--dias-prueba", type=int, default=28, help="Días evaluados al final")
+    parser.add_argument("--vida-media", type=float, default=DEFAULT_HALF_LIFE_DAYS, help="Vida media en días")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--salida", help="Guardar el resultado en JSON")
+    args = parser.parse_args(argv)
+
+    menu = load_catalog("menu.json")
+    dishes = list(menu)
+    orders = generate_orders(args.filas, menu, seed=args.seed, orders_per_day=args.por_dia,
+                             weekday_weights=WEEKDAY_WEIGHTS)
+    by_day = defaultdict(list)
+    for o in reversed(orders):
+        by_day[o['fecha'][:10]].append(o)
+    days = sorted(by_day)
+    if len(days) <= args.dias_prueba + 7:
+        parser.error("Muy pocos días para la ventana de prueba; suba --filas o baje --dias-prueba")
+    train_days, test_days = days[:-args.dias_prueba], days[-args.dias_prueba:]
+
+    model = DemandForecast(args.vida_media)
+    t0 = time.perf_counter()
+    model.rebuild([o for d in train_days for o in by_day[d]])
+    rebuild_s = time.perf_counter() - t0
+
+    history = {d: day_actuals(by_day[d], dishes) for d in days}
+    errors = {name: {"tickets": [], "platos": []} for name in ("modelo", "semana_anterior", "promedio")}
+    actual_totals = {"tickets": [], "platos": []}
+    predict_ms, add_us = [], []
+    seen = list(train_days)
+
+    for d in test_days:
+        t0 = time.perf_counter()
+        pred = model.predict(d)
+        predict_ms.append((time.perf_counter() - t0) * 1000)
+        actual_t, actual_p = history[d]
+        week_before = date.fromordinal(date.fromisoformat(d).toordinal() - 7).isoformat()
+        candidates = {
+            "modelo": as_arrays(pred, dishes),
+            "semana_anterior": history.get(week_before, (np.zeros(24), np.zeros(len(dishes)))),
+            "promedio": (np.mean([history[s][0] for s in seen], axis=0),
+                         np.mean([history[s][1] for s in seen], axis=0)),
+        }
+        for name, (pt, pp) in candidates.items():
+            errors[name]["tickets"].append(float(np.abs(pt - actual_t).sum()))
+            errors[name]["platos"].append(float(np.abs(pp - actual_p).sum()))
+        actual_totals["tickets"].append(float(actual_t.sum()))
+        actual_totals["platos"].append(float(actual_p.sum()))
+
+        # The day happens: its orders arrive as order_added events would
+        t0 = time.perf_counter()
+        for o in by_day[d]:
+            model.add(o)
+        add_us.append((time.perf_counter() - t0) / len(by_day[d]) * 1e6)
+        seen.append(d)
+
+    result = {
+        "filas": args.filas,
+        "dias_entrenamiento": len(train_days),
+        "dias_prueba": len(test_days),
+        "vida_media_dias": args.vida_media,
+        "rebuild_s": round(rebuild_s, 3),
+        "predict_ms_p50": round(statistics.median(predict_ms), 3),
+        "add_us_por_pedido": round(statistics.median(add_us), 2),
+        "wmape": {
+            name: {k: round(wmape(v, actual_totals[k]), 4) for k, v in errs.items()}
+            for name, errs in errors.items()
+        },
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
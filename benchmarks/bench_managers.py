@@ -0,0 +1,155 @@
+"""Benchmark OrderManager / CostManager as history grows.
+
+    python benchmarks/bench_managers.py                       # 10k, 100k, 1M
+    python benchmarks/bench_managers.py --sizes 10000 --repeats 5
+    python benchmarks/bench_managers.py --comparar base.json nuevo.json
+
+Each operation is timed `repeats` times with perf_counter, then run once
+more under tracemalloc for its peak memory. Results are written as JSON so
+runs from different versions can be diffed with --comparar.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from managers import OrderManager, CostManager, comparison_period  # noqa: E402
+from reports import generate_closing_pdf  # noqa: E402
+from synthetic import ROOT, generate_orders, generate_expenses  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def measure(op, rows, fn, repeats):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "op": op,
+        "rows": rows,
+        "repeats": repeats,
+        "mean_s": statistics.fmean(times),
+        "min_s": min(times),
+        "max_s": max(times),
+        "peak_mem_bytes": peak,
+    }
+    print(f"{op:<28} {rows:>9} filas  {result['mean_s'] * 1000:>10.1f} ms  {peak / 1e6:>8.1f} MB", flush=True)
+    return result
+
+
+def run_size(n, repeats, seed, workdir):
+    for name in ("menu.json", "costos.json"):
+        shutil.copy(os.path.join(ROOT, name), os.path.join(workdir, name))
+
+    manager = OrderManager(
+        filename=os.path.join(workdir, "pedidos.xlsx"),
+        menu_file=os.path.join(workdir, "menu.json"),
+    )
+    cost_manager = CostManager(
+        filename=os.path.join(workdir, "gastos.xlsx"),
+        dict_file=os.path.join(workdir, "costos.json"),
+    )
+    manager.replace_orders(generate_orders(n, manager.menu, seed=seed))
+    cost_manager.replace_expenses(generate_expenses(n, cost_manager.cost_dict, seed=seed))
+
+    last = datetime.strptime(manager.orders[0]['fecha'][:10], "%Y-%m-%d")
+    first = datetime.strptime(manager.orders[-1]['fecha'][:10], "%Y-%m-%d")
+    month_start = last - timedelta(days=30)
+    dish = next(iter(manager.menu))
+    dishes = (list(manager.menu) * 5)[:5]
+    target_id = manager.orders[len(manager.orders) // 2]['id']
+
+    results = [
+        measure("save_orders", n, manager.save_orders, repeats),
+        measure("load_orders", n, manager.load_orders, repeats),
+        measure("save_expenses", n, cost_manager.save_expenses, repeats),
+        measure("load_expenses", n, cost_manager.load_expenses, repeats),
+        measure("add_order", n, lambda: manager.add_order("Cliente Bench", dish, 1, "Efectivo"), repeats),
+        measure("add_ticket[5]", n, lambda: manager.add_ticket("Mesa Bench", [(d, 1) for d in dishes], "Efectivo"), repeats),
+        measure("toggle_status", n, lambda: manager.toggle_status(target_id, 'entregado'), repeats),
+        measure("get_filtered_stats[30d]", n, lambda: manager.get_filtered_stats(month_start, last), repeats),
+        measure("get_filtered_stats[all]", n, lambda: manager.get_filtered_stats(first, last), repeats),
+        measure("get_filtered_stats[30d+prev]", n, lambda: manager.get_filtered_stats(
+            month_start, last, compare=comparison_period(month_start, last, "periodo")), repeats),
+        measure("get_financials[30d]", n, lambda: cost_manager.get_financials(month_start, last), repeats),
+        measure("get_financials[all]", n, lambda: cost_manager.get_financials(first, last), repeats),
+        measure("generate_closing_pdf[30d]", n, lambda: generate_closing_pdf(
+            manager, cost_manager, month_start, last, os.path.join(workdir, "cierre.pdf")), repeats),
+    ]
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(base_path, new_path):
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = {(r['op'], r['rows']): r for r in json.load(f)['results']}
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = {(r['op'], r['rows']): r for r in json.load(f)['results']}
+
+    print(f"{'operación':<28} {'filas':>9} {'base ms':>10} {'nuevo ms':>10} {'x':>7} {'mem x':>7}")
+    for key in sorted(base.keys() & new.keys(), key=lambda k: (k[1], k[0])):
+        b, n = base[key], new[key]
+        speed = n['mean_s'] / b['mean_s'] if b['mean_s'] else float('nan')
+        mem = n['peak_mem_bytes'] / b['peak_mem_bytes'] if b['peak_mem_bytes'] else float('nan')
+        print(f"{key[0]:<28} {key[1]:>9} {b['mean_s'] * 1000:>10.1f} {n['mean_s'] * 1000:>10.1f} {speed:>7.2f} {mem:>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--salida", default=os.path.join(ROOT, "benchmarks", "results.json"))
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"))
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        compare(*args.comparar)
+        return 0
+
+    results = []
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            results.extend(run_size(n, args.repeats, args.seed, workdir))
+
+    payload = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    print(f"Resultados: {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""Concurrent multi-cashier load simulator.
+
+    python benchmarks/loadtest.py --cajeros 3 --cocina 1 --duracion 30
+    python benchmarks/loadtest.py --modo terminales      # one manager per client, as today
+
+Cashier clients issue add_order, toggle_status('pagado'), delete_order and
+dashboard queries; kitchen clients mark orders delivered and watch the
+queue. Every client runs on its own thread at a fixed rate. In
+"compartido" mode all clients share one OrderManager/CostManager (server
+mode); in "terminales" mode each client owns its own managers over the
+same workbook, which is how separate app instances behave.
+
+At the end the workbook is reloaded from disk and checked for lost
+orders, resurrected deletes, lost deliveries and duplicated ids.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instrumentation import Histogram  # noqa: E402
+from managers import OrderManager, CostManager  # noqa: E402
+from synthetic import ROOT, generate_orders  # noqa: E402
+
+CASHIER_MIX = [("add_order", 0.6), ("toggle_pagado", 0.2), ("delete_order", 0.05), ("dashboard", 0.15)]
+KITCHEN_MIX = [("toggle_entregado", 0.8), ("dashboard", 0.2)]
+
+
+class Contention:
+    """Counts overlapping writes to the same workbook."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.saves = 0
+        self.overlapping = 0
+        self.max_in_flight = 0
+        self.errors = Counter()
+
+    def wrap(self, mgr):
+        original = mgr.save_orders
+
+        def save_orders():
+            with self.lock:
+                self.in_flight += 1
+                self.saves += 1
+                if self.in_flight > 1:
+                    self.overlapping += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                err = original()
+                if err:
+                    with self.lock:
+                        self.errors["save_error"] += 1
+                return err
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+
+        mgr.save_orders = save_orders
+
+
+class Ledger:
+    """What the clients believe happened, to audit against the file."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.added = set()
+        self.deleted = set()
+        self.delivered = set()
+        self.errors = Counter()
+        self.latency = {}
+        self.ops = 0
+
+    def record(self, op, seconds):
+        with self.lock:
+            hist = self.latency.get(op)
+            if hist is None:
+                hist = self.latency[op] = Histogram(op)
+            self.ops += 1
+        hist.record(seconds)
+
+
+def pick(rng, mix):
+    r = rng.random()
+    acc = 0.0
+    for op, w in mix:
+        acc += w
+        if r < acc:
+            return op
+    return mix[-1][0]
+
+
+def find_order(mgr, cliente):
+    for o in mgr.orders:
+        if o['cliente'] == cliente:
+            return o
+    return None
+
+
+def client_loop(idx, role, mgr, cost_mgr, ledger, args, stop_at, n_kitchen, kitchen_idx):
+    rng = random.Random(args.seed * 1000 + idx)
+    dishes = list(mgr.menu)
+    mine = []
+    seq = 0
+    interval = 1.0 / args.tasa
+    next_at = time.perf_counter()
+    dash_end = datetime.now()
+    dash_start = dash_end - timedelta(days=7)
+
+    while time.perf_counter() < stop_at:
+        op = pick(rng, CASHIER_MIX if role == "cajero" else KITCHEN_MIX)
+        t0 = time.perf_counter()
+        try:
+            if op == "add_order":
+                seq += 1
+                marker = f"sim{idx}-{seq}"
+                err = mgr.add_order(marker, rng.choice(dishes), rng.randint(1, 3),
+                                    rng.choice(["Efectivo", "Yape", "Plin"]))
+                if err:
+                    with ledger.lock:
+                        ledger.errors["add_order"] += 1
+                else:
+                    mine.append(marker)
+                    with ledger.lock:
+                        ledger.added.add(marker)
+            elif op == "toggle_pagado" and mine:
+                o = find_order(mgr, rng.choice(mine))
+                if o:
+                    mgr.toggle_status(o['id'], 'pagado')
+            elif op == "delete_order" and mine:
+                marker = mine.pop(rng.randrange(len(mine)))
+                o = find_order(mgr, marker)
+                if o:
+                    mgr.delete_order(o['id'])
+                    with ledger.lock:
+                        ledger.deleted.add(marker)
+            elif op == "toggle_entregado":
+                # Each kitchen screen owns a slice of the tickets so two never flip the same one
+                for o in list(mgr.orders):
+                    c = o['cliente']
+                    if (not o['entregado'] and c.startswith("sim")
+                            and hash(c) % n_kitchen == kitchen_idx and c not in ledger.deleted):
+                        mgr.toggle_status(o['id'], 'entregado')
+                        with ledger.lock:
+                            ledger.delivered.add(c)
+                        break
+            elif op == "dashboard":
+                mgr.get_filtered_stats(dash_start, dash_end)
+                cost_mgr.get_financials(dash_start, dash_end)
+        except Exception as ex:
+            with ledger.lock:
+                ledger.errors[f"{op}:{type(ex).__name__}"] += 1
+        ledger.record(op, time.perf_counter() - t0)
+
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_at = time.perf_counter()
+
+
+def audit(workdir, ledger):
+    final = OrderManager(
+        filename=os.path.join(workdir, "pedidos.xlsx"),
+        menu_file=os.path.join(workdir, "menu.json"),
+    )
+    by_client = {o['cliente']: o for o in final.orders}
+    ids = Counter(o['id'] for o in final.orders)
+    expected = ledger.added - ledger.deleted
+    return {
+        "orders_in_file": len(final.orders),
+        "lost_orders": len([m for m in expected if m not in by_client]),
+        "resurrected_deletes": len([m for m in ledger.deleted if m in by_client]),
+        "lost_deliveries": len([m for m in ledger.delivered - ledger.deleted
+                                if m in by_client and not by_client[m]['entregado']]),
+        "duplicate_ids": sum(c - 1 for c in ids.values() if c > 1),
+    }
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in ("menu.json", "costos.json"):
+            shutil.copy(os.path.join(ROOT, name), os.path.join(workdir, name))
+
+        def new_managers():
+            mgr = OrderManager(filename=os.path.join(workdir, "pedidos.xlsx"),
+                               menu_file=os.path.join(workdir, "menu.json"))
+            cost_mgr = CostManager(filename=os.path.join(workdir, "gastos.xlsx"),
+                                   dict_file=os.path.join(workdir, "costos.json"))
+            return mgr, cost_mgr
+
+        seed_mgr, _ = new_managers()
+        seed_mgr.replace_orders(generate_orders(args.filas_iniciales, seed_mgr.menu, seed=args.seed))
+        seed_mgr.save_orders()
+
+        contention = Contention()
+        ledger = Ledger()
+        roles = ["cajero"] * args.cajeros + ["cocina"] * args.cocina
+        if args.modo == "compartido":
+            shared = new_managers()
+            contention.wrap(shared[0])
+            clients = [shared] * len(roles)
+        else:
+            clients = []
+            for _ in roles:
+                pair = new_managers()
+                contention.wrap(pair[0])
+                clients.append(pair)
+
+        t_start = time.perf_counter()
+        stop_at = t_start + args.duracion
+        threads = []
+        kitchen_idx = 0
+        for idx, (role, (mgr, cost_mgr)) in enumerate(zip(roles, clients)):
+            k = kitchen_idx if role == "cocina" else 0
+            if role == "cocina":
+                kitchen_idx += 1
+            t = threading.Thread(target=client_loop, name=f"{role}-{idx}",
+                                 args=(idx, role, mgr, cost_mgr, ledger, args, stop_at, max(1, args.cocina), k))
+            threads.append(t)
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t_start
+
+        result = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "mode": args.modo,
+            "cashiers": args.cajeros,
+            "kitchen": args.cocina,
+            "rate_per_client": args.tasa,
+            "duration_s": elapsed,
+            "initial_rows": args.filas_iniciales,
+            "ops": ledger.ops,
+            "throughput_ops_s": ledger.ops / elapsed if elapsed else 0,
+            "latency": {},
+            "errors": dict(ledger.errors + contention.errors),
+            "contention": {
+                "saves": contention.saves,
+                "overlapping_saves": contention.overlapping,
+                "max_concurrent_saves": contention.max_in_flight,
+            },
+        }
+        for op, hist in sorted(ledger.latency.items()):
+            snap = hist.snapshot()
+            result["latency"][op] = {
+                "n": snap.count,
+                "p50_ms": snap.percentile(50) * 1000,
+                "p95_ms": snap.percentile(95) * 1000,
+                "p99_ms": snap.percentile(99) * 1000,
+                "max_ms": snap.max * 1000,
+            }
+        result["audit"] = audit(workdir, ledger)
+        return result
+
+
+def print_report(r):
+    print(f"Modo: {r['mode']}  clientes: {r['cashiers']} cajeros + {r['kitchen']} cocina  "
+          f"tasa: {r['rate_per_client']}/s por cliente  duración: {r['duration_s']:.1f}s")
+    print(f"Operaciones: {r['ops']}  throughput: {r['throughput_ops_s']:.1f} ops/s")
+    print(f"{'operación':<18} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for op, l in r['latency'].items():
+        print(f"{op:<18} {l['n']:>6} {l['p50_ms']:>9.1f} {l['p95_ms']:>9.1f} {l['p99_ms']:>9.1f} {l['max_ms']:>9.1f}")
+    c = r['contention']
+    print(f"Escrituras: {c['saves']}  solapadas: {c['overlapping_saves']}  máx. simultáneas: {c['max_concurrent_saves']}")
+    a = r['audit']
+    print(f"Auditoría: pedidos perdidos {a['lost_orders']}, borrados resucitados {a['resurrected_deletes']}, "
+          f"entregas perdidas {a['lost_deliveries']}, ids duplicados {a['duplicate_ids']}")
+    if r['errors']:
+        print(f"Errores: {r['errors']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cajeros", type=int, default=3)
+    parser.add_argument("--cocina", type=int, default=1)
+    parser.add_argument("--tasa", type=float, default=1.0, help="Operaciones por segundo por cliente")
+    parser.add_argument("--duracion", type=float, default=20.0, help="Segundos")
+    parser.add_argument("--filas-iniciales", type=int, default=2000)
+    parser.add_argument("--modo", choices=["compartido", "terminales"], default="compartido")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--salida", help="Guardar el resultado en JSON")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    print_report(result)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
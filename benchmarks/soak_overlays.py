@@ -0,0 +1,224 @@
+"""Long-session soak of the app's overlay controls.
+
+    python benchmarks/soak_overlays.py
+    python benchmarks/soak_overlays.py --clics 5000 --cada 500 --salida soak.json
+
+Builds the real UI (main() of the app) on a page stand-in that keeps
+overlays the way Flet does: `page.overlay` holds what was appended and
+`page.open()` parks every opened control in an offstage list that is
+never emptied. Then it clicks through a service day's worth of the
+paths that open overlays: editing an order date, editing an expense
+date, the missing-client and empty-ticket snackbars and the diagnostics
+dialog.
+
+Every --cada clicks it records the overlay and offstage sizes, the
+controls reachable from the page (what every page.update() walks to
+build its diff), the time of that walk and the traced Python memory.
+With the overlay pool these stay flat; a growing column is a leak.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import flet as ft
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import ROOT  # noqa: E402
+
+DATA_FILES = ("menu.json", "costos.json", "recetas.json", "pedidos_cevicheria.xlsx", "gastos.xlsx")
+
+
+class Window:
+    pass
+
+
+class SoakPage:
+    """Just enough of ft.Page for main(), with Flet's overlay bookkeeping."""
+
+    def __init__(self):
+        self.window = Window()
+        self.session_id = "soak"
+        self.controls = []
+        self.overlay = []
+        self.offstage = []
+        self.updates = 0
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+
+    def update(self, *controls):
+        self.updates += 1
+
+    def open(self, control):
+        control.open = True
+        if control not in self.offstage:
+            self.offstage.append(control)
+
+    def close(self, control):
+        control.open = False
+
+    def run_task(self, *args, **kwargs):
+        pass
+
+    def run_thread(self, handler, *args):
+        handler(*args)
+
+
+class Event:
+    def __init__(self, control=None, **fields):
+        self.control = control
+        self.data = None
+        self.__dict__.update(fields)
+
+
+def walk(controls):
+    seen = 0
+    stack = list(controls)
+    while stack:
+        c = stack.pop()
+        seen += 1
+        stack.extend(c._get_children())
+    return seen
+
+
+def find(root, predicate):
+    stack = [root]
+    while stack:
+        c = stack.pop()
+        if predicate(c):
+            yield c
+        stack.extend(c._get_children())
+
+
+def date_button(root):
+    # Order and expense rows show their date as a TextButton
+    for c in find(root, lambda c: isinstance(c, ft.TextButton)):
+        if isinstance(c.text, str) and c.text[:2] == "20" and c.text[4:5] == "-":
+            return c
+    return None
+
+
+def open_dialog(page):
+    for c in reversed(page.offstage):
+        if isinstance(c, ft.AlertDialog) and c.open:
+            return c
+    return None
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location("app", os.path.join(ROOT, "cevicheria YAFRANK.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(args):
+    app = load_app()
+    page = SoakPage()
+    app.main(page)
+    root = page.controls[0]
+    rail = next(find(root, lambda c: isinstance(c, ft.NavigationRail)))
+    content_area = root.controls[1]
+    client_input = next(find(root, lambda c: isinstance(c, ft.TextField) and c.label == "Nombre Cliente"))
+    commit_btn = next(find(root, lambda c: isinstance(c, ft.ElevatedButton) and c.text == "Registrar Ticket"))
+
+    def go(index):
+        rail.selected_index = index
+        rail.on_change(Event(rail))
+
+    def edit_date(view_index):
+        go(view_index)
+        btn = date_button(content_area.content)
+        if btn is None:
+            return
+        btn.on_click(Event(btn))
+        dlg = open_dialog(page)
+        if dlg is not None:
+            # Open the picker from the dialog, then dismiss without saving
+            for b in find(dlg.content, lambda c: isinstance(c, ft.ElevatedButton)):
+                b.on_click(Event(b))
+            page.close(dlg)
+
+    def snackbars():
+        go(0)
+        client_input.value = ""
+        commit_btn.on_click(Event(commit_btn))
+        client_input.value = "Soak"
+        commit_btn.on_click(Event(commit_btn))
+        client_input.value = ""
+
+    def diagnostics():
+        page.on_keyboard_event(Event(ctrl=True, shift=True, key="D"))
+        dlg = open_dialog(page)
+        if dlg is not None:
+            page.close(dlg)
+
+    actions = [lambda: edit_date(0), lambda: edit_date(1), snackbars, diagnostics]
+
+    tracemalloc.start()
+    rows = []
+    t0 = time.perf_counter()
+    for i in range(args.clics + 1):
+        if i % args.cada == 0:
+            roots = page.controls + page.overlay + page.offstage
+            w0 = time.perf_counter()
+            controls = walk(roots)
+            walk_ms = (time.perf_counter() - w0) * 1000
+            rows.append({
+                "clics": i,
+                "overlay": len(page.overlay),
+                "offstage": len(page.offstage),
+                "controles": controls,
+                "recorrido_ms": round(walk_ms, 2),
+                "memoria_kb": round(tracemalloc.get_traced_memory()[0] / 1024),
+            })
+            print(json.dumps(rows[-1], ensure_ascii=False), flush=True)
+        if i < args.clics:
+            actions[i % len(actions)]()
+    tracemalloc.stop()
+
+    # The first stretch opens each pooled control once and warms the caches
+    first, last = rows[min(1, len(rows) - 1)], rows[-1]
+    return {
+        "clics": args.clics,
+        "segundos": round(time.perf_counter() - t0, 2),
+        "crecimiento_tras_primer_tramo": {k: last[k] - first[k] for k in ("overlay", "offstage", "controles", "memoria_kb")},
+        "muestras": rows,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clics", type=int, default=2000, help="Clics simulados")
+    parser.add_argument("--cada", type=int, default=250, help="Medir cada N clics")
+    parser.add_argument("--salida", help="Guardar el resultado en JSON")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="soak-")
+    for name in DATA_FILES:
+        if os.path.exists(os.path.join(ROOT, name)):
+            shutil.copy(os.path.join(ROOT, name), os.path.join(workdir, name))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        result = run(args)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(result["crecimiento_tras_primer_tramo"], ensure_ascii=False, indent=2))
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
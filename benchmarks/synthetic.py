@@ -0,0 +1,123 @@
+"""Deterministic synthetic orders and expenses shaped like the real data.
+
+Dishes come from menu.json and supplies from costos.json; clients follow a
+Zipf law (a few regulars, a long tail), order hours peak at lunch with a
+smaller dinner bump, and payment methods are the three the POS offers.
+The same seed always yields the same rows. Amounts are int cents, like
+the stores.
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from money import line_total, to_cents
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAYMENT_METHODS = ["Efectivo", "Yape", "Plin"]
+PAYMENT_WEIGHTS = [0.45, 0.35, 0.20]
+
+# Relative demand per hour of day (cevichería: lunch is the whole business)
+HOUR_WEIGHTS = np.array([
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0.5,       # 00-09
+    2, 5, 14, 18, 12, 5, 2, 1.5, 2, 3.5,   # 10-19
+    3, 1.5, 0.5, 0,                        # 20-23
+], dtype=float)
+HOUR_WEIGHTS /= HOUR_WEIGHTS.sum()
+
+DEFAULT_START = datetime(2023, 1, 1)
+
+
+def load_catalog(name):
+    """A catalog file as {name: price in cents}."""
+    with open(os.path.join(ROOT, name), 'r', encoding='utf-8') as f:
+        return {k: to_cents(v) for k, v in json.load(f).items()}
+
+
+def _timestamps(rng, n, start, orders_per_day, weekday_weights=None):
+    days = max(1, n // orders_per_day)
+    if weekday_weights is None:
+        day = rng.integers(0, days, size=n)
+    else:
+        # Busier and quieter weekdays (Monday = 0), for the forecast backtest
+        w = np.asarray(weekday_weights, dtype=float)[(start.weekday() + np.arange(days)) % 7]
+        day = rng.choice(days, size=n, p=w / w.sum())
+    hour = rng.choice(24, size=n, p=HOUR_WEIGHTS)
+    secs = rng.integers(0, 3600, size=n)
+    base = np.datetime64(start, 's')
+    ts = base + (day * 86400 + hour * 3600 + secs).astype('timedelta64[s]')
+    return np.char.replace(ts.astype(str), 'T', ' ')
+
+
+def _zipf_weights(k, s):
+    w = 1.0 / np.arange(1, k + 1) ** s
+    return w / w.sum()
+
+
+def generate_orders(n, menu=None, seed=0, start=DEFAULT_START, orders_per_day=200,
+                    n_clients=5000, zipf_s=1.1, weekday_weights=None):
+    menu = menu if menu is not None else load_catalog("menu.json")
+    rng = np.random.default_rng(seed)
+    dishes = list(menu.keys())
+    prices = np.array([int(menu[d]) for d in dishes], dtype=np.int64)
+
+    fechas = _timestamps(rng, n, start, orders_per_day, weekday_weights)
+    client_idx = rng.choice(n_clients, size=n, p=_zipf_weights(n_clients, zipf_s))
+    dish_idx = rng.choice(len(dishes), size=n, p=_zipf_weights(len(dishes), 0.6))
+    cantidad = rng.choice([1, 1, 1, 1, 2, 2, 3, 4], size=n)
+    pay_idx = rng.choice(len(PAYMENT_METHODS), size=n, p=PAYMENT_WEIGHTS)
+    entregado = rng.random(n) < 0.97
+    pagado = rng.random(n) < 0.95
+
+    orders = []
+    for i in range(n):
+        precio = int(prices[dish_idx[i]])
+        qty = int(cantidad[i])
+        orders.append({
+            'id': i + 1,
+            'fecha': str(fechas[i]),
+            'cliente': f"Cliente {int(client_idx[i]):05d}",
+            'plato': dishes[dish_idx[i]],
+            'cantidad': qty,
+            'precio': precio,
+            'subtotal': precio * qty,
+            'metodo_pago': PAYMENT_METHODS[pay_idx[i]],
+            'entregado': bool(entregado[i]),
+            'pagado': bool(pagado[i]),
+            'ticket_id': i + 1,
+        })
+    orders.sort(key=lambda x: x['fecha'], reverse=True)
+    return orders
+
+
+def generate_expenses(n, cost_dict=None, seed=0, start=DEFAULT_START, expenses_per_day=8):
+    cost_dict = cost_dict if cost_dict is not None else load_catalog("costos.json")
+    rng = np.random.default_rng(seed + 1)
+    items = list(cost_dict.keys())
+    prices = np.array([int(cost_dict[i]) for i in items], dtype=np.int64)
+
+    days = max(1, n // expenses_per_day)
+    day = rng.integers(0, days, size=n)
+    # Purchases happen early in the morning, before service
+    secs = rng.integers(6 * 3600, 10 * 3600, size=n)
+    ts = np.datetime64(start, 's') + (day * 86400 + secs).astype('timedelta64[s]')
+    fechas = np.char.replace(ts.astype(str), 'T', ' ')
+    item_idx = rng.integers(0, len(items), size=n)
+    cantidad = np.round(rng.uniform(0.5, 12.0, size=n), 1)
+
+    expenses = []
+    for i in range(n):
+        precio_unit = int(prices[item_idx[i]])
+        qty = float(cantidad[i])
+        expenses.append({
+            'id': i + 1,
+            'fecha': str(fechas[i]),
+            'item': items[item_idx[i]],
+            'cantidad': qty,
+            'precio_unit': precio_unit,
+            'total': line_total(precio_unit, qty),
+        })
+    expenses.sort(key=lambda x: x['fecha'], reverse=True)
+    return expenses
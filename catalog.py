@@ -0,0 +1,140 @@
+"""Versioned in-memory catalogs for menu.json and costos.json.
+
+A Catalog holds the parsed dict (replaced whole, never mutated, like the
+managers' record lists) plus a version number that goes up on every
+change. Saves go through a temp file and os.replace, so a terminal
+reloading at the same moment never reads half a file.
+
+`check()` is the cheap watcher step: one os.stat, and the file is only
+parsed again when its (mtime, size, inode) signature moved. The reload
+is diffed against the current dict and only a real change bumps the
+version, so touching the file or re-saving identical content is a no-op.
+`CatalogWatcher` calls the check functions on a daemon thread.
+
+Prices are int cents in memory and soles in the files, which people edit
+by hand.
+"""
+import json
+import os
+import threading
+
+from atomic import replace_file
+from money import to_cents, to_soles
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def diff_items(old, new):
+    """Keys added, changed and removed going from old to new."""
+    added = [k for k in new if k not in old]
+    changed = [k for k in new if k in old and old[k] != new[k]]
+    removed = [k for k in old if k not in new]
+    return {"added": added, "changed": changed, "removed": removed}
+
+
+class Catalog:
+    def __init__(self, path, defaults, label):
+        self.path = path
+        self.defaults = defaults
+        self.label = label
+        self.items = {}
+        self.version = 0
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            self._swap({k: to_cents(v) for k, v in self.defaults.items()})
+            self.save()
+            return
+        self._reload()
+
+    def _reload(self):
+        sig = file_signature(self.path)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                items = {k: to_cents(v) for k, v in json.load(f).items()}
+        except Exception as e:
+            # Probably caught mid-edit; keep the current version and retry on the next change
+            print(f"Error cargando {self.label}: {e}")
+            self._signature = sig
+            return None
+        self._signature = sig
+        changes = diff_items(self.items, items)
+        if any(changes.values()):
+            self._swap(items)
+            return changes
+        return None
+
+    def _swap(self, items):
+        self.items = items
+        self.version += 1
+
+    def save(self):
+        def write(tmp):
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({k: to_soles(v) for k, v in self.items.items()}, f, ensure_ascii=False, indent=4)
+        try:
+            replace_file(self.path, write)
+        except Exception as e:
+            print(f"Error guardando {self.label}: {e}")
+            return
+        # Our own write must not come back as an external change
+        self._signature = file_signature(self.path)
+
+    def set(self, name, value):
+        """Add or change a price given in soles (as typed)."""
+        with self._lock:
+            items = dict(self.items)
+            items[name] = to_cents(value)
+            self._swap(items)
+            self.save()
+
+    def delete(self, name):
+        with self._lock:
+            if name not in self.items:
+                return False
+            items = dict(self.items)
+            del items[name]
+            self._swap(items)
+            self.save()
+            return True
+
+    def check(self):
+        """Reload if the file changed on disk; returns the diff or None."""
+        with self._lock:
+            sig = file_signature(self.path)
+            if sig is None or sig == self._signature:
+                return None
+            return self._reload()
+
+
+class CatalogWatcher:
+    """Poll check functions every `interval` seconds on a daemon thread."""
+
+    def __init__(self, checks, interval=1.0):
+        self.checks = list(checks)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="catalogos", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for check in self.checks:
+                try:
+                    check()
+                except Exception as e:
+                    print(f"Error revisando catálogos: {e}")
@@ -1,407 +1,71 @@
 import flet as ft
-import json
+import argparse
+import atexit
 import os
-from datetime import datetime
-from openpyxl import Workbook, load_workbook
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-# ================= MODELO / LÓGICA =================
-
-class CostManager:
-    def __init__(self, filename="gastos.xlsx", dict_file="costos.json"):
-        self.filename = filename
-        self.dict_file = dict_file
-        self.expenses = []
-        self.cost_dict = {}
-
-        self.load_cost_dict()
-        self.load_expenses()
-
-    def load_cost_dict(self):
-        if os.path.exists(self.dict_file):
-            try:
-                with open(self.dict_file, 'r', encoding='utf-8') as f:
-                    self.cost_dict = json.load(f)
-            except Exception as e:
-                print(f"Error cargando costos: {e}")
-                self.cost_dict = {}
-        else:
-            # Default Data
-            self.cost_dict = {
-                "Pescado (Kg)": 18.0,
-                "Limón (Kg)": 7.0,
-                "Cebolla (Kg)": 3.5,
-                "Mesero (Día)": 50.0,
-                "Aceite (L)": 8.5
-            }
-            self.save_cost_dict()
-
-    def save_cost_dict(self):
-        try:
-            with open(self.dict_file, 'w', encoding='utf-8') as f:
-                json.dump(self.cost_dict, f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            print(f"Error guardando costos: {e}")
-
-    def add_cost_item(self, name, cost):
-        self.cost_dict[name] = float(cost)
-        self.save_cost_dict()
-
-    def delete_cost_item(self, name):
-        if name in self.cost_dict:
-            del self.cost_dict[name]
-            self.save_cost_dict()
-
-    def get_next_id(self):
-        if not self.expenses:
-            return 1
-        return max(e['id'] for e in self.expenses) + 1
-
-    def load_expenses(self):
-        if not os.path.exists(self.filename):
-            return
-
-        try:
-            wb = load_workbook(self.filename)
-            ws = wb.active
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if not row or row[0] is None: continue
-                try:
-                    expense = {
-                        'id': int(row[0]),
-                        'fecha': row[1],
-                        'item': row[2],
-                        'cantidad': float(row[3]),
-                        'precio_unit': float(row[4]),
-                        'total': float(row[5])
-                    }
-                    self.expenses.append(expense)
-                except Exception:
-                    pass
-            # Sort by Date Descending
-            self.expenses.sort(key=lambda x: x['fecha'], reverse=True)
-        except Exception as e:
-            print(f"Error cargando gastos: {e}")
-
-    def save_expenses(self):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Historial Gastos"
-        headers = ["ID", "Fecha", "Insumo", "Cantidad", "Costo Unit.", "Total"]
-        ws.append(headers)
-        
-        for e in self.expenses:
-            ws.append([
-                e['id'], e['fecha'], e['item'], e['cantidad'], e['precio_unit'], e['total']
-            ])
-        try:
-            wb.save(self.filename)
-        except PermissionError as e:
-            return str(e)
-        return None
-
-    def add_expense(self, item, cantidad, date_str=None):
-        if item not in self.cost_dict: return "Item no existe"
-        
-        cost = self.cost_dict[item]
-        if not date_str:
-            date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-        expense = {
-            'id': self.get_next_id(),
-            'fecha': date_str,
-            'item': item,
-            'cantidad': cantidad,
-            'precio_unit': cost,
-            'total': cost * cantidad
-        }
-        self.expenses.insert(0, expense) # Add to top
-        # Sort again just in case date was in past
-        self.expenses.sort(key=lambda x: x['fecha'], reverse=True)
-        return self.save_expenses()
-
-    def delete_expense(self, exp_id):
-        self.expenses = [e for e in self.expenses if e['id'] != exp_id]
-        return self.save_expenses()
-
-    def update_expense_date(self, exp_id, new_date):
-        for e in self.expenses:
-            if e['id'] == exp_id:
-                # Keep time if only date is gathered? Or expect full datetime iso string?
-                # User picker returns YYYY-MM-DD. We might want to keep time or just set time to 00:00.
-                # Simplification: Append current time if input is only date? 
-                # Or just replace string.
-                e['fecha'] = new_date
-                self.expenses.sort(key=lambda x: x['fecha'], reverse=True)
-                return self.save_expenses()
-        return None
-
-    def get_financials(self, start_date=None, end_date=None):
-        df_exp = pd.DataFrame(self.expenses)
-        
-        total_expenses = 0
-        daily_expenses = {}
-        
-        if not df_exp.empty:
-            try:
-                df_exp['fecha_dt'] = pd.to_datetime(df_exp['fecha'])
-                if start_date and end_date:
-                    mask = (df_exp['fecha_dt'] >= pd.to_datetime(start_date)) & (df_exp['fecha_dt'] <= pd.to_datetime(end_date) + pd.Timedelta(days=1))
-                    df_filtered = df_exp.loc[mask]
-                else:
-                    df_filtered = df_exp # All if no filter? Or match logic of Sales?
-                    # For financials, usually we want Total if no filter or Today?
-                    # Let's default to All Time if no filter for Utility, or Month?
-                    # User request: "Dashboard BI Financiero... filtrable". 
-                    pass
-                
-                if start_date and end_date:
-                     total_expenses = df_filtered['total'].sum()
-                     daily_expenses = df_filtered.groupby(df_filtered['fecha_dt'].dt.date)['total'].sum().to_dict()
-                else:
-                    # If no date, maybe return 0 or Total? Let's return Total for now but filtered by today in dashboard default logic 
-                    # Actually OrderManager defaults to TODAY. Let's make CostManager consistent or flexible.
-                    # Let's handle logic in Dashboard.
-                    pass
-
-            except Exception:
-                pass
-        
-        return total_expenses, daily_expenses
-# ================= MODELO / LÓGICA =================
-
-class OrderManager:
-    def __init__(self, filename="pedidos_cevicheria.xlsx", menu_file="menu.json"):
-        self.filename = filename
-        self.menu_file = menu_file
-        self.orders = []
-        self.menu = {}
-
-        self.load_menu()
-        self.load_orders()
-
-    def load_menu(self):
-        if os.path.exists(self.menu_file):
-            try:
-                with open(self.menu_file, 'r', encoding='utf-8') as f:
-                    self.menu = json.load(f)
-            except Exception as e:
-                print(f"Error cargando menú: {e}")
-                self.menu = {}
-        else:
-            self.menu = {
-                "Duo Marino": 15.0,
-                "Causa de Pescado": 10.0,
-                "Ceviche": 12.0,
-                "Trio Marino": 20.0,
-            }
-            self.save_menu()
-
-    def save_menu(self):
-        try:
-            with open(self.menu_file, 'w', encoding='utf-8') as f:
-                json.dump(self.menu, f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            print(f"Error guardando menú: {e}")
-
-    def add_dish(self, name, price):
-        # Update if exists, else add new
-        self.menu[name] = float(price)
-        self.save_menu()
-
-    def delete_dish(self, name):
-        if name in self.menu:
-            del self.menu[name]
-            self.save_menu()
-
-    def get_next_id(self):
-        if not self.orders:
-            return 1
-        return max(o['id'] for o in self.orders) + 1
-
-    def load_orders(self):
-        if not os.path.exists(self.filename):
-            return
-
-        try:
-            wb = load_workbook(self.filename)
-            ws = wb.active
-            self.orders = []
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if not row or row[0] is None: continue
-                
-                row_data = list(row)
-                while len(row_data) < 10:
-                    row_data.append(None)
-
-                try:
-                    order = {
-                        'id': int(row_data[0]),
-                        'fecha': row_data[1],
-                        'cliente': row_data[2],
-                        'plato': row_data[3],
-                        'cantidad': int(row_data[4]),
-                        'precio': float(row_data[5]),
-                        'subtotal': float(row_data[6]) if row_data[6] is not None else (int(row_data[4]) * float(row_data[5])),
-                        'metodo_pago': str(row_data[7]) if row_data[7] else "Efectivo",
-                        'entregado': str(row_data[8]) == 'Si',
-                        'pagado': str(row_data[9]) == 'Si'
-                    }
-                    self.orders.append(order)
-                except Exception:
-                    pass
-            # Sort Descending
-            self.orders.sort(key=lambda x: x['fecha'], reverse=True)
-        except Exception as e:
-            print(f"Error cargando historial: {e}")
-
-    def save_orders(self):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Historial Pedidos"
-        headers = ["ID", "Fecha", "Cliente", "Plato", "Cant.", "Precio Unit.", "Total", "Método Pago", "Entregado", "Pagado"]
-        ws.append(headers)
-        
-        for o in self.orders:
-            ws.append([
-                o['id'], o['fecha'], o['cliente'], o['plato'], o['cantidad'], o['precio'],
-                o['subtotal'], o.get('metodo_pago', 'Efectivo'),
-                "Si" if o['entregado'] else "No", "Si" if o['pagado'] else "No"
-            ])
-        try:
-            wb.save(self.filename)
-        except PermissionError as e:
-            return str(e)
-        return None
-
-    def add_order(self, cliente, plato, cantidad, metodo_pago, date_str=None):
-        if plato not in self.menu: return None
-        precio = self.menu[plato]
-        
-        if not date_str:
-            date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-        order = {
-            'id': self.get_next_id(),
-            'fecha': date_str,
-            'cliente': cliente,
-            'plato': plato,
-            'cantidad': cantidad,
-            'precio': precio,
-            'subtotal': precio * cantidad,
-            'metodo_pago': metodo_pago,
-            'entregado': False,
-            'pagado': False
-        }
-        self.orders.append(order)
-        # Sort again just in case date was in past
-        self.orders.sort(key=lambda x: x['fecha'], reverse=True)
-        return self.save_orders()
-
-    def delete_order(self, order_id):
-        self.orders = [o for o in self.orders if o['id'] != order_id]
-        return self.save_orders()
-
-    def toggle_status(self, order_id, field):
-        for order in self.orders:
-            if order['id'] == order_id:
-                order[field] = not order[field]
-                return self.save_orders()
-        return None
-
-    def get_filtered_stats(self, start_date=None, end_date=None):
-        if not self.orders:
-            return None
-            
-    def update_order_date(self, order_id, new_date):
-        for o in self.orders:
-            if o['id'] == order_id:
-                o['fecha'] = new_date
-                self.orders.sort(key=lambda x: x['fecha'], reverse=True)
-                return self.save_orders()
-        return None
-
-    def get_filtered_stats(self, start_date=None, end_date=None):
-        if not self.orders:
-            return None
-            
-        df = pd.DataFrame(self.orders)
-        
-        # Date Conversion
-        try:
-            df['fecha_dt'] = pd.to_datetime(df['fecha'])
-        except Exception:
-            return None
-
-        # Filter by Date Range
-        if start_date and end_date:
-            mask = (df['fecha_dt'] >= pd.to_datetime(start_date)) & (df['fecha_dt'] <= pd.to_datetime(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1))
-            df_filtered = df.loc[mask]
-        else:
-             # Default to today if no range
-            today = datetime.now().strftime("%Y-%m-%d")
-            df_filtered = df[df['fecha'].str.startswith(today)]
-
-        if df_filtered.empty:
-            return {
-                "total_sales": 0,
-                "ticket_average": 0,
-                "top_3_dishes": [],
-                "bottom_3_dishes": [],
-                "top_3_clients": [],
-                "avg_price_per_dish": 0,
-                "payment_methods": {},
-                "daily_sales_trend": {},
-                "rush_hour": {h: 0 for h in range(24)}
-            }
-
-        # KPIs
-        total_sales = df_filtered['subtotal'].sum()
-        ticket_average = df_filtered['subtotal'].mean()
-        
-        # Top/Bottom Dishes
-        dish_counts = df_filtered['plato'].value_counts()
-        total_items = dish_counts.sum()
-        
-        top_3_dishes = [{"name": name, "pct": (count/total_items)*100} for name, count in dish_counts.head(3).items()]
-        bottom_3_dishes = [{"name": name, "pct": (count/total_items)*100} for name, count in dish_counts.tail(3).items()]
-
-        # Top Clients
-        client_counts = df_filtered['cliente'].value_counts()
-        total_clients = client_counts.sum()
-        top_3_clients = [{"name": name, "pct": (count/total_clients)*100} for name, count in client_counts.head(3).items()]
-
-        # Avg Price per Dish (Total Sales / Total Qty)
-        total_qty = df_filtered['cantidad'].sum()
-        avg_price_per_dish = total_sales / total_qty if total_qty > 0 else 0
-
-        # Payment Methods
-        payment_methods = df_filtered['metodo_pago'].value_counts().to_dict()
+import threading
+import time
+from datetime import datetime, timedelta
+from managers import OrderManager, CostManager, comparison_period
+from kitchen import wait_seconds, format_duration
+from history import History
+from catalog import CatalogWatcher
+from prices import PriceTable
+from recipes import load_recipes, consumption_report
+from inventory import Inventory
+from forecast import DemandForecast
+from customers import CustomerIndex
+from supplies import SupplyRollups
+from aggregates import DashboardAggregates, demand_heatmap
+from charts import trend_series, axis_labels, FREQ_LABELS, WEEKDAY_LABELS
+from overlays import OverlayPool
+from money import fmt, fmt_plain, to_soles
+from reports import generate_closing_pdf
+from metrics import start_metrics_server
+from events import (EventBus, ORDER_ADDED, STATUS_CHANGED, ORDER_DELETED, DATE_CHANGED,
+                    EXPENSE_ADDED, EXPENSE_DELETED, EXPENSE_DATE_CHANGED, MENU_CHANGED,
+                    COSTS_CHANGED, RESYNC)
+from instrumentation import timed, instrument_call, format_report, dump as dump_diagnostics, dump_profile, profiling_enabled
+# ================= VISTA / UI (FLET) =================
 
-        # Daily Sales Trend (for LineChart)
-        daily_sales = df_filtered.groupby(df_filtered['fecha_dt'].dt.date)['subtotal'].sum().to_dict()
-        daily_sales = dict(sorted(daily_sales.items()))
-        
-        # Rush Hour (Orders per Hour)
-        df_filtered['hour'] = df_filtered['fecha_dt'].dt.hour
-        hourly_counts = df_filtered['hour'].value_counts().sort_index().to_dict()
-        rush_hour = {h: hourly_counts.get(h, 0) for h in range(24)}
-
-        return {
-            "total_sales": total_sales,
-            "ticket_average": ticket_average,
-            "top_3_dishes": top_3_dishes,
-            "bottom_3_dishes": bottom_3_dishes,
-            "top_3_clients": top_3_clients,
-            "avg_price_per_dish": avg_price_per_dish,
-            "payment_methods": payment_methods,
-            "daily_sales_trend": daily_sales,
-            "rush_hour": rush_hour
-        }
+ORDER_TOPICS = (ORDER_ADDED, STATUS_CHANGED, ORDER_DELETED, DATE_CHANGED)
+EXPENSE_TOPICS = (EXPENSE_ADDED, EXPENSE_DELETED, EXPENSE_DATE_CHANGED)
+
+# One store per process: every Flet session (desktop window or browser tab
+# in server mode) works on the same managers, so terminals never overwrite
+# each other's orders.
+_shared_managers = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_managers():
+    global _shared_managers
+    with _shared_lock:
+        if _shared_managers is None:
+            bus = EventBus()
+            _shared_managers = (OrderManager(bus=bus), CostManager(bus=bus))
+            # Mutation log + snapshots for "what did it look like at 3pm" questions
+            history = History()
+            history.attach(*_shared_managers)
+            atexit.register(history.close)
+            # Effective-dated prices, fed by the catalog events below
+            PriceTable().attach(*_shared_managers)
+            # Stock per supply, moved by purchases and by recipe use of each sale
+            inventory = _shared_managers[1].inventory = Inventory().attach(*_shared_managers)
+            # Weekday x hour x dish profiles, updated per order instead of rescanned per dashboard
+            _shared_managers[0].forecast = DemandForecast().attach(_shared_managers[0])
+            # Normalized client names for autocomplete and lifetime totals
+            _shared_managers[0].customers = CustomerIndex().attach(_shared_managers[0])
+            # Quantity, spend and unit price per supply by week and month
+            _shared_managers[1].supplies = SupplyRollups().attach(_shared_managers[1])
+            # Per-day dashboard cells, saved on exit and reused while the workbooks are unchanged
+            aggregates = DashboardAggregates().attach(*_shared_managers)
+            _shared_managers[0].aggregates = _shared_managers[1].aggregates = aggregates
+            atexit.register(aggregates.flush)
+            # menu.json / costos.json edited elsewhere reach every session as catalog events
+            CatalogWatcher([_shared_managers[0].reload_menu, _shared_managers[1].reload_cost_dict,
+                            inventory.check_recipes]).start()
+        return _shared_managers
 
-# ================= VISTA / UI (FLET) =================
 
 def main(page: ft.Page):
     page.title = "Cevichería YAFRANK"
@@ -409,9 +73,17 @@ def main(page: ft.Page):
     page.padding = 0
     page.window.min_width = 1000
     page.window.min_height = 700
+    instrument_call(page, "update", "page.update")
 
-    manager = OrderManager()
-    cost_manager = CostManager()
+    manager, cost_manager = get_shared_managers()
+    # Store events are applied from a worker thread; this keeps them apart from click handlers
+    ui_lock = threading.RLock()
+    # Date picker, dialog and snackbars shared by every click of this session
+    overlays = OverlayPool(page)
+
+    metrics_port = os.environ.get("YAFRANK_METRICS_PORT")
+    if metrics_port:
+        start_metrics_server(manager, cost_manager, int(metrics_port), os.environ.get("YAFRANK_METRICS_HOST", "127.0.0.1"))
     
     # 1. SALES VIEW COMPONENT
     def create_sales_view():
@@ -446,7 +118,30 @@ def main(page: ft.Page):
         )
         page.overlay.append(order_date_picker)
         
-        client_input = ft.TextField(label="Nombre Cliente", expand=True)
+        client_suggestions = ft.Row(wrap=True, spacing=5)
+        client_info = ft.Text("", size=11, color=ft.Colors.GREY)
+
+        def pick_client(e, c):
+            client_input.value = c['nombre']
+            client_suggestions.controls = []
+            client_info.value = (f"{c['visitas']} visitas · {fmt(c['gasto'])} · última {c['ultima_visita'][:10]}"
+                                 + (f" · pide {c['plato_favorito']}" if c['plato_favorito'] else ""))
+            page.update()
+
+        def suggest_clients(e):
+            index = manager.customers
+            query = client_input.value or ""
+            client_info.value = ""
+            if index is None or not query.strip():
+                client_suggestions.controls = []
+            else:
+                client_suggestions.controls = [
+                    ft.TextButton(f"{c['nombre']} ({c['visitas']})", on_click=lambda e, c=c: pick_client(e, c))
+                    for c in index.suggest(query, limit=5)
+                ]
+            page.update()
+
+        client_input = ft.TextField(label="Nombre Cliente", expand=True, on_change=suggest_clients)
         date_btn = ft.IconButton(icon=ft.Icons.CALENDAR_MONTH, tooltip="Fecha del Pedido", on_click=lambda _: page.open(order_date_picker))
 
         # --- TABLA DE VENTAS CON HEADER FIJO (Sticky Header) ---
@@ -470,44 +165,51 @@ def main(page: ft.Page):
 
         orders_list = ft.ListView(expand=True, spacing=0)
 
+        # Cart: lines of the ticket being entered, committed together
+        cart = []
+        cart_list = ft.Column(spacing=2, scroll=ft.ScrollMode.AUTO, height=150)
+        cart_total = ft.Text("Total: S/ 0.00", weight="bold")
+
         # Helper for Date Editing
         def edit_date_click(e, order_id, current_date):
+            picked = {}
+
+            def on_pick(value):
+                picked['date'] = value
+                current_txt.value = f"Nueva fecha: {value.strftime('%Y-%m-%d')}"
+                page.update()
+
             def save_date(e2):
-                if date_picker.value:
-                    # Keep time? User request just Date Picker.
-                    # If we lose time, order order might change if we use time for sort.
-                    # Append current time or 00:00?
-                    # Or just YYYY-MM-DD.
-                    new_d = date_picker.value.strftime("%Y-%m-%d")
+                if picked:
+                    new_d = picked['date'].strftime("%Y-%m-%d")
                     # Try to keep original time part of current_date string if compatible
                     final_d = f"{new_d} {current_date[11:]}" if len(current_date) > 10 else new_d
                 
                     manager.update_order_date(order_id, final_d)
-                refresh_orders_table_logic()
-                page.close(dlg)
+                overlays.close_dialog()
                 page.update()
 
-            date_picker = ft.DatePicker(
-                first_date=datetime(2020, 1, 1),
-                last_date=datetime(2100, 12, 31)
-            )
-            page.overlay.append(date_picker)
-        
-            dlg = ft.AlertDialog(
-                title=ft.Text("Editar Fecha"),
-                content=ft.Column([
-                    ft.Text(f"Fecha actual: {current_date}"),
-                    ft.ElevatedButton("Seleccionar Nueva Fecha", icon=ft.Icons.CALENDAR_MONTH, on_click=lambda _: page.open(date_picker))
+            current_txt = ft.Text(f"Fecha actual: {current_date}")
+            overlays.show_dialog(
+                "Editar Fecha",
+                ft.Column([
+                    current_txt,
+                    ft.ElevatedButton("Seleccionar Nueva Fecha", icon=ft.Icons.CALENDAR_MONTH, on_click=lambda _: overlays.pick_date(on_pick))
                 ], height=100),
-                actions=[
-                    ft.TextButton("Cancelar", on_click=lambda _: page.close(dlg)),
+                [
+                    ft.TextButton("Cancelar", on_click=lambda _: overlays.close_dialog()),
                     ft.TextButton("Guardar", on_click=save_date)
                 ],
             )
-            page.open(dlg)
 
+        # Rows currently drawn, by order id, so store events can patch them in place
+        shown_orders = {}
+        search_state = {"query": ""}
+
+        @timed("ui.refresh_orders_table_logic")
         def refresh_orders_table_logic(orders_to_show=None):
             orders_list.controls.clear()
+            shown_orders.clear()
             data_source = orders_to_show if orders_to_show is not None else manager.orders
             # Already sorted by manager load/add, but ensure
             sorted_orders = sorted(data_source, key=lambda x: x['id'], reverse=True) # Sort by ID desc usually matches Date desc roughly for recent
@@ -515,54 +217,98 @@ def main(page: ft.Page):
             sorted_orders.sort(key=lambda x: x['fecha'], reverse=True)
 
             for o in sorted_orders[:50]:
-                status_paid = "Pagado" if o['pagado'] else "Pendiente"
-                color_paid = ft.Colors.GREEN if o['pagado'] else ft.Colors.RED
-                status_del = "Entregado" if o['entregado'] else "Cocina"
-                color_del = ft.Colors.BLUE if o['entregado'] else ft.Colors.ORANGE
-            
-                # Action Buttons (unchanged)
-                actions = ft.Row([
-                     ft.IconButton("check", icon_color=ft.Colors.GREEN, 
-                        on_click=lambda e, oid=o['id']: (manager.toggle_status(oid, 'entregado'), refresh_orders_table_logic(), page.update())),
-                     ft.IconButton("attach_money", icon_color=ft.Colors.BLUE,
-                        on_click=lambda e, oid=o['id']: (manager.toggle_status(oid, 'pagado'), refresh_orders_table_logic(), page.update())),
-                     ft.IconButton("delete", icon_color=ft.Colors.RED,
-                        on_click=lambda e, oid=o['id']: (manager.delete_order(oid), refresh_orders_table_logic(), page.update()))
-                ])
-
-                row_controls = [
-                    ft.Text(str(o['id'])),
-                    # Date Button for Edit
-                    ft.TextButton(
-                        str(o['fecha'])[:16], 
-                        on_click=lambda e, oid=o['id'], cd=o['fecha']: edit_date_click(e, oid, cd)
-                    ),
-                    ft.Text(o['cliente']),
-                    ft.Text(o['plato']),
-                    ft.Text(str(o['cantidad'])),
-                    ft.Text(f"S/{o['subtotal']:.2f}"),
-                    ft.Text(o['metodo_pago']),
-                    ft.Row([
-                        ft.Container(content=ft.Text(status_paid, size=10, color="white"), bgcolor=color_paid, padding=5, border_radius=5),
-                        ft.Container(content=ft.Text(status_del, size=10, color="white"), bgcolor=color_del, padding=5, border_radius=5)
-                    ]),
-                    actions
-                ]
-            
-                cells = [ft.Container(content=c, width=w) for c, w in zip(row_controls, col_widths)]
-            
-                orders_list.controls.append(
-                    ft.Container(
-                        content=ft.Row(cells, spacing=10),
-                        padding=ft.padding.symmetric(vertical=5, horizontal=10),
-                        border=ft.border.only(bottom=ft.border.BorderSide(1, ft.Colors.GREY_200)),
-                        bgcolor=ft.Colors.SURFACE,
-                        scale=1.0,
-                        animate_scale=ft.animation.Animation(300, ft.AnimationCurve.EASE_OUT),
-                        on_hover=hover_effect
-                    )
-                )
+                row = build_order_row(o)
+                shown_orders[o['id']] = row
+                orders_list.controls.append(row)
+
+        def build_order_row(o):
+            status_paid = "Pagado" if o['pagado'] else "Pendiente"
+            color_paid = ft.Colors.GREEN if o['pagado'] else ft.Colors.RED
+            status_del = "Entregado" if o['entregado'] else "Cocina"
+            color_del = ft.Colors.BLUE if o['entregado'] else ft.Colors.ORANGE
+        
+            # Action Buttons (unchanged)
+            actions = ft.Row([
+                 # The row redraw arrives through the store event, in every open session
+                 ft.IconButton("check", icon_color=ft.Colors.GREEN, 
+                    on_click=lambda e, oid=o['id']: manager.toggle_status(oid, 'entregado')),
+                 ft.IconButton("attach_money", icon_color=ft.Colors.BLUE,
+                    on_click=lambda e, oid=o['id']: manager.toggle_status(oid, 'pagado')),
+                 ft.IconButton("delete", icon_color=ft.Colors.RED,
+                    on_click=lambda e, oid=o['id']: manager.delete_order(oid))
+            ])
+
+            row_controls = [
+                ft.Text(str(o['id'])),
+                # Date Button for Edit
+                ft.TextButton(
+                    str(o['fecha'])[:16], 
+                    on_click=lambda e, oid=o['id'], cd=o['fecha']: edit_date_click(e, oid, cd)
+                ),
+                ft.Text(o['cliente']),
+                ft.Text(o['plato']),
+                ft.Text(str(o['cantidad'])),
+                ft.Text(fmt(o['subtotal'])),
+                ft.Text(o['metodo_pago']),
+                ft.Row([
+                    ft.Container(content=ft.Text(status_paid, size=10, color="white"), bgcolor=color_paid, padding=5, border_radius=5),
+                    ft.Container(content=ft.Text(status_del, size=10, color="white"), bgcolor=color_del, padding=5, border_radius=5)
+                ]),
+                actions
+            ]
+        
+            cells = [ft.Container(content=c, width=w) for c, w in zip(row_controls, col_widths)]
+        
+            return ft.Container(
+                content=ft.Row(cells, spacing=10),
+                padding=ft.padding.symmetric(vertical=5, horizontal=10),
+                border=ft.border.only(bottom=ft.border.BorderSide(1, ft.Colors.GREY_200)),
+                bgcolor=ft.Colors.SURFACE,
+                scale=1.0,
+                animate_scale=ft.animation.Animation(300, ft.AnimationCurve.EASE_OUT),
+                on_hover=hover_effect,
+                data=o
+            )
 
+        def matches_search(o):
+            q = search_state["query"].lower()
+            return not q or q in o['cliente'].lower() or q in o['plato'].lower()
+
+        def insert_order_row(o):
+            if o['id'] in shown_orders or not matches_search(o):
+                return
+            controls = orders_list.controls
+            # Rows are newest first; a new order goes before rows with the same or older date
+            pos = next((i for i, row in enumerate(controls) if row.data['fecha'] <= o['fecha']), len(controls))
+            if pos >= 50:
+                return
+            row = build_order_row(o)
+            controls.insert(pos, row)
+            shown_orders[o['id']] = row
+            if len(controls) > 50:
+                shown_orders.pop(controls.pop().data['id'], None)
+
+        @timed("ui.apply_order_event")
+        def apply_order_event(event):
+            # Patch only the affected rows; anything that reorders the table redraws it
+            if event.topic == ORDER_ADDED:
+                for o in event.data['orders']:
+                    insert_order_row(o)
+            elif event.topic == STATUS_CHANGED:
+                o = event.data['order']
+                row = shown_orders.get(o['id'])
+                if row is not None:
+                    new_row = build_order_row(o)
+                    orders_list.controls[orders_list.controls.index(row)] = new_row
+                    shown_orders[o['id']] = new_row
+            elif event.topic == ORDER_DELETED:
+                row = shown_orders.pop(event.data['order']['id'], None)
+                if row is not None:
+                    orders_list.controls.remove(row)
+            elif event.topic in (DATE_CHANGED, RESYNC):
+                filter_orders_logic(search_state["query"])
+
+        @timed("ui.refresh_menu_logic")
         def refresh_menu_logic():
              # PURE LOGIC: Modifies the Control's state but DOES NOT call .update()
             menu_items_container.controls.clear()
@@ -572,15 +318,15 @@ def main(page: ft.Page):
                         # Re-design: Price inline with SpaceBetween
                         ft.Row([
                              ft.Text(dish, weight="bold", size=16, color=ft.Colors.ON_SURFACE, expand=True),
-                             ft.Text(f"S/ {price:.2f}", color=ft.Colors.PRIMARY, size=16, weight="bold")
+                             ft.Text(fmt(price), color=ft.Colors.PRIMARY, size=16, weight="bold")
                         ], expand=True, alignment=ft.MainAxisAlignment.SPACE_BETWEEN, vertical_alignment="center"),
                         
                         ft.IconButton(
                             icon="add_circle", 
                             icon_color=ft.Colors.PRIMARY, 
                             icon_size=30,
-                            tooltip="Agregar Pedido",
-                            on_click=lambda e, d=dish: add_order_click(e, d)
+                            tooltip="Agregar al Ticket",
+                            on_click=lambda e, d=dish: add_to_cart_click(e, d)
                         )
                     ], alignment="spaceBetween"),
                     padding=10,
@@ -593,45 +339,73 @@ def main(page: ft.Page):
                 menu_items_container.controls.append(card)
 
         # Interaction Handlers
-        def add_order_click(e, plato_name):
-            if not client_input.value:
-                # Assuming page.snack_bar is handled by page.update()
-                snack = ft.SnackBar(ft.Text("Ingrese Nombre del Cliente"), bgcolor=ft.Colors.RED)
-                page.overlay.append(snack)
-                page.open(snack)
-                page.update()
-                return
-
+        def refresh_cart_logic():
+            cart_list.controls.clear()
+            total = 0
+            for idx, (plato, qty) in enumerate(cart):
+                subtotal = manager.menu.get(plato, 0) * qty
+                total += subtotal
+                cart_list.controls.append(ft.Row([
+                    ft.Text(f"{qty} x {plato}", expand=True),
+                    ft.Text(fmt(subtotal)),
+                    ft.IconButton("remove_circle", icon_color=ft.Colors.RED, icon_size=18,
+                        on_click=lambda e, i=idx: remove_from_cart_click(e, i))
+                ]))
+            cart_total.value = f"Total: {fmt(total)}"
+
+        def add_to_cart_click(e, plato_name):
             try:
                 qty = int(qty_input.value)
             except ValueError:
                 qty = 1
-            
+            qty = max(qty, 1)
+            # Same dish twice in one ticket becomes one line
+            for idx, (plato, q) in enumerate(cart):
+                if plato == plato_name:
+                    cart[idx] = (plato, q + qty)
+                    break
+            else:
+                cart.append((plato_name, qty))
+            refresh_cart_logic()
+            page.update()
+
+        def remove_from_cart_click(e, idx):
+            if idx < len(cart):
+                cart.pop(idx)
+            refresh_cart_logic()
+            page.update()
+
+        def clear_cart_click(e):
+            cart.clear()
+            refresh_cart_logic()
+            page.update()
+
+        def commit_ticket_click(e):
+            if not client_input.value:
+                overlays.notify("Ingrese Nombre del Cliente", ft.Colors.RED)
+                page.update()
+                return
+            if not cart:
+                overlays.notify("Agregue platos al ticket", ft.Colors.RED)
+                page.update()
+                return
+
             # Get Date
             d_str = None
             if order_date_picker.value:
                 d_str = order_date_picker.value.strftime("%Y-%m-%d %H:%M:%S")
 
-            err = manager.add_order(client_input.value, plato_name, qty, payment_group.value, date_str=d_str)
+            ticket_id, err = manager.add_ticket(client_input.value, list(cart), payment_group.value, date_str=d_str)
             if err:
-                snack = ft.SnackBar(ft.Text(f"Error guardando: {err}"), bgcolor=ft.Colors.RED)
-                page.overlay.append(snack)
-                page.update()
-                page.open(snack)
+                message, color = f"Error guardando: {err}", ft.Colors.RED
             else:
-                snack = ft.SnackBar(ft.Text(f"Pedido Agregado: {plato_name}"), bgcolor=ft.Colors.GREEN)
-                page.overlay.append(snack)
-                # Logic update
-                refresh_orders_table_logic()
-                if hasattr(create_dashboard_view, 'update_logic'):
-                     create_dashboard_view.update_logic()
-                
-                page.update()
-                page.open(snack)
-            
-            # page.update() handled above inside else/if blocks or just one at end?
-            # User requirement: "Asegura que tras agregar un pedido, se llame a refresh_orders_table_logic() y se realice un page.update() inmediato."
-            # My logic above does that. I will add a general page.update() at the end to be safe.
+                message, color = f"Ticket #{ticket_id} registrado ({len(cart)} platos)", ft.Colors.GREEN
+            if ticket_id is not None:
+                # Stored even when the write failed; the next save retries it
+                cart.clear()
+                refresh_cart_logic()
+            # Table and dashboard are refreshed by the single order_added event
+            overlays.notify(message, color)
             page.update()
 
         def delete_order_click(e, oid):
@@ -650,13 +424,17 @@ def main(page: ft.Page):
             page.update() # Update page
         
         # Search Logic
-        def filter_orders(query):
+        def filter_orders_logic(query):
+            search_state["query"] = query or ""
             if not query:
                 refresh_orders_table_logic()
             else:
-                q = query.lower()
-                filtered = [o for o in manager.orders if q in o['cliente'].lower() or q in o['plato'].lower()]
+                filtered = [o for o in manager.orders if matches_search(o)]
                 refresh_orders_table_logic(filtered)
+
+        def filter_orders(query):
+            with ui_lock:
+                filter_orders_logic(query)
             page.update()
 
         # --- INITIAL DATA POPULATION ---
@@ -666,6 +444,7 @@ def main(page: ft.Page):
         # Expose methods for external access
         create_sales_view.refresh_table = refresh_orders_table_logic
         create_sales_view.refresh_menu = refresh_menu_logic
+        create_sales_view.apply_event = apply_order_event
 
         view = ft.Row([
             # Left Column (Menu)
@@ -674,12 +453,22 @@ def main(page: ft.Page):
                     ft.Text("Carta", size=20, weight="bold"),
                     ft.Divider(),
                     ft.Row([client_input, date_btn]),
+                    client_suggestions,
+                    client_info,
                     ft.Row([
                         qty_input,
                         payment_group
                     ], alignment="spaceBetween", vertical_alignment="center"),
                     ft.Divider(),
-                    menu_items_container
+                    menu_items_container,
+                    ft.Divider(),
+                    ft.Row([ft.Text("Ticket", weight="bold", size=16), cart_total], alignment="spaceBetween"),
+                    cart_list,
+                    ft.Row([
+                        ft.TextButton("Vaciar", icon="delete_sweep", on_click=clear_cart_click),
+                        ft.ElevatedButton("Registrar Ticket", icon="receipt_long", on_click=commit_ticket_click,
+                            bgcolor=ft.Colors.PRIMARY, color=ft.Colors.ON_PRIMARY)
+                    ], alignment="spaceBetween")
                 ]),
                 width=350,
                 padding=10,
@@ -752,17 +541,43 @@ def main(page: ft.Page):
              end_date_picker.value = None
              update_dashboard_logic() 
 
+        compare_dd = ft.Dropdown(
+            label="Comparar con",
+            width=200,
+            value="semana",
+            options=[
+                ft.dropdown.Option("ninguno", "Sin comparar"),
+                ft.dropdown.Option("periodo", "Período anterior"),
+                ft.dropdown.Option("semana", "Semana anterior"),
+                ft.dropdown.Option("mes", "Mes anterior"),
+            ],
+            on_change=lambda e: update_dashboard_logic()
+        )
+
         date_range_row = ft.Row([
             ft.Text("Filtrar por Fecha:", weight="bold"),
             btn_start_date,
             btn_end_date,
-            ft.IconButton(icon=ft.Icons.FILTER_LIST_OFF, tooltip="Limpiar Filtros", on_click=lambda e: clear_filters())
+            ft.IconButton(icon=ft.Icons.FILTER_LIST_OFF, tooltip="Limpiar Filtros", on_click=lambda e: clear_filters()),
+            compare_dd
         ], alignment="center", spacing=20)
         
         # Financial KPIs
         stat_income = ft.Text("S/ 0.00", size=20, weight="bold")
         stat_expenses = ft.Text("S/ 0.00", size=20, weight="bold")
         stat_profit = ft.Text("S/ 0.00", size=25, weight="bold", color=ft.Colors.GREEN)
+        delta_income = ft.Text("", size=11)
+        delta_expenses = ft.Text("", size=11)
+        delta_profit = ft.Text("", size=11)
+
+        def show_delta(control, current, previous, label, up_is_good=True):
+            if previous is None:
+                control.value = ""
+                return
+            diff = current - previous
+            pct = f" ({diff / abs(previous) * 100:+.1f}%)" if previous else ""
+            control.value = f"{'▲' if diff >= 0 else '▼'} {fmt(diff, signed=True)}{pct} vs {label}"
+            control.color = ft.Colors.GREEN if (diff >= 0) == up_is_good else ft.Colors.RED
         
         # Charts
         chart_payment = ft.PieChart(sections=[], sections_space=0, center_space_radius=40, expand=True)
@@ -797,140 +612,77 @@ def main(page: ft.Page):
             expand=True
         )
 
+        # Series objects are created once; refreshes only swap their points
+        rush_series = ft.LineChartData(data_points=[], stroke_width=3, color=ft.Colors.CYAN, curved=True, stroke_cap_round=True)
+        rush_prev_series = ft.LineChartData(data_points=[], stroke_width=2, color=ft.Colors.GREY_400, curved=True, dash_pattern=[6, 4])
+
+        trend_sales_series = ft.LineChartData(data_points=[], stroke_width=2, color=ft.Colors.GREEN)
+        trend_expenses_series = ft.LineChartData(data_points=[], stroke_width=2, color=ft.Colors.RED)
+        trend_title = ft.Text("Ventas y Egresos", weight="bold")
+        chart_trend = ft.LineChart(
+            data_series=[trend_sales_series, trend_expenses_series],
+            border=ft.border.all(1, ft.Colors.GREY_400),
+            left_axis=ft.ChartAxis(labels_size=50, title=ft.Text("Monto S/", size=12)),
+            bottom_axis=ft.ChartAxis(labels=[], labels_size=30),
+            horizontal_grid_lines=ft.ChartGridLines(color=ft.Colors.GREY_300, width=1, dash_pattern=[3, 3]),
+            tooltip_bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.GREY_900),
+            min_y=0,
+            expand=True
+        )
+
+        # Weekday x hour heatmap: 168 cells built once, recolored on refresh
+        heat_title = ft.Text("Demanda por Día y Hora", weight="bold")
+        heat_dish_dd = ft.Dropdown(label="Plato", width=220, value="todos", on_change=lambda e: refresh_heatmap())
+        heat_cells = [[ft.Container(width=26, height=22, border_radius=3) for _ in range(24)] for _ in range(7)]
+        heat_grid = ft.Column([
+            ft.Row([ft.Container(width=36)] + [ft.Container(ft.Text(str(h), size=9), width=26, alignment=ft.alignment.center)
+                                               for h in range(24)], spacing=2),
+            *[ft.Row([ft.Container(ft.Text(WEEKDAY_LABELS[d], size=11), width=36)] + heat_cells[d], spacing=2)
+              for d in range(7)],
+        ], spacing=2)
+
+        def refresh_heatmap_logic():
+            s_date, e_date = start_date_picker.value, end_date_picker.value
+            heat_dish_dd.options = [ft.dropdown.Option("todos", "Todos los platos")] + [ft.dropdown.Option(d) for d in manager.menu]
+            plato = heat_dish_dd.value if heat_dish_dd.value in manager.menu else None
+            grid = demand_heatmap(manager, s_date, e_date, plato)
+            top = int(grid.max())
+            heat_title.value = ("Demanda por Día y Hora" + (f" · {plato}" if plato else "")
+                                + (" (período seleccionado)" if s_date and e_date else " (todo el historial)"))
+            for d in range(7):
+                for h in range(24):
+                    n = int(grid[d, h])
+                    cell = heat_cells[d][h]
+                    cell.bgcolor = ft.Colors.with_opacity(0.1 + 0.9 * n / top, ft.Colors.DEEP_ORANGE) if n else ft.Colors.GREY_100
+                    cell.tooltip = f"{WEEKDAY_LABELS[d]} {h}:00 · {n} pedidos"
+
+        def refresh_heatmap():
+            refresh_heatmap_logic()
+            page.update()
+
         # Analysis containers
         top_dishes_col = ft.Column()
         bottom_dishes_col = ft.Column()
         top_clients_col = ft.Column()
+        consumption_col = ft.Column()
+        margins_col = ft.Column()
+        forecast_col = ft.Column()
+        forecast_title = ft.Text("", size=12, color=ft.Colors.GREY)
         ai_insights_txt = ft.Text("", italic=True, size=14, color=ft.Colors.GREY_700)
 
         def generate_pdf(e):
-            s_date = start_date_picker.value.strftime("%Y-%m-%d") if start_date_picker.value else "Inicio"
-            e_date = end_date_picker.value.strftime("%Y-%m-%d") if end_date_picker.value else "Fin"
-            filename = f"reporte_cierre_{s_date}_a_{e_date}.pdf".replace(" ", "_")
-            
             try:
-                c = canvas.Canvas(filename, pagesize=letter)
-                width, height = letter
-                
-                # Header
-                c.setFont("Helvetica-Bold", 18)
-                c.drawString(50, height - 50, f"Cevichería YAFRANK - Reporte de Cierre")
-                c.setFont("Helvetica", 12)
-                c.drawString(50, height - 70, f"Periodo: {s_date} al {e_date}")
-                c.line(50, height - 80, width - 50, height - 80)
-                
-                # Financials
-                c.drawString(50, height - 110, f"Ingresos Totales: {stat_income.value}")
-                c.drawString(50, height - 130, f"Egresos Totales: {stat_expenses.value}")
-                c.setFont("Helvetica-Bold", 14)
-                c.drawString(50, height - 160, f"Utilidad Neta: {stat_profit.value}")
-                
-                # --- Detail Sections ---
-                y_pos = height - 200
-                
-                # Sales Detail
-                c.setFont("Helvetica-Bold", 10)
-                c.drawString(50, y_pos, "Detalle de Ventas")
-                y_pos -= 20
-                c.setFont("Helvetica", 8)
-                # Ventas: ID | Fecha | Cliente | Plato | Cant. | Precio Plato | Total.
-                # X: ID(30), Fecha(60), Cliente(140), Plato(260), Cant(380), Price(420), Total(480)
-                c.drawString(30, y_pos, "ID")
-                c.drawString(60, y_pos, "Fecha")
-                c.drawString(140, y_pos, "Cliente")
-                c.drawString(260, y_pos, "Plato")
-                c.drawString(380, y_pos, "Cant.")
-                c.drawString(420, y_pos, "P.Unit")
-                c.drawString(480, y_pos, "Total")
-                y_pos -= 15
-                
-                # Filter Sales
-                sales_data = manager.orders
-                if start_date_picker.value and end_date_picker.value:
-                     s = pd.to_datetime(start_date_picker.value)
-                     e = pd.to_datetime(end_date_picker.value) + pd.Timedelta(days=1)
-                     sales_data = [o for o in sales_data if s <= pd.to_datetime(o['fecha']) <= e]
-
-                for o in sales_data[:50]: # Expanded limit
-                    # Truncate strings
-                    d_str = str(o['fecha'])[:10]
-                    cli = o['cliente'][:15]
-                    pla = o['plato'][:15]
-                    
-                    c.drawString(30, y_pos, str(o['id']))
-                    c.drawString(60, y_pos, d_str)
-                    c.drawString(140, y_pos, cli)
-                    c.drawString(260, y_pos, pla)
-                    c.drawString(380, y_pos, str(o['cantidad']))
-                    c.drawString(420, y_pos, f"{o['precio']:.2f}")
-                    c.drawString(480, y_pos, f"{o['subtotal']:.2f}")
-                    
-                    y_pos -= 12
-                    if y_pos < 100: 
-                        c.showPage()
-                        y_pos = height - 50
-                        c.setFont("Helvetica", 8) 
-                
-                y_pos -= 30
-                if y_pos < 100: 
-                     c.showPage()
-                     y_pos = height - 50
-
-                # Expenses Detail
-                c.setFont("Helvetica-Bold", 10)
-                c.drawString(50, y_pos, "Detalle de Gastos")
-                y_pos -= 20
-                c.setFont("Helvetica", 8)
-                # Gastos: ID | Fecha | Insumo | Cant. | Precio Insumo | Total.
-                # X: ID(30), Fecha(60), Insumo(140), Cant(300), Price(350), Total(420)
-                c.drawString(30, y_pos, "ID")
-                c.drawString(60, y_pos, "Fecha")
-                c.drawString(140, y_pos, "Insumo")
-                c.drawString(300, y_pos, "Cant.")
-                c.drawString(350, y_pos, "P.Unit")
-                c.drawString(420, y_pos, "Total")
-                y_pos -= 15
-                
-                # Filter Expenses
-                exp_data = cost_manager.expenses
-                if start_date_picker.value and end_date_picker.value:
-                     s = pd.to_datetime(start_date_picker.value)
-                     e = pd.to_datetime(end_date_picker.value) + pd.Timedelta(days=1)
-                     exp_data = [x for x in exp_data if s <= pd.to_datetime(x['fecha']) <= e]
-
-                for x in exp_data[:50]:
-                     d_str = str(x['fecha'])[:10]
-                     item = x['item'][:20]
-                     
-                     c.drawString(30, y_pos, str(x['id']))
-                     c.drawString(60, y_pos, d_str)
-                     c.drawString(140, y_pos, item)
-                     c.drawString(300, y_pos, str(x['cantidad']))
-                     c.drawString(350, y_pos, f"{x['precio_unit']:.2f}")
-                     c.drawString(420, y_pos, f"{x['total']:.2f}")
-                     
-                     y_pos -= 12
-                     if y_pos < 100: 
-                         c.showPage()
-                         y_pos = height - 50
-                         c.setFont("Helvetica", 8)
-
-                # Summary Footer
-                c.setFont("Helvetica", 9)
-                c.drawString(50, 30, "Generado automáticamente por YAFRANK System ERP")
-                
-                c.save()
+                filename = generate_closing_pdf(manager, cost_manager, start_date_picker.value, end_date_picker.value)
                 
                 # Open File
                 os.startfile(filename) 
                 
-                snack = ft.SnackBar(ft.Text(f"PDF Generado: {filename}"), bgcolor=ft.Colors.GREEN)
-                page.overlay.append(snack)
+                overlays.notify(f"PDF Generado: {filename}")
                 page.update()
-                page.open(snack)
             except Exception as ex:
                 print(f"Error PDF: {ex}")
 
+        @timed("ui.update_dashboard_logic")
         def update_dashboard_logic():
             # 1. Get Dates
             s_date = start_date_picker.value
@@ -939,43 +691,65 @@ def main(page: ft.Page):
             btn_start_date.text = s_date.strftime("%Y-%m-%d") if s_date else "Desde"
             btn_end_date.text = e_date.strftime("%Y-%m-%d") if e_date else "Hasta"
 
-            # 2. Prepare Data
-            stats = manager.get_filtered_stats(s_date, e_date)
-            total_expenses, daily_exps = cost_manager.get_financials(s_date, e_date)
+            # Comparison window: without a range the dashboard shows today
+            base = (s_date, e_date) if s_date and e_date else (datetime.now(), datetime.now())
+            compare = comparison_period(*base, compare_dd.value)
+            compare_label = next((o.text for o in compare_dd.options if o.key == compare_dd.value), "").lower()
+
+            # 2. Prepare Data (both periods in one pass each)
+            stats = manager.get_filtered_stats(s_date, e_date, compare=compare)
+            if compare and s_date and e_date:
+                total_expenses, daily_exps, prev_fin = cost_manager.get_financials(s_date, e_date, compare=compare)
+            else:
+                # Expenses are only totalled for an explicit range
+                total_expenses, daily_exps = cost_manager.get_financials(s_date, e_date)
+                prev_fin = {"total": 0} if compare else None
             
             if not stats: 
                 # Zero state logic...
-                stat_income.value = "S/ 0.00"
-                stat_expenses.value = f"S/ {total_expenses:.2f}"
-                stat_profit.value = f"S/ {-total_expenses:.2f}"
+                stat_income.value = fmt(0)
+                stat_expenses.value = fmt(total_expenses)
+                stat_profit.value = fmt(-total_expenses)
+                for control in (delta_income, delta_expenses, delta_profit):
+                    control.value = ""
                 # ... clear charts etc ...
                 chart_payment.sections = []
                 chart_financial.bar_groups = []
                 chart_rush_hour.data_series = []
+                trend_sales_series.data_points = []
+                trend_expenses_series.data_points = []
                 page.update()
                 return
 
             # Financials
             income = stats['total_sales']
             profit = income - total_expenses
+            prev = stats.get('comparison')
+            prev_income = prev['total_sales'] if prev else None
+            prev_expenses = prev_fin['total'] if prev_fin else None
+            prev_profit = prev_income - prev_expenses if prev else None
             
-            stat_income.value = f"S/ {income:.2f}"
-            stat_expenses.value = f"S/ {total_expenses:.2f}"
-            stat_profit.value = f"S/ {profit:.2f}"
+            stat_income.value = fmt(income)
+            stat_expenses.value = fmt(total_expenses)
+            stat_profit.value = fmt(profit)
             stat_profit.color = ft.Colors.GREEN if profit >= 0 else ft.Colors.RED
+            show_delta(delta_income, income, prev_income, compare_label)
+            show_delta(delta_expenses, total_expenses, prev_expenses, compare_label, up_is_good=False)
+            show_delta(delta_profit, profit, prev_profit, compare_label)
             
-            # Update Financial Chart (Simple A vs B)
+            # Update Financial Chart (current vs comparison, side by side); the axis is in soles
+            def financial_rods(value, color, name, previous):
+                rods = [ft.BarChartRod(from_y=0, to_y=to_soles(value), width=40 if previous is None else 25, color=color, tooltip=f"{name}: {fmt(value)}", border_radius=5)]
+                if previous is not None:
+                    rods.append(ft.BarChartRod(from_y=0, to_y=to_soles(previous), width=25, color=ft.Colors.GREY_400, tooltip=f"{name} ({compare_label}): {fmt(previous)}", border_radius=5))
+                return rods
+
             chart_financial.bar_groups = [
-                ft.BarChartGroup(
-                    x=0,
-                    bar_rods=[ft.BarChartRod(from_y=0, to_y=income, width=40, color=ft.Colors.GREEN, tooltip=f"Ingresos: {income}", border_radius=5)]
-                ),
-                ft.BarChartGroup(
-                    x=1,
-                    bar_rods=[ft.BarChartRod(from_y=0, to_y=total_expenses, width=40, color=ft.Colors.RED, tooltip=f"Egresos: {total_expenses}", border_radius=5)]
-                ),
+                ft.BarChartGroup(x=0, bar_rods=financial_rods(income, ft.Colors.GREEN, "Ingresos", prev_income)),
+                ft.BarChartGroup(x=1, bar_rods=financial_rods(total_expenses, ft.Colors.RED, "Egresos", prev_expenses)),
             ]
-            chart_financial.max_y = max(income, total_expenses) * 1.2 if max(income, total_expenses) > 0 else 100
+            top_value = max(income, total_expenses, prev_income or 0, prev_expenses or 0)
+            chart_financial.max_y = to_soles(top_value) * 1.2 if top_value > 0 else 100
 
             # Payment Chart
             payment_sections = []
@@ -990,28 +764,38 @@ def main(page: ft.Page):
 
             # Rush Hour Chart
             rush_data = stats.get('rush_hour', {})
-            points = [ft.LineChartDataPoint(h, count) for h, count in rush_data.items()]
-            chart_rush_hour.data_series = [
-                ft.LineChartData(
-                    data_points=points,
-                    stroke_width=3,
-                    color=ft.Colors.CYAN,
-                    curved=True,
-                    stroke_cap_round=True,
-                )
-            ]
+            rush_series.data_points = [ft.LineChartDataPoint(h, count) for h, count in rush_data.items()]
+            chart_rush_hour.data_series = [rush_series]
             max_orders = max(rush_data.values()) if rush_data else 10
+            if prev:
+                prev_rush = prev['rush_hour']
+                rush_prev_series.data_points = [ft.LineChartDataPoint(h, count) for h, count in prev_rush.items()]
+                chart_rush_hour.data_series.append(rush_prev_series)
+                max_orders = max(max_orders, max(prev_rush.values()))
             chart_rush_hour.max_y = max_orders * 1.2
+            refresh_heatmap_logic()
+
+            # Sales/expenses trend: day, week or month buckets, at most charts.DEFAULT_BUDGET points per line
+            freq, labels, trend = trend_series({"ventas": stats['daily_sales_trend'], "egresos": daily_exps}, *base)
+            trend_sales_series.data_points = [ft.LineChartDataPoint(x, to_soles(v), tooltip=f"{labels[x]}: {fmt(v)}") for x, v in trend['ventas']]
+            trend_expenses_series.data_points = [ft.LineChartDataPoint(x, to_soles(v), tooltip=f"{labels[x]}: {fmt(v)}") for x, v in trend['egresos']]
+            chart_trend.bottom_axis.labels = [ft.ChartAxisLabel(value=x, label=ft.Text(text, size=10)) for x, text in axis_labels(labels)]
+            chart_trend.min_x, chart_trend.max_x = 0, max(len(labels) - 1, 1)
+            top_trend = max([v for _, v in trend['ventas'] + trend['egresos']], default=0)
+            chart_trend.max_y = to_soles(top_trend) * 1.2 if top_trend > 0 else 100
+            trend_title.value = f"Ventas y Egresos por {FREQ_LABELS[freq]}"
 
 
             # Detailed Lists
-            def build_mini_list(data, color):
+            def build_mini_list(data, color, mix_delta=None):
                 items = []
                 for item in data:
+                    shift = mix_delta.get(item['name']) if mix_delta else None
                     items.append(
                         ft.Container(
                             content=ft.Row([
                                 ft.Text(item['name'], size=12, expand=True),
+                                *([ft.Text(f"{shift:+.1f} pts", size=10, color=ft.Colors.GREY)] if shift is not None else []),
                                 ft.Text(f"{item['pct']:.1f}%", size=12, weight="bold", color=color)
                             ]),
                             padding=5,
@@ -1020,24 +804,85 @@ def main(page: ft.Page):
                     )
                 return items
             
-            top_dishes_col.controls = build_mini_list(stats['top_3_dishes'], ft.Colors.GREEN)
-            bottom_dishes_col.controls = build_mini_list(stats['bottom_3_dishes'], ft.Colors.RED)
+            mix_delta = stats['deltas']['dish_mix'] if prev else None
+            top_dishes_col.controls = build_mini_list(stats['top_3_dishes'], ft.Colors.GREEN, mix_delta)
+            bottom_dishes_col.controls = build_mini_list(stats['bottom_3_dishes'], ft.Colors.RED, mix_delta)
             top_clients_col.controls = build_mini_list(stats['top_3_clients'], ft.Colors.BLUE)
 
+            # Recipes: theoretical consumption vs purchases, margin after food cost.
+            # The shared inventory holds recetas.json (kept fresh by the catalog watcher)
+            inventory = cost_manager.inventory
+            recipes = inventory.recipes if inventory is not None else load_recipes()
+            sold = manager.aggregates.dish_sales(s_date, e_date) if manager.aggregates is not None else None
+            report = consumption_report(manager.snapshot(), cost_manager.expenses, recipes,
+                                        cost_manager.cost_dict, s_date, e_date, sold=sold)
+            consumption_col.controls = [
+                ft.Container(
+                    content=ft.Row([
+                        ft.Text(item, size=12, expand=True),
+                        ft.Text(f"{row.teorico:.1f} / {row.comprado:.1f}", size=12),
+                        ft.Text(f"{row.diferencia:+.1f}", size=12, weight="bold",
+                                color=ft.Colors.GREEN if row.diferencia >= 0 else ft.Colors.RED)
+                    ]),
+                    padding=5,
+                    border=ft.border.only(bottom=ft.border.BorderSide(0.5, ft.Colors.GREY_300))
+                )
+                for item, row in report['insumos'].iterrows()
+            ]
+            margins_col.controls = [
+                ft.Container(
+                    content=ft.Row([
+                        ft.Text(dish, size=12, expand=True),
+                        ft.Text(fmt(row.margen), size=12),
+                        ft.Text(f"{row.margen_pct:.1f}%", size=12, weight="bold", color=ft.Colors.AMBER_800)
+                    ]),
+                    padding=5,
+                    border=ft.border.only(bottom=ft.border.BorderSide(0.5, ft.Colors.GREY_300))
+                )
+                for dish, row in report['platos'].iterrows()
+            ]
+            if report['sin_receta']:
+                margins_col.controls.append(ft.Text(f"Sin receta: {', '.join(report['sin_receta'])}", size=11, italic=True, color=ft.Colors.GREY))
+
+            # Tomorrow's prep: independent of the selected range
+            if manager.forecast is not None:
+                pred = manager.forecast.predict()
+                hours = pred['tickets_por_hora']
+                peak = max(range(24), key=lambda h: hours[h])
+                forecast_title.value = f"{pred['fecha']}: ~{pred['tickets']:.0f} tickets, pico a las {peak}:00"
+                forecast_col.controls = [
+                    ft.Container(
+                        content=ft.Row([
+                            ft.Text(dish, size=12, expand=True),
+                            ft.Text(f"{qty:.0f} porc.", size=12, weight="bold", color=ft.Colors.INDIGO)
+                        ]),
+                        padding=5,
+                        border=ft.border.only(bottom=ft.border.BorderSide(0.5, ft.Colors.GREY_300))
+                    )
+                    for dish, qty in pred['platos'].items() if qty >= 0.5
+                ]
+
             # AI Insights
             trend_txt = "rentable" if profit > 0 else "en pérdida"
             ai_msg = f"Cierre Financiero: El negocio es {trend_txt}. Margen de utilidad: {(profit/income)*100 if income>0 else 0:.1f}%. Controlar egresos si es necesario."
+            if prev:
+                sales_pct = stats['deltas']['total_sales']['pct']
+                ticket_pct = stats['deltas']['ticket_average']['pct']
+                if sales_pct is not None:
+                    ai_msg += f" Ventas {sales_pct:+.1f}% vs {compare_label}"
+                    ai_msg += f", ticket promedio {ticket_pct:+.1f}%." if ticket_pct is not None else "."
             ai_insights_txt.value = ai_msg
 
             page.update()
 
-        def stat_card(title, value_control, icon, color):
+        def stat_card(title, value_control, icon, color, delta_control=None):
             return ft.Container(
                 content=ft.Row([
                     ft.Icon(icon, color=color, size=30),
                     ft.Column([
                         ft.Text(title, color=ft.Colors.GREY, size=12),
-                        value_control
+                        value_control,
+                        *([delta_control] if delta_control else [])
                     ])
                 ], alignment="center"),
                 padding=15,
@@ -1059,9 +904,9 @@ def main(page: ft.Page):
             
             # Financial KPIs
             ft.Row([
-                stat_card("Ingresos (Ventas Total)", stat_income, ft.Icons.TRENDING_UP, ft.Colors.GREEN),
-                stat_card("Egresos (Insumos/Gastos)", stat_expenses, ft.Icons.TRENDING_DOWN, ft.Colors.RED),  
-                stat_card("Utilidad Neta", stat_profit, ft.Icons.MONETIZATION_ON, ft.Colors.AMBER),  
+                stat_card("Ingresos (Ventas Total)", stat_income, ft.Icons.TRENDING_UP, ft.Colors.GREEN, delta_income),
+                stat_card("Egresos (Insumos/Gastos)", stat_expenses, ft.Icons.TRENDING_DOWN, ft.Colors.RED, delta_expenses),  
+                stat_card("Utilidad Neta", stat_profit, ft.Icons.MONETIZATION_ON, ft.Colors.AMBER, delta_profit),  
             ]),
 
             # Charts
@@ -1076,18 +921,37 @@ def main(page: ft.Page):
                 )
             ], expand=True),
             
+            # Trend Row
+            ft.Container(
+                content=ft.Column([trend_title, chart_trend], horizontal_alignment="center"),
+                bgcolor=ft.Colors.SURFACE, padding=20, border_radius=12, height=300
+            ),
+
             # Rush Hour Row
             ft.Container(
                 content=ft.Column([ft.Text("Hora Punta (Frecuencia de Pedidos por Hora)", weight="bold"), chart_rush_hour], horizontal_alignment="center"),
                 bgcolor=ft.Colors.SURFACE, padding=20, border_radius=12, height=300
             ),
 
+            # Weekday x Hour Row
+            ft.Container(
+                content=ft.Column([ft.Row([heat_title, ft.Container(expand=True), heat_dish_dd]), heat_grid]),
+                bgcolor=ft.Colors.SURFACE, padding=20, border_radius=12
+            ),
+
             # Lists
             ft.Row([
                 info_card("Top Platos Más Vendidos", top_dishes_col),
                 info_card("Top Platos Menos Vendidos", bottom_dishes_col),
                 info_card("Top Mejores Clientes", top_clients_col),
-            ], expand=True)
+            ], expand=True),
+
+            # Recipes
+            ft.Row([
+                info_card("Consumo Teórico vs Comprado (teórico / comprado)", consumption_col),
+                info_card("Margen Real por Plato (tras costo de insumos)", margins_col),
+                info_card("Pronóstico para Mañana", ft.Column([forecast_title, forecast_col])),
+            ], expand=True, vertical_alignment=ft.CrossAxisAlignment.START)
 
         ], expand=True, scroll=ft.ScrollMode.AUTO)
         
@@ -1139,32 +1003,25 @@ def main(page: ft.Page):
         def save_dish_click(e):
             if not menu_name.value or not menu_price.value: return
             name = menu_name.value
+            # Carta and management lists are redrawn by the menu_changed event, in every session
             manager.add_dish(name, menu_price.value)
             menu_name.value = ""
             menu_price.value = ""
-            refresh_mgmt_logic()
-            if hasattr(create_sales_view, 'refresh_menu'):
-                create_sales_view.refresh_menu()
             
-            snack = ft.SnackBar(ft.Text(f"Plato Guardado: {name}"), bgcolor=ft.Colors.GREEN)
-            page.overlay.append(snack)
+            overlays.notify(f"Plato Guardado: {name}")
             page.update()
-            page.open(snack)
 
         def delete_dish_click(e, dish):
             manager.delete_dish(dish)
-            refresh_mgmt_logic()
-            if hasattr(create_sales_view, 'refresh_menu'):
-                create_sales_view.refresh_menu()
-            page.update()
             
         def edit_dish_click(e, dish):
-            price = manager.menu.get(dish, 0.0)
+            price = manager.menu.get(dish, 0)
             menu_name.value = dish
-            menu_price.value = str(price)
+            menu_price.value = fmt_plain(price)
             menu_name.focus()
             page.update()
 
+        @timed("ui.refresh_mgmt_logic")
         def refresh_mgmt_logic():
             menu_list_view.controls.clear()
             for dish, price in manager.menu.items():
@@ -1173,7 +1030,7 @@ def main(page: ft.Page):
                         content=ft.Row([
                            ft.Row([
                                 ft.Text(dish, weight="bold", color=ft.Colors.ON_SURFACE, expand=True),
-                                ft.Text(f"S/ {price:.2f}", size=16, color=ft.Colors.PRIMARY, weight="bold")
+                                ft.Text(fmt(price), size=16, color=ft.Colors.PRIMARY, weight="bold")
                            ], expand=True, alignment=ft.MainAxisAlignment.SPACE_BETWEEN, vertical_alignment="center"),
                            
                            ft.Row([
@@ -1219,31 +1076,25 @@ def main(page: ft.Page):
         def save_cost_item_click(e):
             if not cost_name.value or not cost_val.value: return
             name = cost_name.value
+            # Both cost lists are redrawn by the costs_changed event
             cost_manager.add_cost_item(name, cost_val.value)
             cost_name.value = ""
             cost_val.value = ""
-            refresh_costs_logic()
-            # Also refresh Costs View if open? We can assume it refreshes on load or we expose a refresh method globally
-            create_costs_view.refresh_list()
             
-            snack = ft.SnackBar(ft.Text(f"Insumo Guardado: {name}"), bgcolor=ft.Colors.GREEN)
-            page.overlay.append(snack)
+            overlays.notify(f"Insumo Guardado: {name}")
             page.update()
-            page.open(snack)
 
         def edit_cost_item_click(e, item):
-            cost = cost_manager.cost_dict.get(item, 0.0)
+            cost = cost_manager.cost_dict.get(item, 0)
             cost_name.value = item
-            cost_val.value = str(cost)
+            cost_val.value = fmt_plain(cost)
             cost_name.focus()
             page.update()
 
         def delete_cost_item_click(e, item):
             cost_manager.delete_cost_item(item)
-            refresh_costs_logic()
-            create_costs_view.refresh_list()
-            page.update()
 
+        @timed("ui.refresh_costs_logic")
         def refresh_costs_logic():
             cost_list_view.controls.clear()
             for item, cost in cost_manager.cost_dict.items():
@@ -1252,7 +1103,7 @@ def main(page: ft.Page):
                         content=ft.Row([
                             ft.Row([
                                 ft.Text(item, weight="bold", color=ft.Colors.ON_SURFACE, expand=True),
-                                ft.Text(f"S/ {cost:.2f}", size=16, color=ft.Colors.PRIMARY, weight="bold")
+                                ft.Text(fmt(cost), size=16, color=ft.Colors.PRIMARY, weight="bold")
                             ], expand=True, alignment=ft.MainAxisAlignment.SPACE_BETWEEN, vertical_alignment="center"),
                             
                             ft.Row([
@@ -1293,6 +1144,7 @@ def main(page: ft.Page):
 
         # Expose refresh logic
         create_management_view.refresh_logic = refresh_mgmt_logic
+        create_management_view.refresh_costs = refresh_costs_logic
 
         return ft.Container(content=tabs, expand=True, padding=10, bgcolor=ft.Colors.SURFACE)
 
@@ -1322,6 +1174,7 @@ def main(page: ft.Page):
         entry_date_picker.on_change = on_date_change
 
         dict_list = ft.ListView(expand=True)
+        low_stock_col = ft.Column(spacing=2)
 
         def add_expense_click(e, item):
             try:
@@ -1331,19 +1184,57 @@ def main(page: ft.Page):
             
             d_str = entry_date_picker.value.strftime("%Y-%m-%d %H:%M:%S") if entry_date_picker.value else None
             
+            # History row arrives through the expense_added event
             cost_manager.add_expense(item, qty, d_str)
-            refresh_history_logic()
-            page.update()
 
+        def edit_minimum_click(e, item):
+            inventory = cost_manager.inventory
+            min_input = ft.TextField(label="Stock mínimo", value=str(inventory.minimums.get(item, "")), keyboard_type="number")
+
+            def save_minimum(e2):
+                try:
+                    qty = float(min_input.value) if min_input.value.strip() else None
+                except ValueError:
+                    return
+                inventory.set_minimum(item, qty)
+                overlays.close_dialog()
+                refresh_dict_list_logic()
+                page.update()
+
+            overlays.show_dialog(f"Mínimo de {item}", min_input, [ft.TextButton("Guardar", on_click=save_minimum)])
+
+        def stock_label(item):
+            inventory = cost_manager.inventory
+            if inventory is None or item not in inventory.stock:
+                return None
+            qty = inventory.stock[item]
+            minimum = inventory.minimums.get(item)
+            low = minimum is not None and qty < minimum
+            text = f"Stock: {qty:.2f}" + (f" (mín {minimum:g})" if minimum is not None else "")
+            return ft.TextButton(
+                content=ft.Text(text, size=11, color=ft.Colors.RED if low else ft.Colors.GREY, weight="bold" if low else None),
+                on_click=lambda e, i=item: edit_minimum_click(e, i)
+            )
+
+        @timed("ui.refresh_dict_list_logic")
         def refresh_dict_list_logic():
             dict_list.controls.clear()
+            inventory = cost_manager.inventory
+            low_stock_col.controls = [
+                ft.Text(f"⚠ {item}: {qty:.2f} (mín {minimum:g})", size=12, color=ft.Colors.RED, weight="bold")
+                for item, qty, minimum in (inventory.low_stock() if inventory else [])
+            ]
             for item, cost in cost_manager.cost_dict.items():
+                stock = stock_label(item)
                 dict_list.controls.append(
                     ft.Container(
                         content=ft.Row([
                             ft.Row([
-                                ft.Text(item, weight="bold", color=ft.Colors.ON_SURFACE, expand=True),
-                                ft.Text(f"S/ {cost:.2f}", size=16, color=ft.Colors.PRIMARY, weight="bold")
+                                ft.Column([
+                                    ft.Text(item, weight="bold", color=ft.Colors.ON_SURFACE),
+                                    *([stock] if stock else [])
+                                ], spacing=0, expand=True),
+                                ft.Text(fmt(cost), size=16, color=ft.Colors.PRIMARY, weight="bold")
                             ], expand=True, alignment=ft.MainAxisAlignment.SPACE_BETWEEN, vertical_alignment="center"),
                             
                             ft.IconButton(ft.Icons.ADD_CIRCLE, icon_color=ft.Colors.PRIMARY, 
@@ -1357,7 +1248,59 @@ def main(page: ft.Page):
                         bgcolor=ft.Colors.SURFACE
                     )
                 )
-        
+            refresh_supplies_logic()
+
+        # RIGHT: Purchases per supply, read from the rollups kept by the expense events
+        supply_widths = [170, 90, 90, 90, 150]
+        supplies_header = ft.Row(
+            controls=[ft.Container(ft.Text(h, weight="bold", size=12), width=w) for h, w in
+                      zip(["Insumo", "Este mes", "vs. mes ant.", "Promedio", "Último precio"], supply_widths)],
+            spacing=10
+        )
+        supplies_col = ft.Column(spacing=0, scroll=ft.ScrollMode.AUTO, height=180)
+
+        def show_supply_detail(e, item):
+            rollups = cost_manager.supplies
+
+            def lines(label, series):
+                return [ft.Text(label, weight="bold", size=12)] + [
+                    ft.Text(f"{period}: {qty:g} · {fmt(spend)} · {fmt(price)} c/u", size=12)
+                    for period, qty, spend, price in reversed(series)
+                ]
+
+            overlays.show_dialog(
+                f"Compras de {item}",
+                ft.Container(ft.Column(lines("Últimas 8 semanas", rollups.series(item, "W")[-8:])
+                                       + lines("Últimos 12 meses", rollups.series(item, "M")[-12:]),
+                                       scroll=ft.ScrollMode.AUTO), width=420, height=400),
+                [ft.TextButton("Cerrar", on_click=lambda _: overlays.close_dialog())],
+            )
+
+        @timed("ui.refresh_supplies_logic")
+        def refresh_supplies_logic():
+            rollups = cost_manager.supplies
+            supplies_col.controls = []
+            if rollups is None:
+                return
+            now = datetime.now()
+            this_month = rollups.period_spend(now.strftime("%Y-%m"))
+            last_month = rollups.period_spend((now.replace(day=1) - timedelta(days=1)).strftime("%Y-%m"))
+            for r in rollups.summary():
+                item = r['insumo']
+                cur, prev = this_month.get(item, 0), last_month.get(item, 0)
+                trend = f"{(cur - prev) / prev * 100:+.0f}%" if prev else "--"
+                moved = r['cambio_precio']
+                latest = fmt(r['ultimo_precio']) + (f" ({moved['pct']:+.1f}% vs catálogo)" if moved and moved['pct'] is not None else "")
+                cells = [
+                    ft.TextButton(item, on_click=lambda e, i=item: show_supply_detail(e, i)),
+                    ft.Text(fmt(cur), size=12),
+                    ft.Text(trend, size=12, color=ft.Colors.RED if cur > prev > 0 else ft.Colors.GREY),
+                    ft.Text(fmt(r['precio_promedio']), size=12),
+                    ft.Text(latest, size=12, color=ft.Colors.ORANGE if moved else None, weight="bold" if moved else None),
+                ]
+                supplies_col.controls.append(ft.Row([ft.Container(c, width=w) for c, w in zip(cells, supply_widths)],
+                                                    spacing=10))
+
         # RIGHT: History Table
         col_widths = [50, 120, 150, 80, 80, 80, 80]
         headers = ["ID", "Fecha", "Insumo", "Cant.", "Unit.", "Total", "Acciones"]
@@ -1373,30 +1316,56 @@ def main(page: ft.Page):
 
         def edit_exp_date_click(e, exp_id, current_date):
             # Similar to Orders Date Edit
+            picked = {}
+
+            def on_pick(value):
+                picked['date'] = value
+                pick_btn.text = value.strftime("%Y-%m-%d")
+                page.update()
+
             def save_exp_date(e2):
-                if dp.value:
-                    new_d = dp.value.strftime("%Y-%m-%d")
+                if picked:
+                    new_d = picked['date'].strftime("%Y-%m-%d")
                     final_d = f"{new_d} {current_date[11:]}" if len(current_date) > 10 else new_d
                     cost_manager.update_expense_date(exp_id, final_d)
-                    refresh_history_logic()
-                    page.close(dlg)
+                    overlays.close_dialog()
                     page.update()
-            
-            dp = ft.DatePicker(
-                first_date=datetime(2020, 1, 1),
-                last_date=datetime(2100, 12, 31)
-            )
-            page.overlay.append(dp)
-            dlg = ft.AlertDialog(
-                title=ft.Text("Editar Fecha Gasto"),
-                content=ft.ElevatedButton("Seleccionar", on_click=lambda _: page.open(dp)),
-                actions=[ft.TextButton("Guardar", on_click=save_exp_date)]
-            )
-            page.open(dlg)
 
+            pick_btn = ft.ElevatedButton("Seleccionar", on_click=lambda _: overlays.pick_date(on_pick))
+            overlays.show_dialog("Editar Fecha Gasto", pick_btn, [ft.TextButton("Guardar", on_click=save_exp_date)])
+
+
+        shown_expenses = {}
+        history_state = {"query": None}
+
+        def build_expense_row(ep):
+            row_c = [
+                ft.Text(str(ep['id'])),
+                ft.TextButton(str(ep['fecha'])[:10], on_click=lambda e, eid=ep['id'], d=ep['fecha']: edit_exp_date_click(e, eid, d)),
+                ft.Text(ep['item']),
+                ft.Text(str(ep['cantidad'])),
+                ft.Text(fmt_plain(ep['precio_unit'])),
+                ft.Text(fmt_plain(ep['total'])),
+                ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, icon_size=20,
+                    on_click=lambda e, eid=ep['id']: cost_manager.delete_expense(eid))
+            ]
+            cells = [ft.Container(c, width=w) for c, w in zip(row_c, col_widths)]
+            return ft.Container(
+                ft.Row(cells, spacing=10), 
+                padding=5, 
+                border=ft.border.only(bottom=ft.border.BorderSide(1, ft.Colors.GREY_200)),
+                scale=1.0,
+                animate_scale=ft.animation.Animation(300, ft.AnimationCurve.EASE_OUT),
+                on_hover=hover_effect,
+                bgcolor=ft.Colors.SURFACE,
+                data=ep
+            )
 
+        @timed("ui.refresh_history_logic")
         def refresh_history_logic(query=None):
+            history_state["query"] = query
             history_list.controls.clear()
+            shown_expenses.clear()
             exps = cost_manager.expenses
             if query:
                 q = query.lower()
@@ -1404,39 +1373,41 @@ def main(page: ft.Page):
             
             # Already sorted
             for ep in exps:
-                row_c = [
-                    ft.Text(str(ep['id'])),
-                    ft.TextButton(str(ep['fecha'])[:10], on_click=lambda e, eid=ep['id'], d=ep['fecha']: edit_exp_date_click(e, eid, d)),
-                    ft.Text(ep['item']),
-                    ft.Text(str(ep['cantidad'])),
-                    ft.Text(f"{ep['precio_unit']:.2f}"),
-                    ft.Text(f"{ep['total']:.2f}"),
-                    ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, icon_size=20,
-                        on_click=lambda e, eid=ep['id']: (cost_manager.delete_expense(eid), refresh_history_logic(), page.update()))
-                ]
-                cells = [ft.Container(c, width=w) for c, w in zip(row_c, col_widths)]
-                history_list.controls.append(
-                    ft.Container(
-                        ft.Row(cells, spacing=10), 
-                        padding=5, 
-                        border=ft.border.only(bottom=ft.border.BorderSide(1, ft.Colors.GREY_200)),
-                        scale=1.0,
-                        animate_scale=ft.animation.Animation(300, ft.AnimationCurve.EASE_OUT),
-                        on_hover=hover_effect,
-                        bgcolor=ft.Colors.SURFACE
-                    )
-                )
+                row = build_expense_row(ep)
+                shown_expenses[ep['id']] = row
+                history_list.controls.append(row)
             page.update()
 
+        @timed("ui.apply_expense_event")
+        def apply_expense_event(event):
+            if event.topic == EXPENSE_ADDED:
+                q = (history_state["query"] or "").lower()
+                controls = history_list.controls
+                for ep in event.data['expenses']:
+                    if ep['id'] in shown_expenses or (q and q not in ep['item'].lower()):
+                        continue
+                    pos = next((i for i, row in enumerate(controls) if row.data['fecha'] <= ep['fecha']), len(controls))
+                    row = build_expense_row(ep)
+                    controls.insert(pos, row)
+                    shown_expenses[ep['id']] = row
+            elif event.topic == EXPENSE_DELETED:
+                row = shown_expenses.pop(event.data['expense']['id'], None)
+                if row is not None:
+                    history_list.controls.remove(row)
+            elif event.topic in (EXPENSE_DATE_CHANGED, RESYNC):
+                refresh_history_logic(history_state["query"])
+
         refresh_dict_list_logic()
         refresh_history_logic()
         
         create_costs_view.refresh_list = refresh_dict_list_logic
+        create_costs_view.apply_event = apply_expense_event
 
         return ft.Row([
             ft.Container(content=ft.Column([
                 ft.Text("Registrar Gasto", weight="bold"),
                 ft.Row([qty_input, date_btn]),
+                low_stock_col,
                 ft.Divider(),
                 dict_list
             ]), width=300, bgcolor=ft.Colors.SURFACE, padding=10, border_radius=10),
@@ -1444,6 +1415,10 @@ def main(page: ft.Page):
             # Right Column Mirror
             ft.Container(
                 content=ft.Column([
+                    ft.Text("Compras por Insumo", weight="bold", size=20),
+                    supplies_header,
+                    supplies_col,
+                    ft.Divider(),
                     ft.Text("Historial de Egresos", weight="bold", size=20),
                     search_expenses,
                     ft.Row(
@@ -1468,6 +1443,80 @@ def main(page: ft.Page):
             )
         ], expand=True, spacing=10)
 
+    # 5. KITCHEN QUEUE VIEW
+    def create_kitchen_view():
+        tickets_list = ft.ListView(expand=True, spacing=8)
+        stat_pending = ft.Text("0", size=20, weight="bold")
+        stat_avg = ft.Text("--", size=20, weight="bold")
+        stat_p90 = ft.Text("--", size=20, weight="bold")
+        # Wait labels of the drawn tickets, refreshed by the per-second ticker
+        wait_texts = []
+
+        def wait_color(seconds):
+            if seconds >= 1200:
+                return ft.Colors.RED
+            if seconds >= 600:
+                return ft.Colors.ORANGE
+            return ft.Colors.GREEN
+
+        def build_ticket(o, now):
+            waited = wait_seconds(o, now)
+            wait_txt = ft.Text(format_duration(waited), size=18, weight="bold", color=wait_color(waited), data=o)
+            wait_texts.append(wait_txt)
+            return ft.Container(
+                content=ft.Row([
+                    ft.Column([
+                        ft.Text(f"#{o['id']}  {o['cliente']}", weight="bold"),
+                        ft.Text(f"{o['plato']} x {o['cantidad']}", size=16),
+                        ft.Text(str(o['fecha'])[11:16], size=12, color=ft.Colors.GREY),
+                    ], expand=True, spacing=2),
+                    wait_txt,
+                    ft.ElevatedButton("Entregado", icon="check", bgcolor=ft.Colors.GREEN, color="white",
+                        on_click=lambda e, oid=o['id']: manager.toggle_status(oid, 'entregado')),
+                ], spacing=15),
+                padding=12, bgcolor=ft.Colors.SURFACE, border_radius=10,
+                border=ft.border.only(left=ft.border.BorderSide(4, ft.Colors.ORANGE)),
+            )
+
+        @timed("ui.refresh_kitchen_logic")
+        def refresh_kitchen_logic():
+            now = datetime.now()
+            tickets_list.controls.clear()
+            wait_texts.clear()
+            for o in manager.kitchen.tickets(100):
+                tickets_list.controls.append(build_ticket(o, now))
+            stat_pending.value = str(len(manager.kitchen))
+            stats = manager.kitchen.prep_stats()
+            stat_avg.value = format_duration(stats['avg']) if stats['count'] else "--"
+            stat_p90.value = format_duration(stats['p90']) if stats['count'] else "--"
+
+        def tick():
+            now = datetime.now()
+            for txt in wait_texts:
+                waited = wait_seconds(txt.data, now)
+                txt.value = format_duration(waited)
+                txt.color = wait_color(waited)
+
+        def stat_box(title, value_control, icon, color):
+            return ft.Container(
+                content=ft.Row([ft.Icon(icon, color=color, size=30), ft.Column([ft.Text(title, color=ft.Colors.GREY, size=12), value_control])]),
+                padding=15, bgcolor=ft.Colors.SURFACE, border_radius=12, expand=True,
+            )
+
+        view = ft.Column([
+            ft.Text("Cola de Cocina", size=24, weight="bold"),
+            ft.Row([
+                stat_box("Pedidos en Cocina", stat_pending, ft.Icons.RESTAURANT, ft.Colors.ORANGE),
+                stat_box("Preparación Promedio", stat_avg, ft.Icons.TIMER, ft.Colors.BLUE),
+                stat_box("Preparación p90", stat_p90, ft.Icons.TIMER_OUTLINED, ft.Colors.RED),
+            ]),
+            tickets_list,
+        ], expand=True)
+
+        create_kitchen_view.refresh_logic = refresh_kitchen_logic
+        create_kitchen_view.tick = tick
+        return view
+
     # --- MAIN LAYOUT ASSEMBLY ---
     
     # Initialize views exactly ONCE
@@ -1475,10 +1524,61 @@ def main(page: ft.Page):
     dashboard_view = create_dashboard_view()
     management_view = create_management_view()
     costs_view = create_costs_view() # New View
+    kitchen_view = create_kitchen_view()
     
     content_area = ft.Container(content=sales_view, expand=True, padding=10)
 
+    # Live updates: every change made in any session reaches this one as an event
+    session = {}
+
+    def on_store_event(event):
+        store = event.data.get('store') if event.topic == RESYNC else None
+        with ui_lock:
+            if event.topic in ORDER_TOPICS or (event.topic == RESYNC and store != "gastos"):
+                create_sales_view.apply_event(event)
+            if event.topic in EXPENSE_TOPICS or (event.topic == RESYNC and store != "pedidos"):
+                create_costs_view.apply_event(event)
+            if event.topic == MENU_CHANGED:
+                create_sales_view.refresh_menu()
+                create_management_view.refresh_logic()
+            if event.topic == COSTS_CHANGED:
+                create_costs_view.refresh_list()
+                create_management_view.refresh_costs()
+            # Stock moves with every sale and purchase
+            if content_area.content is costs_view and (event.topic in ORDER_TOPICS or event.topic in EXPENSE_TOPICS) \
+                    and session['sub'].pending() == 0:
+                create_costs_view.refresh_list()
+            if content_area.content is kitchen_view and (event.topic in ORDER_TOPICS or event.topic == RESYNC) \
+                    and session['sub'].pending() == 0:
+                create_kitchen_view.refresh_logic()
+            # Bursts are coalesced: the dashboard is recomputed once the queue drains
+            if content_area.content is dashboard_view and session['sub'].pending() == 0:
+                create_dashboard_view.update_logic()
+        page.update()
+
+    session['sub'] = manager.bus.subscribe(on_store_event, name=f"sesion-{page.session_id}")
+
+    def kitchen_ticker():
+        # Wait times on the kitchen screen move every second without a store event
+        while not session.get('closed'):
+            time.sleep(1.0)
+            if content_area.content is kitchen_view and not session.get('closed'):
+                with ui_lock:
+                    create_kitchen_view.tick()
+                page.update()
+
+    def on_close(e):
+        session['closed'] = True
+        manager.bus.unsubscribe(session['sub'])
+
+    page.on_close = on_close
+    threading.Thread(target=kitchen_ticker, name=f"cocina-{page.session_id}", daemon=True).start()
+
     def nav_change(e):
+        with ui_lock:
+            nav_change_logic(e)
+
+    def nav_change_logic(e):
         selected_index = e.control.selected_index
         
         # 1. Assign Content
@@ -1494,6 +1594,9 @@ def main(page: ft.Page):
         elif selected_index == 3:
             content_area.content = management_view
             create_management_view.refresh_logic() # Call logic
+        elif selected_index == 4:
+            content_area.content = kitchen_view
+            create_kitchen_view.refresh_logic()
             
         # 2. Render Page (Single Update)
         page.update()
@@ -1525,6 +1628,11 @@ def main(page: ft.Page):
                 selected_icon_content=ft.Icon("settings"), 
                 label="Gestión"
             ),
+            ft.NavigationRailDestination(
+                icon="restaurant",
+                selected_icon="restaurant_menu",
+                label="Cocina"
+            ),
         ],
         on_change=nav_change,
         expand=True,
@@ -1537,6 +1645,28 @@ def main(page: ft.Page):
 
     theme_icon = ft.IconButton("dark_mode", on_click=theme_toggle)
 
+    # Hidden diagnostics: Ctrl+Shift+D shows the live latency histograms
+    def show_diagnostics():
+        overlays.show_dialog(
+            "Diagnóstico de Rendimiento",
+            ft.Container(
+                content=ft.Column([
+                    ft.Text(format_report(), font_family="monospace", size=11, selectable=True)
+                ], scroll=ft.ScrollMode.AUTO),
+                width=900, height=500
+            ),
+            [
+                ft.TextButton("Guardar", on_click=lambda _: dump_diagnostics("diagnostico.txt")),
+                ft.TextButton("Cerrar", on_click=lambda _: overlays.close_dialog()),
+            ],
+        )
+
+    def on_keyboard(e: ft.KeyboardEvent):
+        if e.ctrl and e.shift and e.key == "D":
+            show_diagnostics()
+
+    page.on_keyboard_event = on_keyboard
+
     page.add(
         ft.Row(
             [
@@ -1551,4 +1681,15 @@ def main(page: ft.Page):
     )
 
 if __name__ == "__main__":
-    ft.app(target=main)
+    parser = argparse.ArgumentParser(description="Cevichería YAFRANK")
+    parser.add_argument("--servidor", action="store_true", help="Modo multi-terminal: sirve la app por web a varias cajas")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--puerto", type=int, default=8550)
+    args = parser.parse_args()
+
+    if profiling_enabled():
+        atexit.register(dump_profile)
+    if args.servidor:
+        ft.app(target=main, view=ft.AppView.WEB_BROWSER, host=args.host, port=args.puerto)
+    else:
+        ft.app(target=main)
@@ -0,0 +1,134 @@
+"""Bounded chart series for the dashboard.
+
+A year of daily sales is 365 points and several years are thousands,
+all pushed to the Flet client on every refresh. Two steps keep the
+payload fixed whatever range is selected:
+
+* `choose_freq` picks the bucket from the range length (days up to three
+  months, weeks up to two years, months beyond) and `bucket` sums the
+  daily values into it, empty buckets included as zero;
+* `lttb` (Largest-Triangle-Three-Buckets) reduces what is left to a
+  point budget, keeping the points that shape the line (peaks, dips)
+  instead of averaging them away.
+
+The weekday x hour heatmap is a fixed 7x24 grid whatever the range: one
+`bincount` over weekday * 24 + hour, from the per-day hour counts of the
+dashboard aggregates or from the raw order stamps.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BUDGET = 60
+FREQ_LABELS = {"D": "día", "W": "semana", "M": "mes"}
+WEEKDAY_LABELS = ["Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom"]
+
+
+def choose_freq(start, end):
+    days = (pd.Timestamp(end).normalize() - pd.Timestamp(start).normalize()).days + 1
+    if days <= 92:
+        return "D"
+    if days <= 730:
+        return "W"
+    return "M"
+
+
+def bucket(daily, freq, start=None, end=None):
+    """Sum a {date: value} dict into a Series of `freq` periods covering start..end."""
+    if not daily and not (start and end):
+        return pd.Series(dtype=float)
+    s = pd.Series(daily, dtype=float)
+    s.index = pd.to_datetime(list(s.index))
+    first = pd.Timestamp(start) if start is not None else s.index.min()
+    last = pd.Timestamp(end) if end is not None else s.index.max()
+    periods = pd.period_range(first, last, freq=freq)
+    out = s.groupby(s.index.to_period(freq)).sum() if len(s) else pd.Series(dtype=float)
+    return out.reindex(periods, fill_value=0.0)
+
+
+def lttb(y, threshold):
+    """Indices of the `threshold` points of y that best keep its shape (x = 0..n-1)."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=float)
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    # Interior points split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def period_label(period, freq):
+    if freq == "M":
+        return period.strftime("%m/%y")
+    return period.start_time.strftime("%d/%m")
+
+
+def trend_series(series, start=None, end=None, budget=DEFAULT_BUDGET):
+    """Bucket and downsample several {date: value} dicts on a shared axis.
+
+    Returns (freq, labels, {name: [(x, value)]}) where x indexes labels;
+    every series has at most `budget` points.
+    """
+    dates = [d for daily in series.values() for d in daily]
+    if start is None or end is None:
+        if not dates:
+            return "D", [], {name: [] for name in series}
+        start = start or min(dates)
+        end = end or max(dates)
+    if isinstance(start, datetime):
+        start = start.date()
+    if isinstance(end, datetime):
+        end = end.date()
+    freq = choose_freq(start, end)
+    buckets = {name: bucket(daily, freq, start, end) for name, daily in series.items()}
+    periods = next(iter(buckets.values())).index if buckets else []
+    labels = [period_label(p, freq) for p in periods]
+    points = {}
+    for name, values in buckets.items():
+        idx = lttb(values.to_numpy(), budget)
+        points[name] = [(int(i), float(values.iat[i])) for i in idx]
+    return freq, labels, points
+
+
+def axis_labels(labels, count=6):
+    """About `count` evenly spaced (x, label) pairs for a bottom axis."""
+    if not labels:
+        return []
+    step = max(1, len(labels) // count)
+    return [(i, labels[i]) for i in range(0, len(labels), step)]
+
+
+def weekday_hour_counts(fechas):
+    """7x24 counts (Monday first) of "YYYY-MM-DD HH:MM:SS" stamps."""
+    fecha = pd.Series(fechas, dtype=object).astype(str)
+    if fecha.empty:
+        return np.zeros((7, 24), dtype=int)
+    weekday = pd.to_datetime(fecha.str[:10], format="%Y-%m-%d").dt.dayofweek.to_numpy()
+    hour = pd.to_numeric(fecha.str[11:13], errors='coerce').fillna(0).astype(int).to_numpy()
+    return np.bincount(weekday * 24 + hour, minlength=7 * 24).reshape(7, 24)
+
+
+def weekday_hour_grid(days, hourly):
+    """7x24 sum of per-day rows of 24 hour counts; days are "YYYY-MM-DD" strings."""
+    if not len(days):
+        return np.zeros((7, 24), dtype=int)
+    weekday = pd.to_datetime(pd.Series(days), format="%Y-%m-%d").dt.dayofweek.to_numpy()
+    cell = (weekday[:, None] * 24 + np.arange(24)).ravel()
+    weights = np.asarray(hourly, dtype=float).ravel()
+    return np.bincount(cell, weights=weights, minlength=7 * 24).reshape(7, 24).round().astype(int)
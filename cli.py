@@ -0,0 +1,393 @@
+"""Headless entry point: stats, closings and maintenance without Flet.
+
+    python cli.py stats --desde 2026-02-01 --hasta 2026-02-28
+    python cli.py stats --desde 2026-02-01 --hasta 2026-02-28 --comparar mes
+    python cli.py cierre --desde 2026-02-01 --hasta 2026-02-28 --formato pdf
+    python cli.py compactar
+    python cli.py exportar respaldo.json
+    python cli.py exportar ventas.csv --desde 2026-02-01 --hasta 2026-02-28 --pago Yape
+    python cli.py importar respaldo.json
+    python cli.py importar tickets.csv --tipo pedidos --rechazados rechazos.csv
+    python cli.py historial "2026-02-10 15:00:00" --pendientes
+    python cli.py precios --desde 2026-01-01 --hasta 2026-03-31 --como-en 2025-12-01 --mensual
+    python cli.py inventario --fecha "2026-02-12 15:00:00"
+    python cli.py inventario --minimo "Pescado (Kg)" 5
+    python cli.py pronostico --fecha 2026-02-14
+    python cli.py clientes --buscar juan
+    python cli.py insumos --insumo "Pescado (Kg)" --semanal
+
+Amounts are kept in cents and printed in soles.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, datetime
+
+from managers import OrderManager, CostManager, comparison_period
+from money import normalize_record, soles_tree
+
+# Report keys whose values (and everything below them) are amounts
+MONEY_KEYS = {
+    "total_sales", "ticket_average", "avg_price_per_dish", "daily_sales_trend", "total", "egresos", "utilidad",
+    "total_no_pagado", "precio", "subtotal", "gasto", "ticket_promedio", "precio_promedio", "ultimo_precio",
+    "precio_catalogo", "cambio_precio",
+}
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def to_jsonable(obj):
+    # Stats carry numpy scalars and date keys; json.dumps handles neither
+    if isinstance(obj, dict):
+        return {str(k) if isinstance(k, (date, datetime)) else k: to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    if hasattr(obj, 'item'):
+        return obj.item()
+    return obj
+
+
+def print_report(out):
+    print(json.dumps(to_jsonable(soles_tree(out, MONEY_KEYS)), ensure_ascii=False, indent=2))
+
+
+def build_managers(args):
+    manager = OrderManager(
+        filename=os.path.join(args.dir, "pedidos_cevicheria.xlsx"),
+        menu_file=os.path.join(args.dir, "menu.json"),
+    )
+    cost_manager = CostManager(
+        filename=os.path.join(args.dir, "gastos.xlsx"),
+        dict_file=os.path.join(args.dir, "costos.json"),
+    )
+    return manager, cost_manager
+
+
+def cmd_stats(args, manager, cost_manager):
+    compare = None
+    if args.comparar:
+        if not (args.desde and args.hasta):
+            print("--comparar requiere --desde y --hasta", file=sys.stderr)
+            return 1
+        compare = comparison_period(args.desde, args.hasta, args.comparar)
+    stats = manager.get_filtered_stats(args.desde, args.hasta, compare=compare)
+    financials = cost_manager.get_financials(args.desde, args.hasta, compare=compare)
+    total_expenses, daily_expenses = financials[:2]
+    out = {
+        "ventas": stats,
+        "egresos": {"total": total_expenses, "diario": daily_expenses},
+    }
+    if compare:
+        prev_fin = financials[2]
+        prev_sales = stats['comparison']['total_sales'] if stats else 0
+        sales = stats['total_sales'] if stats else 0
+        out["comparacion"] = {
+            "desde": compare[0].strftime("%Y-%m-%d"),
+            "hasta": compare[1].strftime("%Y-%m-%d"),
+            "egresos": prev_fin,
+            "utilidad": {"actual": sales - total_expenses, "anterior": prev_sales - prev_fin['total']},
+        }
+    print_report(out)
+    return 0
+
+
+def cmd_cierre(args, manager, cost_manager):
+    # Imported here so the other subcommands never pay for reportlab
+    from reports import generate_closing_pdf, generate_closing_xlsx
+
+    if args.formato == "pdf":
+        filename = generate_closing_pdf(manager, cost_manager, args.desde, args.hasta, args.salida)
+    else:
+        filename = generate_closing_xlsx(manager, cost_manager, args.desde, args.hasta, args.salida)
+    print(f"Reporte generado: {filename}")
+    return 0
+
+
+def cmd_compactar(args, manager, cost_manager):
+    removed_orders, err_orders = manager.compact()
+    removed_exps, err_exps = cost_manager.compact()
+    for err in (err_orders, err_exps):
+        if err:
+            print(f"Error guardando: {err}", file=sys.stderr)
+            return 1
+    print(f"Pedidos duplicados eliminados: {removed_orders}")
+    print(f"Gastos duplicados eliminados: {removed_exps}")
+    return 0
+
+
+def cmd_exportar(args, manager, cost_manager):
+    if not args.archivo.lower().endswith(".json"):
+        return export_table(args, manager, cost_manager)
+    data = {"pedidos": manager.orders, "gastos": cost_manager.expenses}
+    with open(args.archivo, 'w', encoding='utf-8') as f:
+        json.dump(to_jsonable(data), f, ensure_ascii=False, indent=2)
+    print(f"Exportados {len(manager.orders)} pedidos y {len(cost_manager.expenses)} gastos a {args.archivo}")
+    return 0
+
+
+def export_table(args, manager, cost_manager):
+    from exporter import export_orders, export_expenses
+
+    try:
+        if args.tipo == "gastos":
+            result = export_expenses(cost_manager, args.archivo, args.desde, args.hasta,
+                                     item=args.insumo, chunk_size=args.chunk)
+        else:
+            result = export_orders(manager, args.archivo, args.desde, args.hasta, cliente=args.cliente,
+                                   plato=args.plato, metodo_pago=args.pago, chunk_size=args.chunk)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error exportando: {e}", file=sys.stderr)
+        return 1
+    print(f"Exportados {result['rows']} {args.tipo} a {args.archivo} en {result['chunks']} bloques: "
+          f"{result['seconds']:.2f} s, {result['rows_per_s']:.0f} filas/s, {result['bytes'] / 1e6:.1f} MB")
+    return 0
+
+
+def cmd_importar(args, manager, cost_manager):
+    if not args.archivo.lower().endswith(".json"):
+        return import_table(args, manager, cost_manager)
+    with open(args.archivo, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # Backups written before amounts were cents hold soles
+    orders = [normalize_record(o) for o in data.get("pedidos", [])]
+    expenses = [normalize_record(e) for e in data.get("gastos", [])]
+    for err in (manager.import_orders(orders), cost_manager.import_expenses(expenses)):
+        if err:
+            print(f"Error guardando: {err}", file=sys.stderr)
+            return 1
+    print(f"Importados {len(orders)} pedidos y {len(expenses)} gastos")
+    return 0
+
+
+def import_table(args, manager, cost_manager):
+    from importer import import_orders_file, import_expenses_file, write_rejected
+
+    try:
+        if args.tipo == "gastos":
+            imported, rejected, err = import_expenses_file(cost_manager, args.archivo)
+        else:
+            imported, rejected, err = import_orders_file(manager, args.archivo)
+    except (OSError, ValueError) as e:
+        print(f"Error leyendo {args.archivo}: {e}", file=sys.stderr)
+        return 1
+    if err:
+        print(f"Error guardando: {err}", file=sys.stderr)
+        return 1
+    print(f"Importados {imported} {args.tipo}, rechazados {len(rejected)}")
+    if len(rejected):
+        if args.rechazados:
+            write_rejected(rejected, args.rechazados)
+            print(f"Detalle de rechazos: {args.rechazados}")
+        else:
+            print(rejected[["fila", "motivo"]].head(20).to_string(index=False))
+            if len(rejected) > 20:
+                print("... (use --rechazados para el detalle completo)")
+    return 0
+
+
+def cmd_historial(args, manager, cost_manager):
+    from history import History
+
+    history = History(os.path.join(args.dir, "historial"))
+    try:
+        state = history.state_at(args.momento)
+    except ValueError as e:
+        print(f"Fecha inválida: {e}", file=sys.stderr)
+        return 1
+    if state is None:
+        print("No hay historial registrado para ese momento", file=sys.stderr)
+        return 1
+    orders = state['pedidos']
+    if args.pendientes:
+        orders = [o for o in orders if not o['pagado']]
+    out = {
+        "momento": args.momento,
+        "pedidos": len(state['pedidos']),
+        "gastos": len(state['gastos']),
+        "no_pagados": sum(1 for o in state['pedidos'] if not o['pagado']),
+        "total_no_pagado": sum(o['subtotal'] for o in state['pedidos'] if not o['pagado']),
+    }
+    if args.pendientes:
+        out["detalle"] = orders
+    print_report(out)
+    return 0
+
+
+def cmd_precios(args, manager, cost_manager):
+    from prices import PriceTable, revenue_series, cost_series
+
+    prices = PriceTable(os.path.join(args.dir, "precios.json"))
+    prices.attach(manager, cost_manager)
+    freq = "M" if args.mensual else "D"
+    at = args.como_en.strftime("%Y-%m-%d") if args.como_en else None
+    out = {
+        "precios_de": at or "fecha de cada venta",
+        "ingresos": revenue_series(prices, manager.snapshot(), args.desde, args.hasta, at, freq),
+        "egresos": cost_series(prices, cost_manager.expenses, args.desde, args.hasta, at, freq),
+    }
+    for key in ("ingresos", "egresos"):
+        df = out[key]
+        out[key] = {str(period): row for period, row in (df / 100).round(2).to_dict("index").items()}
+    print(json.dumps(to_jsonable(out), ensure_ascii=False, indent=2))
+    return 0
+
+
+def cmd_inventario(args, manager, cost_manager):
+    from inventory import Inventory
+
+    inventory = Inventory(os.path.join(args.dir, "recetas.json"), os.path.join(args.dir, "inventario.json"))
+    inventory.attach(manager, cost_manager)
+    if args.minimo:
+        item, qty = args.minimo
+        if item not in inventory.items:
+            print(f"'{item}' no figura en ninguna receta", file=sys.stderr)
+            return 1
+        try:
+            inventory.set_minimum(item, float(qty))
+        except ValueError:
+            print(f"Cantidad inválida: {qty}", file=sys.stderr)
+            return 1
+    stock = inventory.stock_at(args.fecha) if args.fecha else {i: inventory.stock.get(i, 0.0) for i in inventory.items}
+    out = {
+        "momento": args.fecha or "actual",
+        "stock": {item: round(qty, 3) for item, qty in stock.items()},
+        "minimos": inventory.minimums,
+        "bajo_minimo": [item for item, qty in stock.items()
+                        if item in inventory.minimums and qty < inventory.minimums[item]],
+    }
+    print(json.dumps(to_jsonable(out), ensure_ascii=False, indent=2))
+    return 0
+
+
+def cmd_pronostico(args, manager, cost_manager):
+    from forecast import DemandForecast
+
+    forecast = DemandForecast(args.vida_media).attach(manager)
+    pred = forecast.predict(args.fecha)
+    out = {
+        "fecha": pred["fecha"],
+        "tickets": round(pred["tickets"], 1),
+        "tickets_por_hora": {h: round(v, 1) for h, v in enumerate(pred["tickets_por_hora"]) if v >= 0.05},
+        "platos": {dish: round(qty, 1) for dish, qty in pred["platos"].items()},
+    }
+    print(json.dumps(to_jsonable(out), ensure_ascii=False, indent=2))
+    return 0
+
+
+def cmd_clientes(args, manager, cost_manager):
+    from customers import CustomerIndex
+
+    index = CustomerIndex().attach(manager)
+    clients = index.suggest(args.buscar, args.top) if args.buscar else index.top(args.top)
+    print_report({"clientes": len(index.clients), "resultado": clients})
+    return 0
+
+
+def cmd_insumos(args, manager, cost_manager):
+    from supplies import SupplyRollups
+
+    rollups = SupplyRollups().attach(cost_manager)
+    if args.insumo:
+        summary = rollups.summary(args.insumo)
+        if summary is None:
+            print(f"Sin compras de '{args.insumo}'", file=sys.stderr)
+            return 1
+        freq = "W" if args.semanal else "M"
+        out = {**summary, "periodos": [
+            {"periodo": period, "cantidad": round(qty, 3), "gasto": spend, "precio_promedio": price}
+            for period, qty, spend, price in rollups.series(args.insumo, freq, args.desde, args.hasta)
+        ]}
+    else:
+        out = {"insumos": rollups.summary(), "cambios_de_precio": [r["insumo"] for r in rollups.price_changes()]}
+    print_report(out)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Cevichería YAFRANK sin interfaz gráfica")
+    parser.add_argument("--dir", default=".", help="Carpeta con pedidos, gastos, menú y costos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    def add_range(p):
+        p.add_argument("--desde", type=parse_date, help="Fecha inicial YYYY-MM-DD")
+        p.add_argument("--hasta", type=parse_date, help="Fecha final YYYY-MM-DD")
+
+    p = sub.add_parser("stats", help="Estadísticas de ventas y egresos en JSON")
+    add_range(p)
+    p.add_argument("--comparar", choices=["periodo", "semana", "mes"], help="Incluir el cambio frente a otro período")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("cierre", help="Reporte de cierre en PDF o xlsx")
+    add_range(p)
+    p.add_argument("--formato", choices=["pdf", "xlsx"], default="pdf")
+    p.add_argument("--salida", help="Nombre del archivo de salida")
+    p.set_defaults(func=cmd_cierre)
+
+    p = sub.add_parser("compactar", help="Reescribe los libros eliminando ids duplicados")
+    p.set_defaults(func=cmd_compactar)
+
+    p = sub.add_parser("exportar", help="Exporta pedidos y gastos a JSON, CSV o Parquet")
+    p.add_argument("archivo")
+    p.add_argument("--tipo", choices=["pedidos", "gastos"], default="pedidos", help="Contenido del CSV/Parquet")
+    add_range(p)
+    p.add_argument("--cliente")
+    p.add_argument("--plato")
+    p.add_argument("--pago", help="Método de pago")
+    p.add_argument("--insumo", help="Solo gastos de este insumo")
+    p.add_argument("--chunk", type=int, default=10000, help="Filas por bloque")
+    p.set_defaults(func=cmd_exportar)
+
+    p = sub.add_parser("importar", help="Importa pedidos y gastos desde JSON, CSV o xlsx")
+    p.add_argument("archivo")
+    p.add_argument("--tipo", choices=["pedidos", "gastos"], default="pedidos", help="Contenido del CSV/xlsx")
+    p.add_argument("--rechazados", help="Guardar las filas rechazadas (CSV o xlsx)")
+    p.set_defaults(func=cmd_importar)
+
+    p = sub.add_parser("historial", help="Estado de pedidos y gastos en un momento pasado")
+    p.add_argument("momento", help='"YYYY-MM-DD HH:MM:SS"')
+    p.add_argument("--pendientes", action="store_true", help="Listar los pedidos no pagados en ese momento")
+    p.set_defaults(func=cmd_historial)
+
+    p = sub.add_parser("precios", help="Ingresos y egresos reales vs. valorizados con la tabla de precios")
+    add_range(p)
+    p.add_argument("--como-en", type=parse_date, help="Valorizar todo con los precios vigentes en esta fecha")
+    p.add_argument("--mensual", action="store_true", help="Agrupar por mes en vez de por día")
+    p.set_defaults(func=cmd_precios)
+
+    p = sub.add_parser("inventario", help="Stock de insumos según compras y recetas")
+    p.add_argument("--fecha", help='Stock al cierre de "YYYY-MM-DD" o en "YYYY-MM-DD HH:MM:SS"')
+    p.add_argument("--minimo", nargs=2, metavar=("INSUMO", "CANT"), help="Fijar el stock mínimo de un insumo")
+    p.set_defaults(func=cmd_inventario)
+
+    p = sub.add_parser("pronostico", help="Tickets y porciones esperados por plato y hora")
+    p.add_argument("--fecha", help="Día a pronosticar YYYY-MM-DD (por defecto mañana)")
+    p.add_argument("--vida-media", type=float, default=28, help="Días tras los que un dato pesa la mitad")
+    p.set_defaults(func=cmd_pronostico)
+
+    p = sub.add_parser("clientes", help="Clientes por gasto acumulado, o búsqueda por nombre")
+    p.add_argument("--buscar", help="Inicio de cualquier palabra del nombre")
+    p.add_argument("--top", type=int, default=10, help="Cuántos clientes listar")
+    p.set_defaults(func=cmd_clientes)
+
+    p = sub.add_parser("insumos", help="Compras por insumo: cantidades, gasto y precios por semana o mes")
+    p.add_argument("--insumo", help="Detalle de un insumo por período")
+    p.add_argument("--semanal", action="store_true", help="Agrupar por semana en vez de por mes")
+    add_range(p)
+    p.set_defaults(func=cmd_insumos)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    manager, cost_manager = build_managers(args)
+    return args.func(args, manager, cost_manager)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
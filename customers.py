@@ -0,0 +1,246 @@
+"""Customer index: one entry per regular however the name was typed.
+
+Names are reduced to a key (trimmed, single spaces, lower case, no
+accents), so "Juan", "juan " and "JUÁN" are the same client. For each key
+the index keeps running totals updated from the store events: lines,
+visits (tickets), spend (cents), last visit, portions per dish and the
+spellings seen (the most used one is shown).
+
+Autocomplete is a bisect over a sorted list of (word suffix, key) pairs:
+every word start of every key is an entry, so "per" finds "Juan Pérez"
+as well as "Pedro". A prefix lookup is two bisects plus ranking the
+matches by spend. One or two letters can match thousands of clients; for
+those the clients are walked in spend order (a ranking re-sorted at most
+once a minute) until enough match, so every lookup stays well under a
+millisecond with tens of thousands of clients.
+"""
+import bisect
+import heapq
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import events
+
+ANONYMOUS = {"", "sin nombre"}
+# Prefixes matching more clients than this are answered from the spend ranking
+BROAD_MATCHES = 256
+# The ranking is re-sorted at most this often (seconds)
+RANKING_TTL = 60.0
+
+
+def clean_name(name):
+    return " ".join(str(name).split())
+
+
+def normalize_name(name):
+    text = unicodedata.normalize("NFKD", clean_name(name).casefold())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _tokens(key):
+    # Every word start: "juan perez" -> "juan perez", "perez"
+    return [key[i:] for i, c in enumerate(key) if c != " " and (i == 0 or key[i - 1] == " ")]
+
+
+def _opens_ticket(o):
+    return o.get('ticket_id', o['id']) == o['id']
+
+
+class CustomerIndex:
+    def __init__(self):
+        self.clients = {}
+        # Sorted (token, key) pairs for prefix search
+        self._tokens = []
+        # Keys whose last visit must be recomputed after a delete or date edit
+        self._stale = set()
+        # (built_at, [(key, tokens)] biggest spenders first), for broad prefixes
+        self._ranking = None
+        self._lock = threading.RLock()
+        self._manager = None
+
+    def attach(self, manager):
+        self._manager = manager
+        self.rebuild(manager.snapshot())
+        manager.bus.add_listener(self.on_event)
+        return self
+
+    # --- building ---
+
+    def rebuild(self, orders):
+        """Recompute the whole index from a list of orders (newest first)."""
+        df = pd.DataFrame(orders, columns=['id', 'ticket_id', 'fecha', 'cliente', 'plato', 'cantidad', 'subtotal'])
+        clients = {}
+        if not df.empty:
+            # Normalize each distinct spelling once, then work on integer codes
+            spell_codes, spellings = pd.factorize(df['cliente'].fillna("").astype(str))
+            spell_keys = [normalize_name(s) for s in spellings]
+            key_of_spelling, keys = pd.factorize(pd.Series(spell_keys, dtype=object))
+            codes = key_of_spelling[spell_codes]
+            keys, spellings = list(keys), list(spellings)
+            n = len(keys)
+            dish_codes, dishes = pd.factorize(df['plato'])
+            dishes = list(dishes)
+
+            lines = np.bincount(codes, minlength=n)
+            visits = np.bincount(codes, weights=(df['ticket_id'].fillna(df['id']) == df['id']).to_numpy(dtype=float),
+                                 minlength=n)
+            spend = np.bincount(codes, weights=df['subtotal'].to_numpy(dtype=float), minlength=n)
+            # Newest first: a client's first row is its last visit
+            _, first_row = np.unique(codes, return_index=True)
+            fechas = df['fecha'].astype(str).to_numpy()
+            portions = np.bincount(codes * len(dishes) + dish_codes, weights=df['cantidad'].to_numpy(dtype=float),
+                                   minlength=n * len(dishes)).reshape(n, len(dishes))
+            spelling_uses = np.bincount(spell_codes, minlength=len(spellings))
+
+            for c, key in enumerate(keys):
+                clients[key] = {
+                    "lineas": int(lines[c]),
+                    "visitas": int(visits[c]),
+                    "gasto": int(round(spend[c])),
+                    "ultima_visita": fechas[first_row[c]],
+                    "platos": Counter(),
+                    "nombres": Counter(),
+                }
+            rows, cols = np.nonzero(portions)
+            for c, d, qty in zip(rows.tolist(), cols.tolist(), portions[rows, cols].tolist()):
+                clients[keys[c]]["platos"][dishes[d]] = int(qty)
+            for spelling, k, uses in zip(spellings, key_of_spelling.tolist(), spelling_uses.tolist()):
+                clients[keys[k]]["nombres"][clean_name(spelling)] += uses
+            for key in ANONYMOUS:
+                clients.pop(key, None)
+
+        tokens = sorted((token, key) for key in clients for token in _tokens(key))
+        with self._lock:
+            self.clients = clients
+            self._tokens = tokens
+            self._stale = set()
+            self._ranking = None
+
+    def add(self, o, sign=1):
+        """Count (sign=1) or uncount (sign=-1) one order line."""
+        key = normalize_name(o['cliente'])
+        if key in ANONYMOUS:
+            return
+        fecha = str(o['fecha'])
+        with self._lock:
+            rec = self.clients.get(key)
+            if rec is None:
+                if sign < 0:
+                    return
+                rec = self.clients[key] = {"lineas": 0, "visitas": 0, "gasto": 0, "ultima_visita": "",
+                                           "platos": Counter(), "nombres": Counter()}
+                for token in _tokens(key):
+                    bisect.insort(self._tokens, (token, key))
+            rec["lineas"] += sign
+            rec["visitas"] += sign if _opens_ticket(o) else 0
+            rec["gasto"] += sign * o['subtotal']
+            rec["platos"][o['plato']] += sign * o['cantidad']
+            rec["nombres"][clean_name(o['cliente'])] += sign
+            if sign > 0:
+                rec["ultima_visita"] = max(rec["ultima_visita"], fecha)
+            elif fecha >= rec["ultima_visita"]:
+                self._stale.add(key)
+            if rec["lineas"] <= 0:
+                self._drop(key)
+
+    def _drop(self, key):
+        del self.clients[key]
+        self._stale.discard(key)
+        for token in _tokens(key):
+            i = bisect.bisect_left(self._tokens, (token, key))
+            if i < len(self._tokens) and self._tokens[i] == (token, key):
+                del self._tokens[i]
+
+    def on_event(self, event):
+        t, d = event.topic, event.data
+        if t == events.ORDER_ADDED:
+            for o in d['orders']:
+                self.add(o)
+        elif t == events.ORDER_DELETED:
+            self.add(d['order'], -1)
+        elif t == events.DATE_CHANGED:
+            self.add(d['previous'], -1)
+            self.add(d['order'])
+        elif t == events.RESYNC and d.get('store') != "gastos" and self._manager is not None:
+            self.rebuild(self._manager.snapshot())
+
+    # --- lookups ---
+
+    def _refresh_stale(self):
+        # Deleting the latest order of a client is rare; only then is its history scanned
+        if not self._stale or self._manager is None:
+            return
+        stale, self._stale = self._stale, set()
+        last = {}
+        for o in self._manager.snapshot():
+            key = normalize_name(o['cliente'])
+            if key in stale and key not in last:
+                # Newest first: the first order seen is the last visit
+                last[key] = str(o['fecha'])
+        for key in stale:
+            if key in self.clients:
+                self.clients[key]["ultima_visita"] = last.get(key, "")
+
+    def _public(self, key, rec):
+        favorite = max(rec["platos"].items(), key=lambda kv: kv[1], default=(None, 0))
+        return {
+            "clave": key,
+            "nombre": rec["nombres"].most_common(1)[0][0] if rec["nombres"] else key,
+            "visitas": rec["visitas"],
+            "gasto": rec["gasto"],
+            "ticket_promedio": rec["gasto"] / rec["visitas"] if rec["visitas"] else rec["gasto"],
+            "ultima_visita": rec["ultima_visita"],
+            "plato_favorito": favorite[0] if favorite[1] > 0 else None,
+        }
+
+    def get(self, name):
+        key = normalize_name(name)
+        with self._lock:
+            rec = self.clients.get(key)
+            if rec is None:
+                return None
+            if key in self._stale:
+                self._refresh_stale()
+            return self._public(key, rec)
+
+    def _spend_ranking(self):
+        ranking = self._ranking
+        if ranking is None or time.monotonic() - ranking[0] > RANKING_TTL:
+            order = sorted(self.clients, key=lambda k: self.clients[k]["gasto"], reverse=True)
+            ranking = self._ranking = (time.monotonic(), [(k, _tokens(k)) for k in order])
+        return ranking[1]
+
+    def suggest(self, prefix, limit=6):
+        """Clients with a word starting with `prefix`, biggest spenders first."""
+        p = normalize_name(prefix)
+        if not p:
+            return []
+        with self._lock:
+            tokens = self._tokens
+            lo = bisect.bisect_left(tokens, (p,))
+            hi = bisect.bisect_left(tokens, (p + "\uffff",), lo)
+            if hi - lo <= BROAD_MATCHES:
+                keys = {key for _, key in tokens[lo:hi]}
+                best = heapq.nlargest(limit, keys, key=lambda k: self.clients[k]["gasto"])
+            else:
+                best = []
+                for key, key_tokens in self._spend_ranking():
+                    if key in self.clients and any(t.startswith(p) for t in key_tokens):
+                        best.append(key)
+                        if len(best) == limit:
+                            break
+            if self._stale.intersection(best):
+                self._refresh_stale()
+            return [self._public(k, self.clients[k]) for k in best]
+
+    def top(self, n=10):
+        with self._lock:
+            best = heapq.nlargest(n, self.clients, key=lambda k: self.clients[k]["gasto"])
+            if self._stale.intersection(best):
+                self._refresh_stale()
+            return [self._public(k, self.clients[k]) for k in best]
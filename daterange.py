@@ -0,0 +1,42 @@
+"""Date-range lookups on the managers' newest-first record lists.
+
+Orders and expenses are kept sorted by "fecha" (newest first), so a range
+is two bisects on the "YYYY-MM-DD HH:MM:SS" strings instead of a scan.
+Bounds may be dates, datetimes or ISO strings; only the day counts, and
+the end day is included whole.
+"""
+import bisect
+
+
+class _AscendingDates:
+    # Managers keep records newest first; this reads them as an ascending sequence for bisect
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        return str(self.records[len(self.records) - 1 - i]['fecha'])
+
+
+def day_key(value):
+    """The day of a date, datetime or ISO string as "YYYY-MM-DD"."""
+    if isinstance(value, str):
+        return value[:10]
+    return value.strftime("%Y-%m-%d")
+
+
+def date_bounds(records, start_date=None, end_date=None):
+    """Positions [lo, hi) in ascending order covering the whole end day."""
+    view = _AscendingDates(records)
+    lo = bisect.bisect_left(view, day_key(start_date)) if start_date else 0
+    hi = bisect.bisect_right(view, day_key(end_date) + "\uffff") if end_date else len(view)
+    return lo, hi
+
+
+def records_between(records, start_date=None, end_date=None):
+    """Records dated within [start_date, end_date], still newest first."""
+    n = len(records)
+    lo, hi = date_bounds(records, start_date, end_date)
+    return records[n - hi:n - lo]
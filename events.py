@@ -0,0 +1,136 @@
+"""In-process publish/subscribe bus for order and expense changes.
+
+Managers publish after every mutation, still holding their lock, so events
+come out in the same order the changes were applied. Two kinds of
+consumers:
+
+* listeners (`add_listener`) run inline in the writer thread. Keep them
+  O(1): they are for in-memory indexes that must never lag the store.
+* subscriptions (`subscribe`) get their own bounded queue and worker
+  thread, one per Flet session. The writer never waits on them: when a
+  slow session's queue is full, later events are not queued, the worker
+  discards what is still waiting and delivers a single "resync" event
+  instead, after which the session should redraw from the managers.
+"""
+import itertools
+import queue
+import threading
+import time
+
+ORDER_ADDED = "order_added"
+STATUS_CHANGED = "status_changed"
+ORDER_DELETED = "order_deleted"
+DATE_CHANGED = "date_changed"
+EXPENSE_ADDED = "expense_added"
+EXPENSE_DELETED = "expense_deleted"
+EXPENSE_DATE_CHANGED = "expense_date_changed"
+MENU_CHANGED = "menu_changed"
+COSTS_CHANGED = "costs_changed"
+RESYNC = "resync"
+
+
+class Event:
+    __slots__ = ("seq", "topic", "ts", "data")
+
+    def __init__(self, seq, topic, ts, data):
+        self.seq = seq
+        self.topic = topic
+        self.ts = ts
+        self.data = data
+
+    def __repr__(self):
+        return f"Event({self.seq}, {self.topic!r}, {self.data!r})"
+
+
+class Subscription:
+    def __init__(self, bus, callback, maxsize, name):
+        self.bus = bus
+        self.callback = callback
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._overflowed = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def offer(self, event):
+        if self._overflowed:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            self._overflowed = True
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def close(self):
+        self._closed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            # A full queue wakes _run anyway, and it stops on the closed flag
+            pass
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            if event is None or self._closed:
+                return
+            if self._overflowed:
+                # The session redraws from the managers anyway: drop the stale backlog
+                while True:
+                    self.dropped += 1
+                    try:
+                        stale = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if stale is None:
+                        return
+                    event = stale
+                self._overflowed = False
+                event = Event(event.seq, RESYNC, time.time(), {})
+            try:
+                self.callback(event)
+            except Exception as e:
+                print(f"Error en suscriptor {self._thread.name}: {e}")
+
+
+class EventBus:
+    def __init__(self):
+        self._listeners = []
+        self._subscriptions = []
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add_listener(self, fn):
+        with self._lock:
+            self._listeners = self._listeners + [fn]
+
+    def remove_listener(self, fn):
+        with self._lock:
+            self._listeners = [l for l in self._listeners if l is not fn]
+
+    def subscribe(self, callback, maxsize=256, name="suscriptor"):
+        sub = Subscription(self, callback, maxsize, name)
+        with self._lock:
+            self._subscriptions = self._subscriptions + [sub]
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not sub]
+        sub.close()
+
+    def publish(self, topic, **data):
+        event = Event(next(self._seq), topic, time.time(), data)
+        for fn in self._listeners:
+            try:
+                fn(event)
+            except Exception as e:
+                print(f"Error en listener de {topic}: {e}")
+        for sub in self._subscriptions:
+            sub.offer(event)
+        return event
@@ -0,0 +1,189 @@
+"""Incremental demand forecast per weekday, hour and dish.
+
+The model is a set of exponentially decayed seasonal profiles:
+
+    qty[weekday, hour, dish]   portions sold
+    tickets[weekday, hour]     tickets opened (covers)
+    days[weekday]              days with sales
+
+each one a sum where an order from day d weighs 2 ** ((d - now) / half_life).
+A forecast for a date is just qty[weekday] / days[weekday]: the decayed
+average of that weekday, recent weeks counting more.
+
+Decaying every cell each day would touch the whole array; instead weights
+grow with time (w = exp(rate * (d - origin))) and the ratio cancels the
+common factor, so an order is one O(1) add and old data fades by itself.
+The origin is moved forward when weights get large.
+
+The profiles are built once from the orders (one bincount) and then kept
+current from the store events, so opening the dashboard never rescans the
+history.
+"""
+import math
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import events
+
+DEFAULT_HALF_LIFE_DAYS = 28
+# Rebase the weights before exp() gets near float overflow
+MAX_EXPONENT = 500.0
+
+
+def _parse(fecha):
+    s = str(fecha)
+    day = date(int(s[0:4]), int(s[5:7]), int(s[8:10]))
+    hour = int(s[11:13]) if len(s) >= 13 else 0
+    return day.toordinal(), day.weekday(), hour
+
+
+def _opens_ticket(o):
+    # The first line of a ticket carries its own id as ticket_id
+    return o.get('ticket_id', o['id']) == o['id']
+
+
+class DemandForecast:
+    def __init__(self, half_life_days=DEFAULT_HALF_LIFE_DAYS):
+        self.half_life_days = half_life_days
+        self.rate = math.log(2) / half_life_days
+        self.dishes = []
+        self._col = {}
+        self.qty = np.zeros((7, 24, 0))
+        self.tickets = np.zeros((7, 24))
+        self.days = np.zeros(7)
+        # day ordinal -> order lines on that day, to know when a day appears or disappears
+        self._day_lines = {}
+        self._origin = date.today().toordinal()
+        self._lock = threading.Lock()
+        self._manager = None
+
+    def attach(self, manager):
+        self._manager = manager
+        self.rebuild(manager.snapshot())
+        manager.bus.add_listener(self.on_event)
+        return self
+
+    # --- building ---
+
+    def _weight(self, ordinal):
+        exponent = self.rate * (ordinal - self._origin)
+        if exponent > MAX_EXPONENT:
+            self._rebase(ordinal)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _rebase(self, ordinal):
+        factor = math.exp(-self.rate * (ordinal - self._origin))
+        self.qty *= factor
+        self.tickets *= factor
+        self.days *= factor
+        self._origin = ordinal
+
+    def _column(self, dish):
+        col = self._col.get(dish)
+        if col is None:
+            col = self._col[dish] = len(self.dishes)
+            self.dishes.append(dish)
+            self.qty = np.concatenate([self.qty, np.zeros((7, 24, 1))], axis=2)
+        return col
+
+    def rebuild(self, orders):
+        """Recompute every profile from a list of orders in one pass."""
+        df = pd.DataFrame(orders, columns=['id', 'ticket_id', 'fecha', 'plato', 'cantidad'])
+        with self._lock:
+            self.dishes, self._col = [], {}
+            self.qty = np.zeros((7, 24, 0))
+            self.tickets = np.zeros((7, 24))
+            self.days = np.zeros(7)
+            self._day_lines = {}
+            if df.empty:
+                return
+            fecha = df['fecha'].astype(str)
+            day = pd.to_datetime(fecha.str[:10], format="%Y-%m-%d")
+            ordinal = (day - pd.Timestamp("0001-01-01")).dt.days.to_numpy() + 1
+            weekday = day.dt.dayofweek.to_numpy()
+            hour = pd.to_numeric(fecha.str[11:13], errors='coerce').fillna(0).astype(int).to_numpy()
+            self._origin = int(ordinal.max())
+            weight = np.exp(self.rate * (ordinal - self._origin))
+
+            codes, uniques = pd.factorize(df['plato'])
+            self.dishes = list(uniques)
+            self._col = {d: i for i, d in enumerate(self.dishes)}
+            n = len(self.dishes)
+            cell = (weekday * 24 + hour) * n + codes
+            self.qty = np.bincount(cell, weights=weight * df['cantidad'].to_numpy(dtype=float),
+                                   minlength=7 * 24 * n).reshape(7, 24, n)
+
+            opens = (df['ticket_id'].fillna(df['id']) == df['id']).to_numpy()
+            self.tickets = np.bincount(weekday[opens] * 24 + hour[opens], weights=weight[opens],
+                                       minlength=7 * 24).reshape(7, 24)
+
+            days, lines = np.unique(ordinal, return_counts=True)
+            self._day_lines = dict(zip(days.tolist(), lines.tolist()))
+            self.days = np.bincount([date.fromordinal(d).weekday() for d in days.tolist()],
+                                    weights=np.exp(self.rate * (days - self._origin)), minlength=7)
+
+    def add(self, o, sign=1):
+        """Count (sign=1) or uncount (sign=-1) one order line."""
+        ordinal, weekday, hour = _parse(o['fecha'])
+        with self._lock:
+            w = self._weight(ordinal)
+            self.qty[weekday, hour, self._column(o['plato'])] += sign * w * o['cantidad']
+            if _opens_ticket(o):
+                self.tickets[weekday, hour] += sign * w
+            before = self._day_lines.get(ordinal, 0)
+            after = before + sign
+            if after > 0:
+                self._day_lines[ordinal] = after
+            else:
+                self._day_lines.pop(ordinal, None)
+            if before == 0 and after > 0:
+                self.days[weekday] += w
+            elif before > 0 and after <= 0:
+                self.days[weekday] -= w
+
+    def on_event(self, event):
+        t, d = event.topic, event.data
+        if t == events.ORDER_ADDED:
+            for o in d['orders']:
+                self.add(o)
+        elif t == events.ORDER_DELETED:
+            self.add(d['order'], -1)
+        elif t == events.DATE_CHANGED:
+            self.add(d['previous'], -1)
+            self.add(d['order'])
+        elif t == events.RESYNC and d.get('store') != "gastos" and self._manager is not None:
+            self.rebuild(self._manager.snapshot())
+
+    # --- forecasting ---
+
+    def predict(self, when=None):
+        """Expected tickets and portions for a day (default: tomorrow).
+
+        Returns {"fecha", "tickets", "tickets_por_hora" (24 values),
+        "platos" {dish: portions, largest first}, "platos_por_hora" {dish: 24 values}}.
+        """
+        if when is None:
+            when = date.today() + timedelta(days=1)
+        elif isinstance(when, str):
+            when = datetime.strptime(when[:10], "%Y-%m-%d").date()
+        elif isinstance(when, datetime):
+            when = when.date()
+        weekday = when.weekday()
+        with self._lock:
+            norm = self.days[weekday]
+            by_hour = self.qty[weekday] / norm if norm > 0 else np.zeros_like(self.qty[weekday])
+            tickets = self.tickets[weekday] / norm if norm > 0 else np.zeros(24)
+            dishes = list(self.dishes)
+        totals = by_hour.sum(axis=0)
+        order = np.argsort(-totals, kind='stable')
+        return {
+            "fecha": when.isoformat(),
+            "tickets": float(tickets.sum()),
+            "tickets_por_hora": tickets.tolist(),
+            "platos": {dishes[i]: float(totals[i]) for i in order if totals[i] > 0},
+            "platos_por_hora": {dishes[i]: by_hour[:, i].tolist() for i in order if totals[i] > 0},
+        }
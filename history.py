@@ -0,0 +1,299 @@
+"""Point-in-time history of orders and expenses.
+
+Every store event is appended to an ordered mutation log
+(historial/eventos.jsonl) as an idempotent "put" or "del" by id. Every
+`snapshot_every` logged records a compact gzip snapshot of both stores is
+written, tagged with the log offset it covers. `state_at(when)` loads the
+newest snapshot taken at or before `when` and replays only the log tail up
+to `when`, so answering "what was unpaid at 15:00 yesterday" never
+replays the whole history. Money is stored in cents; logs and snapshots
+written when it was soles are converted as they are read.
+
+The log is written by an inline bus listener (under the publishing
+manager's lock); snapshot files are written on a background thread from
+the copy-on-write lists, so writers never wait for the gzip.
+
+Retention: after each snapshot only the last `keep_snapshots` and those
+younger than `keep_days` are kept, and once most of the log lies before
+the oldest snapshot kept, that prefix is cut. Offsets stay logical: a
+compacted log starts with a {"base": N} line giving the offset of its
+first entry, so snapshot names never change. A start with nothing new
+(no log entries since the newest snapshot, same workbooks and records)
+does not write another snapshot.
+"""
+import bisect
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import events
+from atomic import replace_file
+from catalog import file_signature
+from money import normalize_record
+
+LOG_NAME = "eventos.jsonl"
+SNAPSHOT_RE = re.compile(r"^snapshot-(\d+)-(\d+)(?:-([0-9a-f]{8}))?\.json\.gz$")
+
+
+def to_timestamp(when):
+    if isinstance(when, (int, float)):
+        return float(when)
+    if isinstance(when, str):
+        when = datetime.strptime(when[:19], "%Y-%m-%d %H:%M:%S" if len(when) > 10 else "%Y-%m-%d")
+    return when.timestamp()
+
+
+def log_header(line):
+    """(base, header length in bytes) from a log's first line; (0, 0) for a log never compacted."""
+    if line.startswith('{"base":') and line.endswith("\n"):
+        return json.loads(line)["base"], len(line.encode('utf-8'))
+    return 0, 0
+
+
+def signature(files, state):
+    """Short digest of the workbook signatures and the stores' record fingerprints."""
+    orders, expenses = state["pedidos"], state["gastos"]
+    parts = [files,
+             len(orders), max((o['id'] for o in orders), default=0), sum(o['subtotal'] for o in orders),
+             sum(1 for o in orders if o['pagado']), sum(1 for o in orders if o['entregado']),
+             len(expenses), max((e['id'] for e in expenses), default=0), sum(e['total'] for e in expenses)]
+    return f"{zlib.crc32(json.dumps(parts, default=str).encode('utf-8')):08x}"
+
+
+class History:
+    def __init__(self, directory="historial", snapshot_every=500, keep_snapshots=10, keep_days=7):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+        self.keep_days = keep_days
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self._lock = threading.Lock()
+        self._log = None
+        # Logical offset of the log's first entry and the bytes of its header line
+        self._base = 0
+        self._header = 0
+        self._since_snapshot = 0
+        self._managers = None
+        # (ts, offset, path, signature or None), oldest first
+        self.snapshots = []
+        self._cache = None
+        self._writers = []
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.isdir(self.directory):
+            return
+        found = []
+        for name in os.listdir(self.directory):
+            m = SNAPSHOT_RE.match(name)
+            if m:
+                found.append((int(m.group(1)) / 1000, int(m.group(2)), os.path.join(self.directory, name), m.group(3)))
+        self.snapshots = sorted(found)
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                self._base, self._header = log_header(f.readline())
+
+    def _offset(self):
+        return self._log.tell() - self._header + self._base
+
+    # --- recording ---
+
+    def attach(self, manager, cost_manager):
+        """Start logging both managers' events and take a baseline snapshot if anything changed."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        self._managers = (manager, cost_manager)
+        manager.bus.add_listener(self.on_event)
+        if cost_manager.bus is not manager.bus:
+            cost_manager.bus.add_listener(self.on_event)
+        # Whatever happened to the files while we were not running starts here
+        self.take_snapshot(force=False)
+        self._prune()
+
+    def on_event(self, event):
+        if event.topic == events.RESYNC:
+            # Wholesale replacement (load, bulk restore): only a snapshot can describe it
+            self.take_snapshot(force=False)
+            return
+        entry = self._to_entry(event)
+        if entry is None:
+            return
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._lock:
+            self._log.write(line + "\n")
+            self._log.flush()
+            self._since_snapshot += len(entry.get('records') or entry.get('ids') or ())
+            due = self._since_snapshot >= self.snapshot_every
+        if due:
+            self.take_snapshot()
+
+    def _to_entry(self, event):
+        t, d = event.topic, event.data
+        if t == events.ORDER_ADDED:
+            return {"ts": event.ts, "store": "pedidos", "op": "put", "records": d['orders']}
+        if t in (events.STATUS_CHANGED, events.DATE_CHANGED):
+            return {"ts": event.ts, "store": "pedidos", "op": "put", "records": [d['order']]}
+        if t == events.ORDER_DELETED:
+            return {"ts": event.ts, "store": "pedidos", "op": "del", "ids": [d['order']['id']]}
+        if t == events.EXPENSE_ADDED:
+            return {"ts": event.ts, "store": "gastos", "op": "put", "records": d['expenses']}
+        if t == events.EXPENSE_DATE_CHANGED:
+            return {"ts": event.ts, "store": "gastos", "op": "put", "records": [d['expense']]}
+        if t == events.EXPENSE_DELETED:
+            return {"ts": event.ts, "store": "gastos", "op": "del", "ids": [d['expense']['id']]}
+        return None
+
+    def take_snapshot(self, force=True):
+        """Snapshot both stores; unless forced, skipped when the newest snapshot already matches them."""
+        manager, cost_manager = self._managers
+        with self._lock:
+            # Lists are copy-on-write: these references stay valid while the file is written
+            ts = time.time()
+            offset = self._offset()
+            state = {"pedidos": manager.orders, "gastos": cost_manager.expenses}
+            files = [file_signature(manager.filename), file_signature(cost_manager.filename)]
+            self._since_snapshot = 0
+            digest = None
+            if not force:
+                digest = signature(files, state)
+                newest = self.snapshots[-1] if self.snapshots else None
+                if newest is not None and newest[1] == offset and newest[3] == digest:
+                    return
+            writer = threading.Thread(target=self._write_snapshot, args=(ts, offset, state, files, digest),
+                                      name="historial-snapshot", daemon=True)
+            self._writers = [w for w in self._writers if w.is_alive()] + [writer]
+        writer.start()
+
+    def _write_snapshot(self, ts, offset, state, files, digest=None):
+        if digest is None:
+            digest = signature(files, state)
+        path = os.path.join(self.directory, f"snapshot-{int(ts * 1000)}-{offset}-{digest}.json.gz")
+
+        def write(tmp):
+            with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=1) as f:
+                json.dump({"ts": ts, "offset": offset, **state}, f, ensure_ascii=False,
+                          separators=(",", ":"), default=str)
+        try:
+            replace_file(path, write)
+        except OSError as e:
+            print(f"Error guardando snapshot del historial: {e}")
+            return
+        with self._lock:
+            snapshots = self.snapshots + [(ts, offset, path, digest)]
+            snapshots.sort()
+            self.snapshots = snapshots
+        self._prune()
+
+    def _prune(self):
+        """Drop snapshots outside the retention, then the log before the oldest one kept."""
+        cutoff = time.time() - self.keep_days * 86400
+        with self._lock:
+            snapshots = self.snapshots
+            first = len(snapshots) - self.keep_snapshots
+            # Snapshots are sorted by time, so what is kept is a suffix
+            kept = [s for i, s in enumerate(snapshots) if i >= first or s[0] >= cutoff]
+            dropped = snapshots[:len(snapshots) - len(kept)]
+            self.snapshots = kept
+        for s in dropped:
+            try:
+                os.remove(s[2])
+            except OSError as e:
+                print(f"Error borrando snapshot del historial: {e}")
+        if kept:
+            self._compact_log(kept[0][1])
+
+    def _compact_log(self, cut):
+        with self._lock:
+            if self._log is None:
+                return
+            dead, live = cut - self._base, self._offset() - cut
+            # Rewrite only once most of the file is dead, so the cost stays linear
+            if dead <= 0 or dead < live:
+                return
+            header = json.dumps({"base": cut}) + "\n"
+            start = cut - self._base + self._header
+
+            def write(tmp):
+                with open(self.log_path, 'rb') as src, open(tmp, 'wb') as dst:
+                    dst.write(header.encode('utf-8'))
+                    src.seek(start)
+                    shutil.copyfileobj(src, dst)
+            # Closed while it is swapped: Windows cannot replace an open file
+            self._log.close()
+            try:
+                replace_file(self.log_path, write)
+            except OSError as e:
+                print(f"Error compactando el registro del historial: {e}")
+            self._log = open(self.log_path, 'a', encoding='utf-8')
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                self._base, self._header = log_header(f.readline())
+
+    # --- reconstruction ---
+
+    def _load_snapshot(self, path):
+        cache = self._cache
+        if cache is not None and cache[0] == path:
+            return cache[1]
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        state = {store: {r['id']: normalize_record(r) for r in data[store]} for store in ("pedidos", "gastos")}
+        self._cache = (path, state)
+        return state
+
+    def state_at(self, when):
+        """Orders and expenses as they were at `when` (datetime, str or Unix ts).
+
+        Returns {"pedidos": [...], "gastos": [...]} sorted newest first like
+        the managers, or None if `when` is older than the first snapshot.
+        """
+        ts = to_timestamp(when)
+        snapshots = self.snapshots
+        idx = bisect.bisect_right([s[0] for s in snapshots], ts) - 1
+        if idx < 0:
+            return None
+        _, offset, path, _ = snapshots[idx]
+        base = self._load_snapshot(path)
+        state = {store: dict(records) for store, records in base.items()}
+
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                # The header of the file actually opened: another process may have compacted it
+                log_base, header = log_header(f.readline())
+                f.seek(max(offset - log_base, 0) + header)
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    entry = json.loads(line)
+                    if entry['ts'] > ts:
+                        break
+                    records = state[entry['store']]
+                    if entry['op'] == "put":
+                        for r in entry['records']:
+                            records[r['id']] = normalize_record(r)
+                    else:
+                        for rid in entry['ids']:
+                            records.pop(rid, None)
+
+        return {store: sorted(records.values(), key=lambda x: str(x['fecha']), reverse=True)
+                for store, records in state.items()}
+
+    def unpaid_at(self, when):
+        state = self.state_at(when)
+        return [o for o in state['pedidos'] if not o['pagado']] if state else None
+
+    def close(self):
+        # Let pending snapshot files finish before the process exits
+        for w in self._writers:
+            w.join()
+        if self._managers is not None:
+            manager, cost_manager = self._managers
+            manager.bus.remove_listener(self.on_event)
+            cost_manager.bus.remove_listener(self.on_event)
+        if self._log is not None:
+            self._log.close()
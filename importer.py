@@ -0,0 +1,189 @@
+"""Bulk import of historical orders and expenses from CSV or xlsx.
+
+    python cli.py importar tickets_enero.csv --tipo pedidos --rechazados rechazos.csv
+    python cli.py importar compras.xlsx --tipo gastos
+
+Every row is checked with column-wide pandas operations: dates are parsed
+and normalized to "YYYY-MM-DD HH:MM:SS", dishes are matched against the
+menu and items against costos.json, quantities must be positive. Valid
+rows go to the manager in a single `import_orders`/`import_expenses` call
+(one id block, one sort, one workbook write). Invalid rows come back as a
+DataFrame with the original line number and the reason.
+
+Headers may be the dict keys (fecha, cliente, plato, ...) or the column
+titles of the app's own workbooks ("Cant.", "Precio Unit.", ...).
+Prices in the file are soles and become cents here; a blank price takes
+the catalog's, one that does not parse rejects the row. Lines that share
+a ticket number stay one ticket.
+"""
+import os
+
+import pandas as pd
+
+from money import cents_array, line_totals
+
+# Workbook titles and common variants -> record keys
+HEADER_ALIASES = {
+    "id": "id",
+    "fecha": "fecha",
+    "cliente": "cliente",
+    "plato": "plato",
+    "cant.": "cantidad",
+    "cantidad": "cantidad",
+    "precio unit.": "precio",
+    "precio": "precio",
+    "total": "total",
+    "subtotal": "subtotal",
+    "método pago": "metodo_pago",
+    "metodo pago": "metodo_pago",
+    "metodo_pago": "metodo_pago",
+    "entregado": "entregado",
+    "pagado": "pagado",
+    "ticket": "ticket_id",
+    "ticket_id": "ticket_id",
+    "insumo": "item",
+    "item": "item",
+    "costo unit.": "precio_unit",
+    "precio_unit": "precio_unit",
+}
+
+TRUE_VALUES = {"si", "sí", "true", "1", "x", "yes"}
+
+
+def read_table(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    elif ext in (".xlsx", ".xlsm"):
+        df = pd.read_excel(path, dtype=str, keep_default_na=False)
+    else:
+        raise ValueError(f"Formato no soportado: {ext} (use .csv o .xlsx)")
+    df.columns = [HEADER_ALIASES.get(str(c).strip().lower(), str(c).strip().lower()) for c in df.columns]
+    return df
+
+
+def normalize_dates(values):
+    """Parse a column of dates; unparseable values become NaT."""
+    values = values.str.strip()
+    parsed = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    # Handwritten backfills usually come as dd/mm/yyyy
+    missing = parsed.isna() & (values != "")
+    if missing.any():
+        parsed[missing] = pd.to_datetime(values[missing], errors="coerce", format="mixed", dayfirst=True)
+    return parsed
+
+
+def parse_bool(values, default):
+    values = values.str.strip().str.lower()
+    return values.isin(TRUE_VALUES).where(values != "", default)
+
+
+def _text(df, column, default=""):
+    if column in df.columns:
+        return df[column].astype(str).str.strip()
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+def _check(reason, mask, message):
+    # Keep the first failure per row
+    reason[mask & (reason == "")] = message
+
+
+def _split(df, reason):
+    ok = reason == ""
+    rejected = df[~ok].copy()
+    # Line number as seen in a spreadsheet: header is line 1
+    rejected.insert(0, "fila", rejected.index + 2)
+    rejected.insert(1, "motivo", reason[~ok])
+    return ok, rejected.reset_index(drop=True)
+
+
+def _require(df, columns):
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas: {', '.join(missing)}")
+
+
+def validate_orders(df, menu):
+    """Return (records, rejected) for an orders table."""
+    _require(df, ("fecha", "plato", "cantidad"))
+    reason = pd.Series("", index=df.index, dtype=object)
+
+    fecha = normalize_dates(df["fecha"])
+    plato = _text(df, "plato")
+    cantidad = pd.to_numeric(df["cantidad"], errors="coerce")
+    # Recorded price wins; the current menu price fills blank cells only
+    precio_text = _text(df, "precio")
+    precio = cents_array(precio_text).where(precio_text != "", plato.map(menu))
+
+    _check(reason, fecha.isna(), "fecha inválida")
+    _check(reason, ~plato.isin(menu.keys()), "plato no está en el menú")
+    _check(reason, cantidad.isna() | (cantidad <= 0) | (cantidad % 1 != 0), "cantidad inválida")
+    _check(reason, precio.isna() | (precio < 0), "precio inválido")
+
+    ok, rejected = _split(df, reason)
+    cliente = _text(df, "cliente")
+    ticket = _text(df, "ticket_id")
+    valid = pd.DataFrame({
+        "fecha": fecha[ok].dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "cliente": cliente[ok].where(cliente[ok] != "", "Sin nombre"),
+        "plato": plato[ok],
+        "cantidad": cantidad[ok].astype(int),
+        "precio": precio[ok].astype('int64'),
+        "metodo_pago": _text(df, "metodo_pago", "Efectivo")[ok].replace("", "Efectivo"),
+        # Backfilled tickets are history: served and paid unless the file says otherwise
+        "entregado": parse_bool(_text(df, "entregado"), True)[ok],
+        "pagado": parse_bool(_text(df, "pagado"), True)[ok],
+        # Source ticket numbers; import_orders maps them to fresh ticket ids
+        "ticket_id": ticket[ok].where(ticket[ok] != "", None),
+    })
+    valid["subtotal"] = valid["precio"] * valid["cantidad"]
+    return valid.to_dict("records"), rejected
+
+
+def validate_expenses(df, cost_dict):
+    """Return (records, rejected) for an expenses table."""
+    _require(df, ("fecha", "item", "cantidad"))
+    reason = pd.Series("", index=df.index, dtype=object)
+
+    fecha = normalize_dates(df["fecha"])
+    item = _text(df, "item")
+    cantidad = pd.to_numeric(df["cantidad"], errors="coerce")
+    precio_text = _text(df, "precio_unit")
+    precio_unit = cents_array(precio_text).where(precio_text != "", item.map(cost_dict))
+
+    _check(reason, fecha.isna(), "fecha inválida")
+    _check(reason, ~item.isin(cost_dict.keys()), "insumo no está en costos.json")
+    _check(reason, cantidad.isna() | (cantidad <= 0), "cantidad inválida")
+    _check(reason, precio_unit.isna() | (precio_unit < 0), "costo inválido")
+
+    ok, rejected = _split(df, reason)
+    valid = pd.DataFrame({
+        "fecha": fecha[ok].dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "item": item[ok],
+        "cantidad": cantidad[ok].astype(float),
+        "precio_unit": precio_unit[ok].astype('int64'),
+    })
+    valid["total"] = line_totals(valid["precio_unit"], valid["cantidad"])
+    return valid.to_dict("records"), rejected
+
+
+def import_orders_file(manager, path):
+    """Validate and import an orders file. Returns (imported, rejected, error)."""
+    records, rejected = validate_orders(read_table(path), manager.menu)
+    err = manager.import_orders(records) if records else None
+    return len(records), rejected, err
+
+
+def import_expenses_file(cost_manager, path):
+    """Validate and import an expenses file. Returns (imported, rejected, error)."""
+    records, rejected = validate_expenses(read_table(path), cost_manager.cost_dict)
+    err = cost_manager.import_expenses(records) if records else None
+    return len(records), rejected, err
+
+
+def write_rejected(rejected, path):
+    if path.lower().endswith(".xlsx"):
+        rejected.to_excel(path, index=False)
+    else:
+        rejected.to_csv(path, index=False, encoding="utf-8-sig")
@@ -0,0 +1,203 @@
+"""Timing spans, latency histograms and opt-in cProfile capture.
+
+Every instrumented call records its wall time into a per-operation
+histogram with fixed log-scale buckets, so recording is O(1), memory is
+constant however long the session runs, and p50/p95/p99 can be read at
+any time. Profiling is off unless YAFRANK_PROFILE names an output file.
+"""
+import bisect
+import cProfile
+import functools
+import math
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds in seconds: 1µs .. ~170s, four buckets per doubling
+_BOUNDS = [1e-6 * 2 ** (i / 4) for i in range(110)]
+
+
+class Histogram:
+    def __init__(self, name):
+        self.name = name
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        idx = bisect.bisect_left(_BOUNDS, seconds)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        # Copying ~110 ints keeps the lock held for a few microseconds at most
+        with self._lock:
+            return HistogramSnapshot(self.name, list(self.counts), self.count, self.sum, self.max)
+
+
+class HistogramSnapshot:
+    def __init__(self, name, counts, count, total, maximum):
+        self.name = name
+        self.counts = counts
+        self.count = count
+        self.sum = total
+        self.max = maximum
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(_BOUNDS[idx], self.max) if idx < len(_BOUNDS) else self.max
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def buckets(self):
+        """Cumulative (upper_bound, count) pairs, Prometheus style."""
+        out = []
+        seen = 0
+        for bound, c in zip(_BOUNDS, self.counts):
+            seen += c
+            out.append((bound, seen))
+        out.append((math.inf, self.count))
+        return out
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_histogram(name):
+    hist = _registry.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _registry.setdefault(name, Histogram(name))
+    return hist
+
+
+def snapshots():
+    return [h.snapshot() for h in list(_registry.values())]
+
+
+def reset():
+    with _registry_lock:
+        _registry.clear()
+
+
+# ---------------- Profiling (opt-in) ----------------
+
+_profile_path = os.environ.get("YAFRANK_PROFILE")
+_profilers = []
+_local = threading.local()
+
+
+def profiling_enabled():
+    return _profile_path is not None
+
+
+def enable_profiling(path):
+    global _profile_path
+    _profile_path = path
+
+
+def _thread_profiler():
+    prof = getattr(_local, 'profiler', None)
+    if prof is None:
+        prof = cProfile.Profile()
+        _local.profiler = prof
+        _profilers.append(prof)
+    return prof
+
+
+def dump_profile(path=None):
+    """Merge the per-thread profiles into a single pstats file."""
+    path = path or _profile_path
+    if not path or not _profilers:
+        return None
+    stats = None
+    for prof in list(_profilers):
+        if stats is None:
+            stats = pstats.Stats(prof)
+        else:
+            stats.add(prof)
+    stats.dump_stats(path)
+    return path
+
+
+# ---------------- Spans ----------------
+
+@contextmanager
+def span(name):
+    # cProfile is per thread and Flet runs handlers on a pool, so each
+    # thread profiles only while inside its outermost span
+    depth = getattr(_local, 'depth', 0)
+    prof = _thread_profiler() if _profile_path and depth == 0 else None
+    _local.depth = depth + 1
+    if prof:
+        prof.enable()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        if prof:
+            prof.disable()
+        _local.depth = depth
+        get_histogram(name).record(elapsed)
+
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrumented(cls):
+    """Class decorator: wrap every public method in a span named Class.method."""
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_') or not callable(value):
+            continue
+        setattr(cls, attr, timed(f"{cls.__name__}.{attr}")(value))
+    return cls
+
+
+def instrument_call(obj, attr, name):
+    """Wrap a bound method on an instance (e.g. page.update) in a span."""
+    setattr(obj, attr, timed(name)(getattr(obj, attr)))
+
+
+# ---------------- Report ----------------
+
+def format_report():
+    rows = sorted(snapshots(), key=lambda s: s.sum, reverse=True)
+    lines = [f"{'operación':<40} {'n':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'total s':>9}"]
+    for s in rows:
+        lines.append(
+            f"{s.name:<40} {s.count:>7} {s.percentile(50) * 1000:>9.2f} {s.percentile(95) * 1000:>9.2f} "
+            f"{s.percentile(99) * 1000:>9.2f} {s.max * 1000:>9.2f} {s.sum:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def dump(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(format_report() + "\n")
+    return path
@@ -0,0 +1,264 @@
+"""Perpetual inventory of the supplies used by recipes.
+
+Purchases (expense_added) add stock; sales (order_added) take out what
+recetas.json says each portion uses. Every store event moves the running
+stock per item and the per-day delta of its own date, both O(1) per
+line, so the current stock is always a dict lookup.
+
+`stock_at(when)` answers "how much fish did we have on the 12th" from
+per-day checkpoints: the cumulative stock at the end of each day with
+movements, recomputed lazily from the first day an edit touched. A date
+reads one checkpoint; a date and time reads the previous day's checkpoint
+plus only that day's records, located by bisect.
+
+Only items some recipe uses are tracked (staff and services are not
+stock). Minimum levels per item live in inventario.json; `low_stock()`
+lists the items under their minimum.
+"""
+import bisect
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+import events
+from atomic import replace_file
+from catalog import file_signature
+from daterange import date_bounds
+from recipes import load_recipes
+
+
+def _day(fecha):
+    return str(fecha)[:10]
+
+
+class Inventory:
+    def __init__(self, recipes_path="recetas.json", path="inventario.json"):
+        self.recipes_path = recipes_path
+        self.path = path
+        self._set_recipes(load_recipes(recipes_path))
+        self._recipes_sig = file_signature(recipes_path)
+        self.minimums = {}
+        self.stock = {}
+        # day -> {item: delta}; sorted days; cumulative stock at the end of each day
+        self.daily = {}
+        self._days = []
+        self._checkpoints = []
+        # Checkpoints from this index on are stale
+        self._dirty = 0
+        self._lock = threading.RLock()
+        self._managers = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.minimums = {k: float(v) for k, v in data.get("minimos", {}).items()}
+        except Exception as e:
+            print(f"Error cargando inventario: {e}")
+
+    def save(self):
+        def write(tmp):
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"minimos": self.minimums}, f, ensure_ascii=False, indent=4)
+        try:
+            replace_file(self.path, write)
+        except Exception as e:
+            print(f"Error guardando inventario: {e}")
+
+    def set_minimum(self, item, qty):
+        with self._lock:
+            minimums = dict(self.minimums)
+            if qty is None:
+                minimums.pop(item, None)
+            else:
+                minimums[item] = float(qty)
+            self.minimums = minimums
+        self.save()
+
+    @property
+    def items(self):
+        return sorted(self.tracked_items)
+
+    def _set_recipes(self, recipes):
+        # Supplies used by some recipe: only their purchases move stock
+        self.recipes = recipes
+        self.tracked_items = frozenset(item for recipe in recipes.values() for item in recipe)
+
+    # --- recording ---
+
+    def attach(self, manager, cost_manager):
+        self._managers = (manager, cost_manager)
+        self.rebuild()
+        manager.bus.add_listener(self.on_event)
+        if cost_manager.bus is not manager.bus:
+            cost_manager.bus.add_listener(self.on_event)
+        return self
+
+    def rebuild(self, recipes=None):
+        """Recompute stock and daily deltas from both stores (load, resync, new recipes).
+
+        Runs on writer threads (resync) and on the catalog watcher. The stores
+        are read while their locks are held and ours is taken before they are
+        released, so every write is either in what is read here or has its
+        event applied after the swap, never both or neither.
+        """
+        manager, cost_manager = self._managers
+        # Same order as the writers, whose inline on_event takes our lock under theirs
+        with manager._lock, cost_manager._lock:
+            self._lock.acquire()
+            orders, expenses = manager.snapshot(), cost_manager.expenses
+        try:
+            if recipes is not None:
+                self._set_recipes(recipes)
+            self._rebuild(orders, expenses)
+        finally:
+            self._lock.release()
+
+    def _rebuild(self, orders, expenses):
+        tracked = self.tracked_items
+        daily = {}
+
+        def add(df, key, sign, per_unit):
+            if df.empty:
+                return
+            df = df.assign(dia=df['fecha'].astype(str).str[:10])
+            for (day, name), qty in df.groupby(['dia', key])['cantidad'].sum().items():
+                for item, factor in per_unit(name):
+                    deltas = daily.setdefault(day, {})
+                    deltas[item] = deltas.get(item, 0.0) + sign * float(qty) * factor
+
+        add(pd.DataFrame(orders, columns=['fecha', 'plato', 'cantidad']), 'plato', -1,
+            lambda plato: [(i, float(q)) for i, q in self.recipes.get(plato, {}).items()])
+        add(pd.DataFrame(expenses, columns=['fecha', 'item', 'cantidad']), 'item', 1,
+            lambda item: [(item, 1.0)] if item in tracked else [])
+
+        stock = {item: 0.0 for item in tracked}
+        for deltas in daily.values():
+            for item, d in deltas.items():
+                stock[item] += d
+        self.daily = daily
+        self._days = sorted(daily)
+        self._checkpoints = []
+        self._dirty = 0
+        self.stock = stock
+
+    def reload_recipes(self):
+        recipes = load_recipes(self.recipes_path)
+        self._recipes_sig = file_signature(self.recipes_path)
+        if self._managers is not None:
+            self.rebuild(recipes)
+        else:
+            with self._lock:
+                self._set_recipes(recipes)
+
+    def check_recipes(self):
+        """Watcher step: rebuild when recetas.json changed on disk."""
+        if file_signature(self.recipes_path) != self._recipes_sig:
+            self.reload_recipes()
+
+    def _move(self, fecha, item, qty):
+        day = _day(fecha)
+        self.stock[item] = self.stock.get(item, 0.0) + qty
+        deltas = self.daily.get(day)
+        if deltas is None:
+            deltas = self.daily[day] = {}
+            idx = bisect.bisect_left(self._days, day)
+            self._days.insert(idx, day)
+        else:
+            idx = bisect.bisect_left(self._days, day)
+        deltas[item] = deltas.get(item, 0.0) + qty
+        if idx < self._dirty:
+            self._dirty = idx
+
+    def _apply_order(self, o, sign):
+        for item, qty in self.recipes.get(o['plato'], {}).items():
+            self._move(o['fecha'], item, sign * o['cantidad'] * float(qty))
+
+    def _apply_expense(self, e, sign):
+        if e['item'] in self.tracked_items:
+            self._move(e['fecha'], e['item'], sign * e['cantidad'])
+
+    def on_event(self, event):
+        t, d = event.topic, event.data
+        if t == events.RESYNC:
+            self.rebuild()
+            return
+        with self._lock:
+            if t == events.ORDER_ADDED:
+                for o in d['orders']:
+                    self._apply_order(o, -1)
+            elif t == events.ORDER_DELETED:
+                self._apply_order(d['order'], 1)
+            elif t == events.DATE_CHANGED:
+                self._apply_order(d['previous'], 1)
+                self._apply_order(d['order'], -1)
+            elif t == events.EXPENSE_ADDED:
+                for e in d['expenses']:
+                    self._apply_expense(e, 1)
+            elif t == events.EXPENSE_DELETED:
+                self._apply_expense(d['expense'], -1)
+            elif t == events.EXPENSE_DATE_CHANGED:
+                self._apply_expense(d['previous'], -1)
+                self._apply_expense(d['expense'], 1)
+
+    # --- queries ---
+
+    def _refresh_checkpoints(self):
+        days, checkpoints = self._days, self._checkpoints
+        del checkpoints[self._dirty:]
+        running = dict(checkpoints[-1]) if checkpoints else {}
+        for day in days[len(checkpoints):]:
+            for item, d in self.daily[day].items():
+                running[item] = running.get(item, 0.0) + d
+            checkpoints.append(dict(running))
+        self._dirty = len(checkpoints)
+
+    def stock_at(self, when):
+        """Stock per item at `when`.
+
+        A date ("YYYY-MM-DD", date) means the end of that day; a datetime or
+        "YYYY-MM-DD HH:MM:SS" stops at that moment.
+        """
+        if isinstance(when, datetime):
+            stamp = when.strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            stamp = str(when)
+        day = stamp[:10]
+        with self._lock:
+            self._refresh_checkpoints()
+            if len(stamp) <= 10:
+                idx = bisect.bisect_right(self._days, day)
+                base = self._checkpoints[idx - 1] if idx else {}
+                return {item: base.get(item, 0.0) for item in self.items}
+            idx = bisect.bisect_left(self._days, day)
+            result = dict(self._checkpoints[idx - 1]) if idx else {}
+
+        # Part of the day: only that day's records up to the given time
+        manager, cost_manager = self._managers
+        start = datetime.strptime(day, "%Y-%m-%d")
+        tracked = self.tracked_items
+        for records, is_order in ((manager.snapshot(), True), (cost_manager.expenses, False)):
+            n = len(records)
+            lo, hi = date_bounds(records, start, start)
+            for i in range(lo, hi):
+                r = records[n - 1 - i]
+                if str(r['fecha']) > stamp:
+                    break
+                if is_order:
+                    for item, qty in self.recipes.get(r['plato'], {}).items():
+                        result[item] = result.get(item, 0.0) - r['cantidad'] * float(qty)
+                elif r['item'] in tracked:
+                    result[r['item']] = result.get(r['item'], 0.0) + r['cantidad']
+        return {item: result.get(item, 0.0) for item in self.items}
+
+    def low_stock(self):
+        """[(item, stock, minimum)] for items under their minimum, worst first."""
+        stock, minimums = self.stock, self.minimums
+        low = [(item, stock.get(item, 0.0), m) for item, m in minimums.items() if stock.get(item, 0.0) < m]
+        return sorted(low, key=lambda x: x[1] - x[2])
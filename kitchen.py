@@ -0,0 +1,189 @@
+"""Kitchen queue: pending orders (entregado == False) ordered by fecha.
+
+The queue is an indexed binary heap, so an order enters in O(log n) when
+it is added and leaves in O(log n) when it is marked delivered, without
+scanning the order list. It follows the OrderManager through an inline
+bus listener, so it is always in step with the store.
+"""
+import heapq
+from collections import deque
+from datetime import datetime
+
+import events
+
+
+def parse_fecha(value):
+    value = str(value)
+    if len(value) > 10:
+        return datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S")
+    return datetime.strptime(value[:10], "%Y-%m-%d")
+
+
+class IndexedHeap:
+    """Min-heap of (key, id) with a position index for O(log n) removal."""
+
+    def __init__(self):
+        self._heap = []
+        self._pos = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item_id):
+        return item_id in self._pos
+
+    def push(self, key, item_id):
+        if item_id in self._pos:
+            self.remove(item_id)
+        self._heap.append((key, item_id))
+        self._pos[item_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def remove(self, item_id):
+        idx = self._pos.pop(item_id, None)
+        if idx is None:
+            return False
+        last = self._heap.pop()
+        if idx < len(self._heap):
+            self._heap[idx] = last
+            self._pos[last[1]] = idx
+            self._sift_up(idx)
+            self._sift_down(self._pos[last[1]])
+        return True
+
+    def peek(self):
+        return self._heap[0] if self._heap else None
+
+    def ordered(self, limit=None):
+        """(key, id) pairs in key order; with a limit only the first ones, in O(n log limit)."""
+        # list() copies in one C call, so readers on other threads get a stable view
+        items = list(self._heap)
+        if limit is None:
+            return sorted(items)
+        return heapq.nsmallest(limit, items)
+
+    def _swap(self, i, j):
+        h = self._heap
+        h[i], h[j] = h[j], h[i]
+        self._pos[h[i][1]] = i
+        self._pos[h[j][1]] = j
+
+    def _sift_up(self, i):
+        h = self._heap
+        while i > 0:
+            parent = (i - 1) // 2
+            if h[i] < h[parent]:
+                self._swap(i, parent)
+                i = parent
+            else:
+                break
+
+    def _sift_down(self, i):
+        h = self._heap
+        n = len(h)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and h[child] < h[smallest]:
+                    smallest = child
+            if smallest == i:
+                break
+            self._swap(i, smallest)
+            i = smallest
+
+
+class KitchenQueue:
+    def __init__(self, manager, prep_window=500):
+        self.manager = manager
+        self._heap = IndexedHeap()
+        self._orders = {}
+        # Recent prep times in seconds (fecha -> entregado_en), newest last
+        self.prep_times = deque(maxlen=prep_window)
+        self.rebuild()
+        manager.bus.add_listener(self.on_event)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def rebuild(self):
+        self._heap = IndexedHeap()
+        self._orders = {}
+        delivered = []
+        for o in self.manager.orders:
+            if not o['entregado']:
+                self._push(o)
+            elif o.get('entregado_en'):
+                delivered.append(o)
+        delivered.sort(key=lambda o: o['entregado_en'])
+        self.prep_times.clear()
+        for o in delivered[-self.prep_times.maxlen:]:
+            self._record_prep(o)
+
+    def _push(self, o):
+        self._orders[o['id']] = o
+        self._heap.push(str(o['fecha']), o['id'])
+
+    def _remove(self, order_id):
+        self._orders.pop(order_id, None)
+        self._heap.remove(order_id)
+
+    def _record_prep(self, o):
+        try:
+            seconds = (parse_fecha(o['entregado_en']) - parse_fecha(o['fecha'])).total_seconds()
+        except (ValueError, TypeError):
+            return
+        if seconds >= 0:
+            self.prep_times.append(seconds)
+
+    def on_event(self, event):
+        if event.topic == events.ORDER_ADDED:
+            for o in event.data['orders']:
+                if not o['entregado']:
+                    self._push(o)
+        elif event.topic == events.STATUS_CHANGED:
+            o = event.data['order']
+            if o['entregado']:
+                self._remove(o['id'])
+                if event.data['field'] == 'entregado':
+                    self._record_prep(o)
+            else:
+                self._push(o)
+        elif event.topic == events.ORDER_DELETED:
+            self._remove(event.data['order']['id'])
+        elif event.topic == events.DATE_CHANGED:
+            o = event.data['order']
+            if o['id'] in self._heap:
+                self._push(o)
+        elif event.topic == events.RESYNC and event.data.get('store') == "pedidos":
+            self.rebuild()
+
+    def tickets(self, limit=None):
+        """Pending orders, oldest first."""
+        ordered = self._heap.ordered(limit)
+        return [self._orders[item_id] for _, item_id in ordered if item_id in self._orders]
+
+    def oldest(self):
+        top = self._heap.peek()
+        return self._orders.get(top[1]) if top else None
+
+    def prep_stats(self):
+        times = sorted(tuple(self.prep_times))
+        if not times:
+            return {"count": 0, "avg": 0.0, "p90": 0.0}
+        idx = max(0, -(-len(times) * 90 // 100) - 1)
+        return {"count": len(times), "avg": sum(times) / len(times), "p90": times[idx]}
+
+
+def wait_seconds(order, now=None):
+    now = now or datetime.now()
+    try:
+        return max(0.0, (now - parse_fecha(order['fecha'])).total_seconds())
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
@@ -0,0 +1,767 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from openpyxl import Workbook, load_workbook
+import pandas as pd
+from instrumentation import instrumented
+import events
+from events import EventBus
+from kitchen import KitchenQueue
+from catalog import Catalog
+from customers import ANONYMOUS, normalize_name
+from daterange import records_between
+from atomic import replace_file
+from money import to_cents, to_soles, line_total
+# ================= MODELO / LÓGICA =================
+
+# Concurrency model (shared by both managers): every mutation runs under the
+# manager's lock, and the record lists and dicts they hold are never
+# modified after being published. Writers build a new list and swap the
+# attribute, so readers (stats, UI sessions, metrics) can take
+# `orders = manager.orders` as a consistent snapshot without locking.
+
+
+DEFAULT_MENU = {
+    "Duo Marino": 15.0,
+    "Causa de Pescado": 10.0,
+    "Ceviche": 12.0,
+    "Trio Marino": 20.0,
+}
+
+DEFAULT_COSTS = {
+    "Pescado (Kg)": 18.0,
+    "Limón (Kg)": 7.0,
+    "Cebolla (Kg)": 3.5,
+    "Mesero (Día)": 50.0,
+    "Aceite (L)": 8.5
+}
+
+
+STATS_COLUMNS = ['fecha', 'cliente', 'plato', 'cantidad', 'subtotal', 'metodo_pago']
+
+
+def comparison_period(start_date, end_date, kind):
+    """Window to compare [start_date, end_date] with.
+
+    kind: "semana" (7 days earlier), "mes" (same days a month earlier) or
+    "periodo" (the same number of days right before). None for anything else.
+    """
+    if kind == "semana":
+        shift = timedelta(days=7)
+    elif kind == "periodo":
+        shift = timedelta(days=(end_date.date() - start_date.date()).days + 1)
+    elif kind == "mes":
+        offset = pd.DateOffset(months=1)
+        return (pd.Timestamp(start_date) - offset).to_pydatetime(), (pd.Timestamp(end_date) - offset).to_pydatetime()
+    else:
+        return None
+    return start_date - shift, end_date - shift
+
+
+def change(current, previous):
+    return {"delta": current - previous, "pct": (current - previous) / previous * 100 if previous else None}
+
+
+def empty_stats():
+    return {
+        "total_sales": 0,
+        "ticket_average": 0,
+        "order_count": 0,
+        "top_3_dishes": [],
+        "bottom_3_dishes": [],
+        "top_3_clients": [],
+        "dish_mix": {},
+        "avg_price_per_dish": 0,
+        "payment_methods": {},
+        "daily_sales_trend": {},
+        "rush_hour": {h: 0 for h in range(24)}
+    }
+
+
+def period_stats(df, n_periods):
+    """get_filtered_stats' KPIs for every `periodo` of df, one groupby per KPI.
+
+    Amounts are cents: sales, spend and daily totals are ints, averages
+    (ticket, price per dish) are float cents.
+    """
+    results = [empty_stats() for _ in range(n_periods)]
+    if df.empty:
+        return results
+
+    # Top Clients: by spend, "Juan" and "juan " being the same client
+    codes, spellings = pd.factorize(df['cliente'].fillna("").astype(str))
+    df['cliente_key'] = pd.Index([normalize_name(s) for s in spellings])[codes]
+
+    sales = df.groupby('periodo')['subtotal'].agg(['sum', 'mean', 'size'])
+    qty = df.groupby('periodo')['cantidad'].sum()
+    dishes = df.groupby(['periodo', 'plato']).size()
+    clients = df.groupby(['periodo', 'cliente_key'], sort=False).agg(name=('cliente', 'first'), total=('subtotal', 'sum'))
+    payments = df.groupby(['periodo', 'metodo_pago'], dropna=False).size()
+    daily = df.groupby(['periodo', df['fecha_dt'].dt.date])['subtotal'].sum()
+    hours = df.groupby(['periodo', df['fecha_dt'].dt.hour]).size()
+
+    for p in sales.index:
+        total_sales = int(sales.at[p, 'sum'])
+
+        # Top/Bottom Dishes
+        dish_counts = dishes.loc[p].sort_values(ascending=False, kind='stable')
+        total_items = dish_counts.sum()
+        top_3_dishes = [{"name": name, "pct": (count/total_items)*100} for name, count in dish_counts.head(3).items()]
+        bottom_3_dishes = [{"name": name, "pct": (count/total_items)*100} for name, count in dish_counts.tail(3).items()]
+
+        by_client = clients.loc[p]
+        by_client = by_client[~by_client.index.isin(ANONYMOUS)].sort_values('total', ascending=False, kind='stable')
+        total_spend = by_client['total'].sum()
+        top_3_clients = [{"name": " ".join(str(row.name).split()), "pct": (row.total/total_spend)*100 if total_spend else 0, "total": int(row.total)}
+                         for row in by_client.head(3).itertuples()]
+
+        # Avg Price per Dish (Total Sales / Total Qty)
+        total_qty = qty.at[p]
+        hourly_counts = hours.loc[p].to_dict()
+
+        results[p] = {
+            "total_sales": total_sales,
+            "ticket_average": sales.at[p, 'mean'],
+            "order_count": int(sales.at[p, 'size']),
+            "top_3_dishes": top_3_dishes,
+            "bottom_3_dishes": bottom_3_dishes,
+            "top_3_clients": top_3_clients,
+            "dish_mix": {name: (count/total_items)*100 for name, count in dish_counts.items()},
+            "avg_price_per_dish": total_sales / total_qty if total_qty > 0 else 0,
+            "payment_methods": payments.loc[p].to_dict(),
+            "daily_sales_trend": dict(sorted(daily.loc[p].to_dict().items())),
+            "rush_hour": {h: hourly_counts.get(h, 0) for h in range(24)}
+        }
+    return results
+
+
+def stats_deltas(current, previous):
+    """Change of every KPI from `previous` to `current` (dish mix in percentage points)."""
+    deltas = {key: {"actual": current[key], "anterior": previous[key], **change(current[key], previous[key])}
+              for key in ("total_sales", "ticket_average", "order_count", "avg_price_per_dish")}
+    dishes = set(current['dish_mix']) | set(previous['dish_mix'])
+    deltas["dish_mix"] = {d: current['dish_mix'].get(d, 0) - previous['dish_mix'].get(d, 0) for d in dishes}
+    deltas["rush_hour"] = {h: current['rush_hour'][h] - previous['rush_hour'][h] for h in range(24)}
+    return deltas
+
+
+def save_workbook_atomic(wb, filename):
+    replace_file(filename, wb.save)
+
+
+@instrumented
+class CostManager:
+    def __init__(self, filename="gastos.xlsx", dict_file="costos.json", bus=None):
+        self.filename = filename
+        self.dict_file = dict_file
+        self.expenses = []
+        self.cost_catalog = Catalog(dict_file, DEFAULT_COSTS, "costos")
+        # Read lock-free by the metrics endpoint; replaced whole, never mutated
+        self.gauges = {}
+        self.save_errors = 0
+        self.last_save_error = None
+        self._lock = threading.RLock()
+        self._next_id = 1
+        self.bus = bus if bus is not None else EventBus()
+        # Set by the app when an Inventory is attached to this store
+        self.inventory = None
+        # Set by the app when SupplyRollups are attached to this store
+        self.supplies = None
+        # Set by the app when DashboardAggregates are attached to both stores
+        self.aggregates = None
+
+        self.load_cost_dict()
+        self.load_expenses()
+        self._publish_gauges()
+
+    def _allocate_ids(self, n=1):
+        with self._lock:
+            first = self._next_id
+            self._next_id += n
+            return first
+
+    def _reset_next_id(self):
+        self._next_id = max((e['id'] for e in self.expenses), default=0) + 1
+
+    def replace_expenses(self, expenses):
+        """Swap in a whole expense list (benchmarks, restores) and resync ids."""
+        with self._lock:
+            self.expenses = sorted(expenses, key=lambda x: x['fecha'], reverse=True)
+            self._reset_next_id()
+            self._publish_gauges()
+            self.bus.publish(events.RESYNC, store="gastos")
+
+    def _publish_gauges(self):
+        self.gauges = {
+            'expenses': len(self.expenses),
+            'cost_items': len(self.cost_dict),
+        }
+
+    @property
+    def cost_dict(self):
+        return self.cost_catalog.items
+
+    def load_cost_dict(self):
+        self.cost_catalog.load()
+
+    def save_cost_dict(self):
+        self.cost_catalog.save()
+
+    def _catalog_changed(self, changes):
+        self._publish_gauges()
+        self.bus.publish(events.COSTS_CHANGED, version=self.cost_catalog.version, changes=changes)
+
+    def reload_cost_dict(self):
+        """Pick up edits made to costos.json by another terminal or by hand."""
+        with self._lock:
+            changes = self.cost_catalog.check()
+            if changes:
+                self._catalog_changed(changes)
+            return changes
+
+    def add_cost_item(self, name, cost):
+        with self._lock:
+            existed = name in self.cost_dict
+            self.cost_catalog.set(name, cost)
+            self._catalog_changed({"added": [] if existed else [name], "changed": [name] if existed else [], "removed": []})
+
+    def delete_cost_item(self, name):
+        with self._lock:
+            if self.cost_catalog.delete(name):
+                self._catalog_changed({"added": [], "changed": [], "removed": [name]})
+
+    def get_next_id(self):
+        return self._next_id
+
+    def load_expenses(self):
+        if not os.path.exists(self.filename):
+            return
+
+        try:
+            wb = load_workbook(self.filename)
+            ws = wb.active
+            expenses = []
+            for row in ws.iter_rows(min_row=2, values_only=True):
+                if not row or row[0] is None: continue
+                try:
+                    expense = {
+                        'id': int(row[0]),
+                        'fecha': row[1],
+                        'item': row[2],
+                        'cantidad': float(row[3]),
+                        'precio_unit': to_cents(row[4]),
+                        'total': to_cents(row[5])
+                    }
+                    expenses.append(expense)
+                except Exception:
+                    pass
+            # Sort by Date Descending
+            expenses.sort(key=lambda x: x['fecha'], reverse=True)
+            with self._lock:
+                self.expenses = expenses
+                self._reset_next_id()
+                self.bus.publish(events.RESYNC, store="gastos")
+        except Exception as e:
+            print(f"Error cargando gastos: {e}")
+
+    def save_expenses(self):
+        # RLock: mutations already hold it and call straight through
+        with self._lock:
+            return self._save_expenses()
+
+    def _save_expenses(self):
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Historial Gastos"
+        headers = ["ID", "Fecha", "Insumo", "Cantidad", "Costo Unit.", "Total"]
+        ws.append(headers)
+        
+        for e in self.expenses:
+            ws.append([
+                e['id'], e['fecha'], e['item'], e['cantidad'], to_soles(e['precio_unit']), to_soles(e['total'])
+            ])
+        try:
+            save_workbook_atomic(wb, self.filename)
+        except OSError as e:
+            self.save_errors += 1
+            self.last_save_error = (time.time(), str(e))
+            return str(e)
+        finally:
+            self._publish_gauges()
+        return None
+
+    def add_expense(self, item, cantidad, date_str=None):
+        with self._lock:
+            if item not in self.cost_dict: return "Item no existe"
+
+            cost = self.cost_dict[item]
+            if not date_str:
+                date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            expense = {
+                'id': self._allocate_ids(),
+                'fecha': date_str,
+                'item': item,
+                'cantidad': cantidad,
+                'precio_unit': cost,
+                'total': line_total(cost, cantidad)
+            }
+            expenses = [expense] + self.expenses # Add to top
+            # Sort again just in case date was in past
+            expenses.sort(key=lambda x: x['fecha'], reverse=True)
+            self.expenses = expenses
+            self.bus.publish(events.EXPENSE_ADDED, expenses=[expense])
+            return self.save_expenses()
+
+    def delete_expense(self, exp_id):
+        with self._lock:
+            removed = [e for e in self.expenses if e['id'] == exp_id]
+            self.expenses = [e for e in self.expenses if e['id'] != exp_id]
+            if removed:
+                self.bus.publish(events.EXPENSE_DELETED, expense=removed[0])
+            return self.save_expenses()
+
+    def import_expenses(self, records):
+        # Bulk append: fresh ids, one sort and one workbook write (amounts in cents)
+        records = list(records)
+        with self._lock:
+            next_id = self._allocate_ids(len(records))
+            added = []
+            for offset, r in enumerate(records):
+                cantidad = float(r['cantidad'])
+                precio_unit = int(r['precio_unit'])
+                added.append({
+                    'id': next_id + offset,
+                    'fecha': str(r['fecha']),
+                    'item': r['item'],
+                    'cantidad': cantidad,
+                    'precio_unit': precio_unit,
+                    'total': int(r['total']) if r.get('total') is not None else line_total(precio_unit, cantidad)
+                })
+            expenses = self.expenses + added
+            expenses.sort(key=lambda x: x['fecha'], reverse=True)
+            self.expenses = expenses
+            self.bus.publish(events.EXPENSE_ADDED, expenses=added)
+            return self.save_expenses()
+
+    def compact(self):
+        # Drop duplicated ids (keep first seen) and rewrite the workbook clean
+        with self._lock:
+            seen = set()
+            kept = []
+            for e in self.expenses:
+                if e['id'] in seen: continue
+                seen.add(e['id'])
+                kept.append(e)
+            removed = len(self.expenses) - len(kept)
+            self.expenses = kept
+            if removed:
+                self.bus.publish(events.RESYNC, store="gastos")
+            return removed, self.save_expenses()
+
+    def update_expense_date(self, exp_id, new_date):
+        with self._lock:
+            for idx, e in enumerate(self.expenses):
+                if e['id'] == exp_id:
+                    # Keep time if only date is gathered? Or expect full datetime iso string?
+                    # User picker returns YYYY-MM-DD. We might want to keep time or just set time to 00:00.
+                    # Simplification: Append current time if input is only date? 
+                    # Or just replace string.
+                    expenses = list(self.expenses)
+                    expenses[idx] = updated = {**e, 'fecha': new_date}
+                    expenses.sort(key=lambda x: x['fecha'], reverse=True)
+                    self.expenses = expenses
+                    self.bus.publish(events.EXPENSE_DATE_CHANGED, expense=updated, previous=e)
+                    return self.save_expenses()
+            return None
+
+    def get_financials(self, start_date=None, end_date=None, compare=None):
+        """Total and per-day expenses for a range, in cents.
+
+        With compare=(start, end) also returns a third item with the same
+        figures for that period and the change, from one grouped pass.
+        """
+        if self.aggregates is not None:
+            return self.aggregates.financials(start_date, end_date, compare)
+        # self.expenses is swapped, never mutated: this reference is a snapshot
+        expenses = self.expenses
+        periods = [(start_date, end_date)] + ([compare] if compare else [])
+        totals = [0] * len(periods)
+        dailies = [{} for _ in periods]
+
+        frames = [pd.DataFrame(records_between(expenses, s, e), columns=['fecha', 'total']).assign(periodo=i)
+                  for i, (s, e) in enumerate(periods) if s and e]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if not df.empty:
+            try:
+                day = pd.to_datetime(df['fecha']).dt.date
+                for (p, d), total in df.groupby(['periodo', day])['total'].sum().astype('int64').items():
+                    dailies[p][d] = int(total)
+                    totals[p] += int(total)
+            except Exception:
+                pass
+
+        if not compare:
+            return totals[0], dailies[0]
+        return totals[0], dailies[0], {"total": totals[1], "daily": dailies[1], **change(totals[0], totals[1])}
+
+# ================= MODELO / LÓGICA =================
+
+@instrumented
+class OrderManager:
+    def __init__(self, filename="pedidos_cevicheria.xlsx", menu_file="menu.json", bus=None):
+        self.filename = filename
+        self.menu_file = menu_file
+        self.orders = []
+        self.menu_catalog = Catalog(menu_file, DEFAULT_MENU, "menú")
+        # Read lock-free by the metrics endpoint; replaced whole, never mutated
+        self.gauges = {}
+        self.save_errors = 0
+        self.last_save_error = None
+        self.orders_created = 0
+        self.recent_order_times = deque(maxlen=5000)
+        self._lock = threading.RLock()
+        self._next_id = 1
+        self.bus = bus if bus is not None else EventBus()
+        # Set by the app when a DemandForecast is attached to this store
+        self.forecast = None
+        # Set by the app when a CustomerIndex is attached to this store
+        self.customers = None
+        # Set by the app when DashboardAggregates are attached to both stores
+        self.aggregates = None
+
+        self.load_menu()
+        self.load_orders()
+        self._publish_gauges()
+        # Pending orders by fecha, kept in step through a bus listener
+        self.kitchen = KitchenQueue(self)
+
+    def _allocate_ids(self, n=1):
+        # Central id allocation: monotonic, never reuses a deleted id
+        with self._lock:
+            first = self._next_id
+            self._next_id += n
+            return first
+
+    def _reset_next_id(self):
+        self._next_id = max((o['id'] for o in self.orders), default=0) + 1
+
+    def replace_orders(self, orders):
+        """Swap in a whole order list (benchmarks, restores) and resync ids."""
+        with self._lock:
+            self.orders = sorted(orders, key=lambda x: x['fecha'], reverse=True)
+            self._reset_next_id()
+            self._publish_gauges()
+            self.bus.publish(events.RESYNC, store="pedidos")
+
+    def snapshot(self):
+        """Consistent view of the orders; the returned list is never mutated."""
+        return self.orders
+
+    def _publish_gauges(self):
+        pending = unpaid = 0
+        for o in self.orders:
+            if not o['entregado']: pending += 1
+            if not o['pagado']: unpaid += 1
+        self.gauges = {
+            'orders': len(self.orders),
+            'pending_kitchen': pending,
+            'unpaid': unpaid,
+            'menu_items': len(self.menu),
+        }
+
+    def orders_last_minute(self):
+        # tuple() copies the deque in one C call, safe against concurrent appends
+        cutoff = time.time() - 60
+        return sum(1 for t in tuple(self.recent_order_times) if t >= cutoff)
+
+    @property
+    def menu(self):
+        return self.menu_catalog.items
+
+    def load_menu(self):
+        self.menu_catalog.load()
+
+    def save_menu(self):
+        self.menu_catalog.save()
+
+    def _catalog_changed(self, changes):
+        self._publish_gauges()
+        self.bus.publish(events.MENU_CHANGED, version=self.menu_catalog.version, changes=changes)
+
+    def reload_menu(self):
+        """Pick up edits made to menu.json by another terminal or by hand."""
+        with self._lock:
+            changes = self.menu_catalog.check()
+            if changes:
+                self._catalog_changed(changes)
+            return changes
+
+    def add_dish(self, name, price):
+        # Update if exists, else add new
+        with self._lock:
+            existed = name in self.menu
+            self.menu_catalog.set(name, price)
+            self._catalog_changed({"added": [] if existed else [name], "changed": [name] if existed else [], "removed": []})
+
+    def delete_dish(self, name):
+        with self._lock:
+            if self.menu_catalog.delete(name):
+                self._catalog_changed({"added": [], "changed": [], "removed": [name]})
+
+    def get_next_id(self):
+        return self._next_id
+
+    def load_orders(self):
+        if not os.path.exists(self.filename):
+            return
+
+        try:
+            wb = load_workbook(self.filename)
+            ws = wb.active
+            orders = []
+            for row in ws.iter_rows(min_row=2, values_only=True):
+                if not row or row[0] is None: continue
+                
+                row_data = list(row)
+                while len(row_data) < 12:
+                    row_data.append(None)
+
+                try:
+                    order = {
+                        'id': int(row_data[0]),
+                        'fecha': row_data[1],
+                        'cliente': row_data[2],
+                        'plato': row_data[3],
+                        'cantidad': int(row_data[4]),
+                        'precio': to_cents(row_data[5]),
+                        'subtotal': to_cents(row_data[6]) if row_data[6] is not None else int(row_data[4]) * to_cents(row_data[5]),
+                        'metodo_pago': str(row_data[7]) if row_data[7] else "Efectivo",
+                        'entregado': str(row_data[8]) == 'Si',
+                        'pagado': str(row_data[9]) == 'Si',
+                        'entregado_en': str(row_data[10]) if row_data[10] else None,
+                        # Rows saved before tickets existed are single-line tickets
+                        'ticket_id': int(row_data[11]) if row_data[11] is not None else int(row_data[0])
+                    }
+                    orders.append(order)
+                except Exception:
+                    pass
+            # Sort Descending
+            orders.sort(key=lambda x: x['fecha'], reverse=True)
+            with self._lock:
+                self.orders = orders
+                self._reset_next_id()
+                self.bus.publish(events.RESYNC, store="pedidos")
+        except Exception as e:
+            print(f"Error cargando historial: {e}")
+
+    def save_orders(self):
+        # RLock: mutations already hold it and call straight through
+        with self._lock:
+            return self._save_orders()
+
+    def _save_orders(self):
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Historial Pedidos"
+        headers = ["ID", "Fecha", "Cliente", "Plato", "Cant.", "Precio Unit.", "Total", "Método Pago", "Entregado", "Pagado", "Hora Entrega", "Ticket"]
+        ws.append(headers)
+        
+        for o in self.orders:
+            ws.append([
+                o['id'], o['fecha'], o['cliente'], o['plato'], o['cantidad'], to_soles(o['precio']),
+                to_soles(o['subtotal']), o.get('metodo_pago', 'Efectivo'),
+                "Si" if o['entregado'] else "No", "Si" if o['pagado'] else "No",
+                o.get('entregado_en'), o.get('ticket_id', o['id'])
+            ])
+        try:
+            save_workbook_atomic(wb, self.filename)
+        except OSError as e:
+            self.save_errors += 1
+            self.last_save_error = (time.time(), str(e))
+            return str(e)
+        finally:
+            self._publish_gauges()
+        return None
+
+    def add_order(self, cliente, plato, cantidad, metodo_pago, date_str=None):
+        with self._lock:
+            if plato not in self.menu: return None
+            _, err = self.add_ticket(cliente, [(plato, cantidad)], metodo_pago, date_str)
+            return err
+
+    def add_ticket(self, cliente, lines, metodo_pago, date_str=None):
+        """Commit several (plato, cantidad) lines as one ticket.
+
+        All lines are checked against the menu first; nothing is stored
+        unless every line is valid. One sort, one event and one workbook
+        write for the whole ticket. Returns (ticket_id, error).
+        """
+        lines = list(lines)
+        with self._lock:
+            menu = self.menu
+            parsed, invalid = [], []
+            for plato, cantidad in lines:
+                try:
+                    cantidad = int(cantidad)
+                except (TypeError, ValueError):
+                    cantidad = 0
+                if plato not in menu or cantidad <= 0:
+                    invalid.append(plato)
+                parsed.append((plato, cantidad))
+            if not lines or invalid:
+                return None, f"Ticket inválido: {', '.join(map(str, invalid)) or 'sin platos'}"
+
+            if not date_str:
+                date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            first_id = self._allocate_ids(len(lines))
+            added = []
+            for offset, (plato, cantidad) in enumerate(parsed):
+                precio = menu[plato]
+                added.append({
+                    'id': first_id + offset,
+                    'fecha': date_str,
+                    'cliente': cliente,
+                    'plato': plato,
+                    'cantidad': cantidad,
+                    'precio': precio,
+                    'subtotal': precio * cantidad,
+                    'metodo_pago': metodo_pago,
+                    'entregado': False,
+                    'pagado': False,
+                    'entregado_en': None,
+                    'ticket_id': first_id
+                })
+            orders = self.orders + added
+            # Sort again just in case date was in past
+            orders.sort(key=lambda x: x['fecha'], reverse=True)
+            self.orders = orders
+            self.orders_created += len(added)
+            now = time.time()
+            self.recent_order_times.extend([now] * len(added))
+            self.bus.publish(events.ORDER_ADDED, orders=added)
+            return first_id, self.save_orders()
+
+    def delete_order(self, order_id):
+        with self._lock:
+            removed = [o for o in self.orders if o['id'] == order_id]
+            self.orders = [o for o in self.orders if o['id'] != order_id]
+            if removed:
+                self.bus.publish(events.ORDER_DELETED, order=removed[0])
+            return self.save_orders()
+
+    def import_orders(self, records):
+        # Bulk append: keeps the recorded price (cents), fresh ids, one sort and one workbook write.
+        # Source ticket numbers are remapped: a ticket's lines share the new id of its first line
+        records = list(records)
+        with self._lock:
+            next_id = self._allocate_ids(len(records))
+            tickets = {}
+            added = []
+            for offset, r in enumerate(records):
+                source = r.get('ticket_id')
+                if source is None or source == "":
+                    ticket_id = next_id + offset
+                else:
+                    ticket_id = tickets.setdefault(str(source), next_id + offset)
+                cantidad = int(r['cantidad'])
+                precio = int(r['precio'])
+                added.append({
+                    'id': next_id + offset,
+                    'fecha': str(r['fecha']),
+                    'cliente': r['cliente'],
+                    'plato': r['plato'],
+                    'cantidad': cantidad,
+                    'precio': precio,
+                    'subtotal': int(r['subtotal']) if r.get('subtotal') is not None else precio * cantidad,
+                    'metodo_pago': r.get('metodo_pago') or "Efectivo",
+                    'entregado': bool(r.get('entregado', False)),
+                    'pagado': bool(r.get('pagado', False)),
+                    'entregado_en': r.get('entregado_en'),
+                    'ticket_id': ticket_id
+                })
+            orders = self.orders + added
+            orders.sort(key=lambda x: x['fecha'], reverse=True)
+            self.orders = orders
+            self.bus.publish(events.ORDER_ADDED, orders=added)
+            return self.save_orders()
+
+    def compact(self):
+        # Drop duplicated ids (keep first seen) and rewrite the workbook clean
+        with self._lock:
+            seen = set()
+            kept = []
+            for o in self.orders:
+                if o['id'] in seen: continue
+                seen.add(o['id'])
+                kept.append(o)
+            removed = len(self.orders) - len(kept)
+            self.orders = kept
+            if removed:
+                self.bus.publish(events.RESYNC, store="pedidos")
+            return removed, self.save_orders()
+
+    def toggle_status(self, order_id, field):
+        with self._lock:
+            for idx, order in enumerate(self.orders):
+                if order['id'] == order_id:
+                    orders = list(self.orders)
+                    orders[idx] = updated = {**order, field: not order[field]}
+                    if field == 'entregado':
+                        # Delivery time feeds the kitchen prep-time stats
+                        updated['entregado_en'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S") if updated['entregado'] else None
+                    self.orders = orders
+                    self.bus.publish(events.STATUS_CHANGED, order=updated, previous=order, field=field)
+                    return self.save_orders()
+            return None
+
+    def update_order_date(self, order_id, new_date):
+        with self._lock:
+            for idx, o in enumerate(self.orders):
+                if o['id'] == order_id:
+                    orders = list(self.orders)
+                    orders[idx] = updated = {**o, 'fecha': new_date}
+                    orders.sort(key=lambda x: x['fecha'], reverse=True)
+                    self.orders = orders
+                    self.bus.publish(events.DATE_CHANGED, order=updated, previous=o)
+                    return self.save_orders()
+            return None
+
+    def get_filtered_stats(self, start_date=None, end_date=None, compare=None):
+        """Sales KPIs for a range (default: today).
+
+        With compare=(start, end) the same KPIs are computed for that period
+        in the same grouped pass; they come back under "comparison" and the
+        differences under "deltas". With DashboardAggregates attached the
+        KPIs come from their per-day cells instead.
+        """
+        if self.aggregates is not None:
+            return self.aggregates.stats(start_date, end_date, compare)
+        orders = self.snapshot()
+        if not orders:
+            return None
+        if not (start_date and end_date):
+            # Default to today if no range
+            start_date = end_date = datetime.now()
+        periods = [(start_date, end_date)] + ([compare] if compare else [])
+
+        # Only the rows of each window, located by bisect on the sorted list
+        frames = [pd.DataFrame(records_between(orders, s, e), columns=STATS_COLUMNS).assign(periodo=i)
+                  for i, (s, e) in enumerate(periods)]
+        df = pd.concat(frames, ignore_index=True)
+        # Cents: every sum below is an exact int64 reduction
+        df['subtotal'] = df['subtotal'].astype('int64')
+        try:
+            df['fecha_dt'] = pd.to_datetime(df['fecha'])
+        except Exception:
+            return None
+
+        results = period_stats(df, len(periods))
+        stats = results[0]
+        if compare:
+            stats['comparison'] = results[1]
+            stats['deltas'] = stats_deltas(results[0], results[1])
+        return stats
@@ -0,0 +1,136 @@
+"""Optional Prometheus text endpoint for the branch monitoring box.
+
+    YAFRANK_METRICS_PORT=9108 python "cevicheria YAFRANK.py"
+    curl http://127.0.0.1:9108/metrics
+
+A scrape only reads the managers' published `gauges` dicts (swapped whole
+on every save, never mutated) and copies the latency histograms, whose
+locks are held for a few microseconds. It never touches the order list.
+"""
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import instrumentation
+
+_server = None
+
+# Histograms exported as Prometheus histograms (one bucket per doubling)
+LATENCY_METRICS = {
+    "OrderManager.save_orders": ("yafrank_save_seconds", {"store": "pedidos"}),
+    "CostManager.save_expenses": ("yafrank_save_seconds", {"store": "gastos"}),
+    "ui.update_dashboard_logic": ("yafrank_dashboard_recompute_seconds", {}),
+}
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+        self._declared = set()
+
+    def metric(self, name, kind, help_text, value, labels=None):
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {kind}")
+        self.lines.append(f"{name}{_labels(labels)} {_fmt(value)}")
+
+    def histogram(self, name, help_text, snap, labels):
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} histogram")
+        for i, (bound, count) in enumerate(snap.buckets()):
+            if bound != math.inf and i % 4 != 3:
+                continue
+            self.lines.append(f"{name}_bucket{_labels({**labels, 'le': _fmt(bound)})} {count}")
+        self.lines.append(f"{name}_sum{_labels(labels)} {_fmt(snap.sum)}")
+        self.lines.append(f"{name}_count{_labels(labels)} {snap.count}")
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def render(manager, cost_manager):
+    w = _Writer()
+    og = manager.gauges
+    cg = cost_manager.gauges
+
+    w.metric("yafrank_orders_created_total", "counter", "Pedidos registrados desde el inicio del proceso.",
+             manager.orders_created)
+    w.metric("yafrank_orders_per_minute", "gauge", "Pedidos registrados en los últimos 60 segundos.",
+             manager.orders_last_minute())
+    w.metric("yafrank_orders_pending_kitchen", "gauge", "Pedidos con entregado == False.", og.get('pending_kitchen', 0))
+    w.metric("yafrank_orders_unpaid", "gauge", "Pedidos con pagado == False.", og.get('unpaid', 0))
+
+    w.metric("yafrank_records", "gauge", "Registros en memoria.", og.get('orders', 0), {"store": "pedidos"})
+    w.metric("yafrank_records", "gauge", "Registros en memoria.", cg.get('expenses', 0), {"store": "gastos"})
+    w.metric("yafrank_records", "gauge", "Registros en memoria.", og.get('menu_items', 0), {"store": "menu"})
+    w.metric("yafrank_records", "gauge", "Registros en memoria.", cg.get('cost_items', 0), {"store": "costos"})
+
+    for store, mgr in (("pedidos", manager), ("gastos", cost_manager)):
+        w.metric("yafrank_save_errors_total", "counter", "Errores al guardar (PermissionError).",
+                 mgr.save_errors, {"store": store})
+    for store, mgr in (("pedidos", manager), ("gastos", cost_manager)):
+        last = mgr.last_save_error
+        w.metric("yafrank_last_save_error_timestamp_seconds", "gauge",
+                 "Hora Unix del último error al guardar (0 si no hubo).",
+                 last[0] if last else 0, {"store": store})
+    for store, mgr in (("pedidos", manager), ("gastos", cost_manager)):
+        last = mgr.last_save_error
+        if last:
+            w.metric("yafrank_last_save_error_info", "gauge", "Mensaje del último error al guardar.",
+                     1, {"store": store, "error": last[1]})
+
+    snaps = {s.name: s for s in instrumentation.snapshots()}
+    for op, (name, labels) in LATENCY_METRICS.items():
+        snap = snaps.get(op)
+        if snap is not None:
+            w.histogram(name, f"Latencia de {op} en segundos.", snap, labels)
+
+    w.metric("yafrank_scrape_timestamp_seconds", "gauge", "Hora Unix de esta lectura.", time.time())
+    return w.text()
+
+
+def start_metrics_server(manager, cost_manager, port, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread. Only the first call starts a server."""
+    global _server
+    if _server is not None:
+        return _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render(manager, cost_manager).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="yafrank-metrics", daemon=True).start()
+    return _server
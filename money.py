@@ -0,0 +1,96 @@
+"""Money as integer cents (céntimos).
+
+Prices, subtotals and totals live in the stores, the catalogs and every
+aggregate as int cents, so a day's or a year's sum is an exact integer
+reduction and 0.10 + 0.20 is always 30. Soles appear only at the edges:
+
+* reading what people type or edit (UI fields, menu.json, costos.json,
+  workbooks, imported CSV/xlsx): `to_cents` / `cents_array`;
+* writing what people read (workbooks, exports, CLI reports): `to_soles`;
+* showing amounts (UI, PDF): `fmt` / `fmt_plain`.
+
+A price times a fractional quantity (2.5 kg) is rounded half up to the
+cent once, when the line is created (`line_total`); sums never round.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+# Record fields that hold money
+MONEY_FIELDS = ("precio", "subtotal", "precio_unit", "total")
+
+
+def to_cents(value):
+    """Soles (number or text such as "12.5") to int cents, rounded half up."""
+    if isinstance(value, str):
+        value = value.strip().replace(",", ".")
+    # The inner round drops float noise (0.285 * 100 = 28.499999...) before rounding half up
+    return int(math.floor(round(float(value) * 100, 6) + 0.5))
+
+
+def cents_array(values):
+    """Vectorized to_cents for a Series/array of soles; NaN stays NaN (float result)."""
+    s = pd.to_numeric(pd.Series(values), errors='coerce').astype(float)
+    cents = np.floor((s * 100).round(6) + 0.5)
+    return cents.astype('int64') if not cents.isna().any() else cents
+
+
+def line_total(price_cents, quantity):
+    """Cents for price x quantity; exact for whole quantities, half up otherwise."""
+    quantity = float(quantity)
+    if quantity.is_integer():
+        return int(price_cents) * int(quantity)
+    return int(math.floor(round(price_cents * quantity, 6) + 0.5))
+
+
+def line_totals(price_cents, quantity):
+    """Vectorized line_total for two aligned Series/arrays."""
+    return np.floor((np.asarray(price_cents, dtype=float) * np.asarray(quantity, dtype=float)).round(6) + 0.5).astype('int64')
+
+
+def to_soles(cents):
+    """Cents to a soles number for files and reports (exact to the cent)."""
+    return round(cents / 100, 2)
+
+
+def fmt_plain(cents):
+    """'1234.50' from 123450, without going through a float."""
+    cents = int(round(cents))
+    sign = "-" if cents < 0 else ""
+    whole, part = divmod(abs(cents), 100)
+    return f"{sign}{whole}.{part:02d}"
+
+
+def fmt(cents, signed=False):
+    """'S/ 1234.50' (or 'S/ +1234.50' when signed)."""
+    text = fmt_plain(cents)
+    if signed and not text.startswith("-"):
+        text = "+" + text
+    return f"S/ {text}"
+
+
+def normalize_record(record):
+    """Record with its money fields in cents.
+
+    Files written before amounts were kept in cents (history log and
+    snapshots, JSON backups) hold soles as floats; cents are always ints.
+    """
+    legacy = [k for k in MONEY_FIELDS if isinstance(record.get(k), float)]
+    if not legacy:
+        return record
+    return {**record, **{k: to_cents(record[k]) for k in legacy}}
+
+
+def soles_tree(obj, keys, money=False):
+    """Copy of a nested report with the values under `keys` converted to soles.
+
+    Everything below a money key is money except percentages ("pct").
+    """
+    if isinstance(obj, dict):
+        return {k: v if k == "pct" else soles_tree(v, keys, money or k in keys) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [soles_tree(v, keys, money) for v in obj]
+    if money and isinstance(obj, (int, float, np.integer, np.floating)) and not isinstance(obj, bool):
+        return to_soles(float(obj))
+    return obj
@@ -0,0 +1,60 @@
+"""One set of overlay controls per session, reused by every click.
+
+Flet never drops a control from the page once it has been opened:
+`page.open()` parks it in the page's offstage list and `page.overlay`
+keeps whatever was appended. A new DatePicker, AlertDialog or SnackBar
+per click therefore stays alive for the whole session and is diffed on
+every later `page.update()`.
+
+`OverlayPool` builds them once: a shared date picker whose callback is
+swapped on each pick, a single dialog whose title, content and actions
+are replaced on each show, and a small ring of snackbars so a quick run
+of messages does not cut the one on screen. The overlay holds the same
+handful of controls after one click or after a full service day.
+"""
+from datetime import datetime
+
+import flet as ft
+
+FIRST_DATE = datetime(2020, 1, 1)
+LAST_DATE = datetime(2100, 12, 31)
+SNACK_SLOTS = 3
+
+
+class OverlayPool:
+    def __init__(self, page, snack_slots=SNACK_SLOTS):
+        self.page = page
+        self._on_pick = None
+        self.date_picker = ft.DatePicker(first_date=FIRST_DATE, last_date=LAST_DATE, on_change=self._picked)
+        self.dialog = ft.AlertDialog(title=ft.Text(""))
+        self.snacks = [ft.SnackBar(ft.Text("")) for _ in range(snack_slots)]
+        self._next_snack = 0
+        page.overlay.append(self.date_picker)
+        page.overlay.extend(self.snacks)
+
+    def pick_date(self, on_pick, value=None):
+        """Open the shared picker; on_pick(datetime) runs when a date is chosen."""
+        self._on_pick = on_pick
+        self.date_picker.value = value
+        self.page.open(self.date_picker)
+
+    def _picked(self, e):
+        if self._on_pick is not None and self.date_picker.value:
+            self._on_pick(self.date_picker.value)
+
+    def show_dialog(self, title, content, actions):
+        dlg = self.dialog
+        dlg.title.value = title
+        dlg.content = content
+        dlg.actions = actions
+        self.page.open(dlg)
+
+    def close_dialog(self):
+        self.page.close(self.dialog)
+
+    def notify(self, message, color=ft.Colors.GREEN):
+        snack = self.snacks[self._next_snack]
+        self._next_snack = (self._next_snack + 1) % len(self.snacks)
+        snack.content.value = message
+        snack.bgcolor = color
+        self.page.open(snack)
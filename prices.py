@@ -0,0 +1,243 @@
+"""Effective-dated prices for dishes and supplies.
+
+`menu.json` and `costos.json` only hold today's price. PriceTable keeps
+every change as (desde, precio) per name in precios.json, sorted by
+date, so:
+
+* `price_at(kind, name, when)` is a bisect on that name's change dates;
+* `prices_asof(df, ...)` prices a whole table of orders or expenses in
+  one `pandas.merge_asof` instead of a lookup per row;
+* `revenue_series` / `cost_series` put the recorded amounts next to the
+  same quantities valued at the table price, either the one in force on
+  each day or the one in force on a fixed date ("what if the old price
+  had applied").
+
+The first time it runs the table is seeded from the prices recorded on
+existing orders and expenses; afterwards it follows the catalogs through
+the menu_changed / costs_changed events. Prices are int cents, in memory
+and in precios.json (older files hold soles floats, converted on load).
+"""
+import bisect
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import events
+from atomic import replace_file
+from daterange import records_between
+from money import to_cents
+
+PLATOS = "platos"
+INSUMOS = "insumos"
+# Effective date for prices whose start is unknown
+ORIGIN = "1900-01-01 00:00:00"
+
+
+def _stamp(when=None):
+    if when is None:
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(when, (int, float)):
+        return datetime.fromtimestamp(when).strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(when, str):
+        return when if len(when) > 10 else f"{when} 00:00:00"
+    return when.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class PriceTable:
+    def __init__(self, path="precios.json"):
+        self.path = path
+        # kind -> name -> ([desde...], [precio...]), both sorted by desde
+        self.table = {PLATOS: {}, INSUMOS: {}}
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._catalogs = {}
+        self.loaded = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error cargando precios: {e}")
+            return False
+        for kind in (PLATOS, INSUMOS):
+            for name, changes in data.get(kind, {}).items():
+                changes = sorted(changes, key=lambda c: c[0])
+                self.table[kind][name] = ([c[0] for c in changes], [_cents(c[1]) for c in changes])
+        return True
+
+    def save(self):
+        data = {kind: {name: [[d, p] for d, p in zip(*series)] for name, series in names.items()}
+                for kind, names in self.table.items()}
+
+        def write(tmp):
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+        try:
+            replace_file(self.path, write)
+        except Exception as e:
+            print(f"Error guardando precios: {e}")
+
+    # --- recording ---
+
+    def record(self, kind, name, price, when=None, save=True):
+        """Price (None = withdrawn) in force from `when` on; repeats are ignored."""
+        desde = _stamp(when)
+        price = None if price is None else int(price)
+        with self._lock:
+            dates, values = self.table[kind].get(name, ([], []))
+            idx = bisect.bisect_right(dates, desde)
+            if idx and values[idx - 1] == price:
+                return False
+            dates, values = list(dates), list(values)
+            dates.insert(idx, desde)
+            values.insert(idx, price)
+            self.table[kind] = {**self.table[kind], name: (dates, values)}
+            self._frames.pop(kind, None)
+        if save:
+            self.save()
+        return True
+
+    def seed(self, orders, expenses, menu, cost_dict):
+        """Build the table from the prices recorded on past records."""
+        for kind, records, name_key, price_key in ((PLATOS, orders, 'plato', 'precio'),
+                                                   (INSUMOS, expenses, 'item', 'precio_unit')):
+            df = pd.DataFrame(records, columns=['fecha', name_key, price_key])
+            if not df.empty:
+                df['fecha'] = df['fecha'].astype(str)
+                df = df.sort_values('fecha', kind='stable')
+                # Only the sales where a name's price differs from its previous one
+                prev = df.groupby(name_key)[price_key].shift()
+                changes = df.loc[df[price_key].ne(prev), ['fecha', name_key, price_key]]
+                first = prev.loc[changes.index].isna()
+                for (fecha, name, price), is_first in zip(changes.itertuples(index=False), first):
+                    self.record(kind, name, price, ORIGIN if is_first else fecha, save=False)
+            # Today's catalog price, if it moved since the last recorded sale
+            for name, price in (menu if kind == PLATOS else cost_dict).items():
+                self.record(kind, name, price, None if name in self.table[kind] else ORIGIN, save=False)
+        self.save()
+
+    def attach(self, manager, cost_manager):
+        if not self.loaded:
+            self.seed(manager.orders, cost_manager.expenses, manager.menu, cost_manager.cost_dict)
+            self.loaded = True
+        manager.bus.add_listener(self.on_event)
+        if cost_manager.bus is not manager.bus:
+            cost_manager.bus.add_listener(self.on_event)
+        self._catalogs = {PLATOS: manager, INSUMOS: cost_manager}
+
+    def on_event(self, event):
+        if event.topic == events.MENU_CHANGED:
+            kind, items = PLATOS, self._catalogs[PLATOS].menu
+        elif event.topic == events.COSTS_CHANGED:
+            kind, items = INSUMOS, self._catalogs[INSUMOS].cost_dict
+        else:
+            return
+        changes = event.data['changes']
+        for name in changes['added'] + changes['changed']:
+            self.record(kind, name, items.get(name), event.ts, save=False)
+        for name in changes['removed']:
+            self.record(kind, name, None, event.ts, save=False)
+        self.save()
+
+    # --- lookups ---
+
+    def price_at(self, kind, name, when=None):
+        series = self.table[kind].get(name)
+        if not series:
+            return None
+        dates, values = series
+        idx = bisect.bisect_right(dates, _stamp(when))
+        return values[idx - 1] if idx else None
+
+    def history(self, kind, name):
+        dates, values = self.table[kind].get(name, ([], []))
+        return list(zip(dates, values))
+
+    def frame(self, kind):
+        """All changes of one kind as a DataFrame sorted by `desde` (cached)."""
+        df = self._frames.get(kind)
+        if df is None:
+            rows = [(name, d, p) for name, (dates, values) in self.table[kind].items()
+                    for d, p in zip(dates, values)]
+            df = pd.DataFrame(rows, columns=['nombre', 'desde', 'precio_tabla'])
+            # Same key dtypes as prices_asof builds, or merge_asof refuses to join
+            df['nombre'] = df['nombre'].astype(str)
+            df['desde'] = pd.to_datetime(df['desde']).astype('datetime64[ns]')
+            df['precio_tabla'] = df['precio_tabla'].astype(float)
+            df = df.sort_values('desde', kind='stable').reset_index(drop=True)
+            self._frames[kind] = df
+        return df
+
+    def prices_asof(self, df, kind, name_col, date_col, at=None):
+        """Table price for every row of df, as a Series aligned to df.index.
+
+        With `at`, every row is priced as of that single date instead of
+        its own date.
+        """
+        if df.empty:
+            return pd.Series(index=df.index, dtype=float)
+        table = self.frame(kind)
+        if at is not None:
+            keys = pd.Series(pd.Timestamp(_stamp(at)), index=df.index)
+        else:
+            keys = df[date_col]
+        left = pd.DataFrame({
+            'nombre': df[name_col].astype(str).values,
+            'desde': keys.astype('datetime64[ns]').values,
+            'row': range(len(df)),
+        })
+        left['nombre'] = left['nombre'].astype(str)
+        left = left.sort_values('desde', kind='stable')
+        merged = pd.merge_asof(left, table, on='desde', by='nombre', direction='backward')
+        return pd.Series(merged.sort_values('row')['precio_tabla'].values, index=df.index)
+
+
+def _cents(price):
+    if isinstance(price, float):
+        return to_cents(price)
+    return price
+
+
+def _valued(cantidad, price):
+    # Cents, rounded half up per line like the recorded totals; NaN where no table price
+    return np.floor((cantidad * price).round(6) + 0.5)
+
+
+def _range_frame(records, columns, start_date=None, end_date=None):
+    # Records are the managers' newest-first lists: bisect the range, then build the frame
+    if start_date and end_date:
+        records = records_between(records, start_date, end_date)
+    df = pd.DataFrame(records, columns=columns)
+    df['fecha_dt'] = pd.to_datetime(df['fecha'].astype(str), format="ISO8601")
+    return df
+
+
+def revenue_series(prices, orders, start_date=None, end_date=None, at=None, freq="D"):
+    """Per-period revenue in cents: recorded vs. valued at the price table.
+
+    Columns: real (recorded subtotal), tabla (cantidad x table price on the
+    sale date, or on `at` when given) and diferencia.
+    """
+    df = _range_frame(orders, ['fecha', 'plato', 'cantidad', 'subtotal'], start_date, end_date)
+    df['tabla'] = _valued(df['cantidad'], prices.prices_asof(df, PLATOS, 'plato', 'fecha_dt', at))
+    out = df.groupby(df['fecha_dt'].dt.to_period(freq))[['subtotal', 'tabla']].sum()
+    out = out.rename(columns={'subtotal': 'real'})
+    out['diferencia'] = out['tabla'] - out['real']
+    return out
+
+
+def cost_series(prices, expenses, start_date=None, end_date=None, at=None, freq="D"):
+    """Per-period expenses in cents: recorded vs. valued at the price table."""
+    df = _range_frame(expenses, ['fecha', 'item', 'cantidad', 'total'], start_date, end_date)
+    df['tabla'] = _valued(df['cantidad'], prices.prices_asof(df, INSUMOS, 'item', 'fecha_dt', at))
+    out = df.groupby(df['fecha_dt'].dt.to_period(freq))[['total', 'tabla']].sum()
+    out = out.rename(columns={'total': 'real'})
+    out['diferencia'] = out['tabla'] - out['real']
+    return out
@@ -0,0 +1,126 @@
+"""Recipe table and theoretical ingredient consumption.
+
+recetas.json maps each dish to the quantity of every costos.json item one
+portion uses:
+
+    {"Ceviche": {"Pescado (Kg)": 0.25, "Limón (Kg)": 0.15, ...}, ...}
+
+For a date range the portions sold per dish become a vector q (the
+dashboard's per-day dish cells, or one pass over the orders with a
+bincount per dish), and the recipes a dish x item matrix R. Then
+
+    consumption = q @ R                 theoretical kg/L per item
+    unit_cost   = R @ cost              food cost of one portion per dish
+
+so the whole report is two matrix products however long the range is.
+Dishes without a recipe count as zero food cost and are listed apart.
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from daterange import records_between
+
+
+def load_recipes(path="recetas.json"):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error cargando recetas: {e}")
+        return {}
+
+
+def _in_range(records, start_date=None, end_date=None):
+    # Same default as the dashboard: today when no range is given
+    if not (start_date and end_date):
+        start_date = end_date = datetime.now()
+    return records_between(records, start_date, end_date)
+
+
+def _sum_by(keys, weights, labels):
+    """Total weight per label, via factorize + bincount."""
+    if not keys:
+        return np.zeros(len(labels))
+    codes, uniques = pd.factorize(pd.Series(keys, dtype=object))
+    totals = np.bincount(codes, weights=np.asarray(weights, dtype=float), minlength=len(uniques))
+    return pd.Series(totals, index=uniques).reindex(labels, fill_value=0.0).to_numpy()
+
+
+def recipe_matrix(recipes, dishes, items):
+    R = np.zeros((len(dishes), len(items)))
+    col = {item: j for j, item in enumerate(items)}
+    for i, dish in enumerate(dishes):
+        for item, qty in recipes.get(dish, {}).items():
+            if item in col:
+                R[i, col[item]] = float(qty)
+    return R
+
+
+def consumption_report(orders, expenses, recipes, cost_dict, start_date=None, end_date=None, sold=None):
+    """Theoretical vs. purchased quantities and per-dish margin for a range.
+
+    `sold` is {dish: [quantity, subtotal]} for the range when the caller
+    already has it (DashboardAggregates.dish_sales); the orders are not
+    read then. Returns {"insumos": DataFrame, "platos": DataFrame,
+    "costo_teorico", "ingresos", "sin_receta"}. Money is in cents;
+    theoretical costs come from recipe fractions and are left unrounded.
+    """
+    if sold is None:
+        lines = _in_range(orders, start_date, end_date)
+        names = [o['plato'] for o in lines]
+        sold_dishes = set(names)
+    else:
+        sold_dishes = {name for name, (qty, _) in sold.items() if qty}
+    bought = _in_range(expenses, start_date, end_date)
+
+    dishes = sorted(sold_dishes | set(recipes))
+    items = list(cost_dict)
+    R = recipe_matrix(recipes, dishes, items)
+    cost = np.array([float(cost_dict[i]) for i in items])
+
+    if sold is None:
+        q = _sum_by(names, [o['cantidad'] for o in lines], dishes)
+        revenue = _sum_by(names, [o['subtotal'] for o in lines], dishes)
+    else:
+        q = np.array([float(sold[d][0]) if d in sold else 0.0 for d in dishes])
+        revenue = np.array([float(sold[d][1]) if d in sold else 0.0 for d in dishes])
+    purchased = _sum_by([e['item'] for e in bought], [e['cantidad'] for e in bought], items)
+    spent = _sum_by([e['item'] for e in bought], [e['total'] for e in bought], items)
+
+    consumption = q @ R
+    unit_cost = R @ cost
+    food_cost = q * unit_cost
+
+    # Only items some recipe uses: staff and services are not ingredients
+    used = R.any(axis=0)
+    insumos = pd.DataFrame({
+        "teorico": consumption,
+        "comprado": purchased,
+        "diferencia": purchased - consumption,
+        "costo_teorico": consumption * cost,
+        "gasto_real": spent,
+    }, index=items)[used]
+
+    platos = pd.DataFrame({
+        "vendidos": q,
+        "ingresos": revenue,
+        "costo_unitario": unit_cost,
+        "costo_total": food_cost,
+        "margen": revenue - food_cost,
+    }, index=dishes)
+    platos["margen_pct"] = np.where(revenue > 0, platos["margen"] / np.where(revenue > 0, revenue, 1) * 100, 0.0)
+    platos = platos[platos["vendidos"] > 0].sort_values("margen", ascending=False)
+
+    return {
+        "insumos": insumos,
+        "platos": platos,
+        "costo_teorico": float(food_cost.sum()),
+        "ingresos": int(round(revenue.sum())),
+        "sin_receta": [d for d in platos.index if d not in recipes],
+    }
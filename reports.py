@@ -0,0 +1,219 @@
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.formatting.rule import ColorScaleRule
+from reportlab.lib.colors import Color
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from aggregates import demand_heatmap
+from charts import WEEKDAY_LABELS
+from money import fmt, fmt_plain, to_soles
+# ================= REPORTES DE CIERRE =================
+
+
+def closing_label(start_date=None, end_date=None):
+    s_date = start_date.strftime("%Y-%m-%d") if start_date else "Inicio"
+    e_date = end_date.strftime("%Y-%m-%d") if end_date else "Fin"
+    return s_date, e_date
+
+
+def closing_filename(start_date=None, end_date=None, ext="pdf"):
+    s_date, e_date = closing_label(start_date, end_date)
+    return f"reporte_cierre_{s_date}_a_{e_date}.{ext}".replace(" ", "_")
+
+
+def filter_by_range(records, start_date=None, end_date=None):
+    # Same window as the dashboard: whole end day included
+    if not (start_date and end_date):
+        return records
+    s = pd.to_datetime(start_date)
+    e = pd.to_datetime(end_date) + pd.Timedelta(days=1)
+    return [r for r in records if s <= pd.to_datetime(r['fecha']) <= e]
+
+
+def closing_summary(manager, cost_manager, start_date=None, end_date=None):
+    """Income, expenses and profit for the period in cents, as shown on the dashboard."""
+    stats = manager.get_filtered_stats(start_date, end_date)
+    total_expenses, _ = cost_manager.get_financials(start_date, end_date)
+    income = stats['total_sales'] if stats else 0
+    return {
+        "income": int(income),
+        "expenses": int(total_expenses),
+        "profit": int(income - total_expenses),
+    }
+
+
+def draw_heatmap(c, grid, x, y, cell=21):
+    """Weekday x hour grid with its counts, shaded by demand; (x, y) is the top left."""
+    top = max(int(grid.max()), 1)
+    c.setFont("Helvetica", 6)
+    for h in range(24):
+        c.drawCentredString(x + 30 + h * cell + cell / 2, y, str(h))
+    for d in range(7):
+        row_y = y - 6 - (d + 1) * cell
+        c.setFillColor(Color(0, 0, 0))
+        c.setFont("Helvetica", 8)
+        c.drawString(x, row_y + cell / 3, WEEKDAY_LABELS[d])
+        c.setFont("Helvetica", 6)
+        for h in range(24):
+            n = int(grid[d, h])
+            t = n / top
+            c.setFillColor(Color(1, 1 - 0.55 * t, 1 - 0.85 * t))
+            c.rect(x + 30 + h * cell, row_y, cell - 1, cell - 1, stroke=0, fill=1)
+            if n:
+                c.setFillColor(Color(0, 0, 0))
+                c.drawCentredString(x + 30 + h * cell + cell / 2, row_y + cell / 3, str(n))
+    c.setFillColor(Color(0, 0, 0))
+
+
+def generate_closing_pdf(manager, cost_manager, start_date=None, end_date=None, filename=None):
+    s_date, e_date = closing_label(start_date, end_date)
+    filename = filename or closing_filename(start_date, end_date, "pdf")
+    summary = closing_summary(manager, cost_manager, start_date, end_date)
+
+    c = canvas.Canvas(filename, pagesize=letter)
+    width, height = letter
+
+    # Header
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(50, height - 50, f"Cevichería YAFRANK - Reporte de Cierre")
+    c.setFont("Helvetica", 12)
+    c.drawString(50, height - 70, f"Periodo: {s_date} al {e_date}")
+    c.line(50, height - 80, width - 50, height - 80)
+
+    # Financials
+    c.drawString(50, height - 110, f"Ingresos Totales: {fmt(summary['income'])}")
+    c.drawString(50, height - 130, f"Egresos Totales: {fmt(summary['expenses'])}")
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, height - 160, f"Utilidad Neta: {fmt(summary['profit'])}")
+
+    # --- Detail Sections ---
+    y_pos = height - 200
+
+    # Sales Detail
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(50, y_pos, "Detalle de Ventas")
+    y_pos -= 20
+    c.setFont("Helvetica", 8)
+    # Ventas: ID | Fecha | Cliente | Plato | Cant. | Precio Plato | Total.
+    # X: ID(30), Fecha(60), Cliente(140), Plato(260), Cant(380), Price(420), Total(480)
+    c.drawString(30, y_pos, "ID")
+    c.drawString(60, y_pos, "Fecha")
+    c.drawString(140, y_pos, "Cliente")
+    c.drawString(260, y_pos, "Plato")
+    c.drawString(380, y_pos, "Cant.")
+    c.drawString(420, y_pos, "P.Unit")
+    c.drawString(480, y_pos, "Total")
+    y_pos -= 15
+
+    sales_data = filter_by_range(manager.orders, start_date, end_date)
+
+    for o in sales_data[:50]: # Expanded limit
+        # Truncate strings
+        d_str = str(o['fecha'])[:10]
+        cli = o['cliente'][:15]
+        pla = o['plato'][:15]
+
+        c.drawString(30, y_pos, str(o['id']))
+        c.drawString(60, y_pos, d_str)
+        c.drawString(140, y_pos, cli)
+        c.drawString(260, y_pos, pla)
+        c.drawString(380, y_pos, str(o['cantidad']))
+        c.drawString(420, y_pos, fmt_plain(o['precio']))
+        c.drawString(480, y_pos, fmt_plain(o['subtotal']))
+
+        y_pos -= 12
+        if y_pos < 100:
+            c.showPage()
+            y_pos = height - 50
+            c.setFont("Helvetica", 8)
+
+    y_pos -= 30
+    if y_pos < 100:
+        c.showPage()
+        y_pos = height - 50
+
+    # Expenses Detail
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(50, y_pos, "Detalle de Gastos")
+    y_pos -= 20
+    c.setFont("Helvetica", 8)
+    # Gastos: ID | Fecha | Insumo | Cant. | Precio Insumo | Total.
+    # X: ID(30), Fecha(60), Insumo(140), Cant(300), Price(350), Total(420)
+    c.drawString(30, y_pos, "ID")
+    c.drawString(60, y_pos, "Fecha")
+    c.drawString(140, y_pos, "Insumo")
+    c.drawString(300, y_pos, "Cant.")
+    c.drawString(350, y_pos, "P.Unit")
+    c.drawString(420, y_pos, "Total")
+    y_pos -= 15
+
+    exp_data = filter_by_range(cost_manager.expenses, start_date, end_date)
+
+    for x in exp_data[:50]:
+        d_str = str(x['fecha'])[:10]
+        item = x['item'][:20]
+
+        c.drawString(30, y_pos, str(x['id']))
+        c.drawString(60, y_pos, d_str)
+        c.drawString(140, y_pos, item)
+        c.drawString(300, y_pos, str(x['cantidad']))
+        c.drawString(350, y_pos, fmt_plain(x['precio_unit']))
+        c.drawString(420, y_pos, fmt_plain(x['total']))
+
+        y_pos -= 12
+        if y_pos < 100:
+            c.showPage()
+            y_pos = height - 50
+            c.setFont("Helvetica", 8)
+
+    # Weekday x hour demand, on its own page
+    c.showPage()
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, height - 50, "Demanda por Día y Hora (líneas de pedido)")
+    draw_heatmap(c, demand_heatmap(manager, start_date, end_date), 50, height - 80)
+
+    # Summary Footer
+    c.setFont("Helvetica", 9)
+    c.drawString(50, 30, "Generado automáticamente por YAFRANK System ERP")
+
+    c.save()
+    return filename
+
+
+def generate_closing_xlsx(manager, cost_manager, start_date=None, end_date=None, filename=None):
+    s_date, e_date = closing_label(start_date, end_date)
+    filename = filename or closing_filename(start_date, end_date, "xlsx")
+    summary = closing_summary(manager, cost_manager, start_date, end_date)
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Resumen"
+    ws.append(["Periodo", f"{s_date} al {e_date}"])
+    ws.append(["Ingresos Totales", to_soles(summary['income'])])
+    ws.append(["Egresos Totales", to_soles(summary['expenses'])])
+    ws.append(["Utilidad Neta", to_soles(summary['profit'])])
+
+    ws_sales = wb.create_sheet("Ventas")
+    ws_sales.append(["ID", "Fecha", "Cliente", "Plato", "Cant.", "Precio Unit.", "Total", "Método Pago", "Entregado", "Pagado"])
+    for o in filter_by_range(manager.orders, start_date, end_date):
+        ws_sales.append([
+            o['id'], o['fecha'], o['cliente'], o['plato'], o['cantidad'], to_soles(o['precio']),
+            to_soles(o['subtotal']), o.get('metodo_pago', 'Efectivo'),
+            "Si" if o['entregado'] else "No", "Si" if o['pagado'] else "No"
+        ])
+
+    ws_exp = wb.create_sheet("Gastos")
+    ws_exp.append(["ID", "Fecha", "Insumo", "Cantidad", "Costo Unit.", "Total"])
+    for x in filter_by_range(cost_manager.expenses, start_date, end_date):
+        ws_exp.append([x['id'], x['fecha'], x['item'], x['cantidad'], to_soles(x['precio_unit']), to_soles(x['total'])])
+
+    ws_heat = wb.create_sheet("Demanda Día-Hora")
+    ws_heat.append(["Día"] + list(range(24)))
+    for label, row in zip(WEEKDAY_LABELS, demand_heatmap(manager, start_date, end_date).tolist()):
+        ws_heat.append([label] + row)
+    ws_heat.conditional_formatting.add("B2:Y8", ColorScaleRule(start_type="min", start_color="FFFFFF",
+                                                               end_type="max", end_color="F4511E"))
+
+    wb.save(filename)
+    return filename
@@ -0,0 +1,179 @@
+"""Per-supply purchase rollups: how much of each item was bought, when and at what price.
+
+For every item the store keeps, updated from the expense events:
+
+    weekly[item][monday]     [quantity, spend, purchases]
+    monthly[item]["YYYY-MM"] [quantity, spend, purchases]
+    totals[item]             [quantity, spend, purchases]
+
+plus the item's purchases as sorted (fecha, id, unit price) tuples, so
+the latest price survives deletes and date edits. Spend and prices are
+int cents, like the expenses themselves. An expense moves a
+handful of cells (O(1) plus a bisect), and the panels read dicts instead
+of scanning years of purchases.
+
+`summary()` puts the average and latest unit price next to the catalog
+price in costos.json: when the last purchase was booked at a different
+price than today's catalog (a price edit since, or an imported
+purchase), the change is reported. Cents compare exactly, so no
+tolerance is needed.
+"""
+import bisect
+import threading
+from datetime import date, timedelta
+
+import pandas as pd
+
+import events
+from managers import change
+
+
+def week_of(fecha):
+    s = str(fecha)
+    d = date(int(s[0:4]), int(s[5:7]), int(s[8:10]))
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+def month_of(fecha):
+    return str(fecha)[:7]
+
+
+class SupplyRollups:
+    def __init__(self):
+        self.weekly = {}
+        self.monthly = {}
+        self.totals = {}
+        # item -> sorted [(fecha, id, precio_unit)]
+        self._prices = {}
+        self._lock = threading.RLock()
+        self._manager = None
+
+    def attach(self, cost_manager):
+        self._manager = cost_manager
+        self.rebuild(cost_manager.expenses)
+        cost_manager.bus.add_listener(self.on_event)
+        return self
+
+    # --- building ---
+
+    def rebuild(self, expenses):
+        """Recompute every rollup from a list of expenses."""
+        df = pd.DataFrame(expenses, columns=['id', 'fecha', 'item', 'cantidad', 'precio_unit', 'total'])
+        weekly, monthly, totals, prices = {}, {}, {}, {}
+        if not df.empty:
+            fecha = df['fecha'].astype(str)
+            day = pd.to_datetime(fecha.str[:10], format="%Y-%m-%d")
+            df = df.assign(fecha=fecha,
+                           semana=(day - pd.to_timedelta(day.dt.dayofweek, unit='D')).dt.strftime("%Y-%m-%d"),
+                           mes=fecha.str[:7])
+            for table, key in ((weekly, 'semana'), (monthly, 'mes')):
+                grouped = df.groupby(['item', key]).agg(q=('cantidad', 'sum'), s=('total', 'sum'), n=('id', 'size'))
+                for (item, period), q, s, n in zip(grouped.index, grouped['q'].tolist(), grouped['s'].tolist(),
+                                                   grouped['n'].tolist()):
+                    table.setdefault(item, {})[period] = [q, int(s), n]
+            for item, cells in monthly.items():
+                totals[item] = [sum(c[0] for c in cells.values()), sum(c[1] for c in cells.values()),
+                                sum(c[2] for c in cells.values())]
+            df = df.sort_values(['item', 'fecha', 'id'], kind='stable')
+            for item, g in df.groupby('item', sort=False):
+                prices[item] = list(zip(g['fecha'].tolist(), g['id'].tolist(), g['precio_unit'].astype('int64').tolist()))
+        with self._lock:
+            self.weekly, self.monthly, self.totals, self._prices = weekly, monthly, totals, prices
+
+    def add(self, e, sign=1):
+        """Count (sign=1) or uncount (sign=-1) one expense."""
+        item, fecha = e['item'], str(e['fecha'])
+        qty, spend = sign * e['cantidad'], sign * e['total']
+        with self._lock:
+            for table, period in ((self.weekly, week_of(fecha)), (self.monthly, month_of(fecha))):
+                cells = table.setdefault(item, {})
+                cell = cells.setdefault(period, [0.0, 0, 0])
+                cell[0] += qty
+                cell[1] += spend
+                cell[2] += sign
+                if cell[2] <= 0:
+                    del cells[period]
+            total = self.totals.setdefault(item, [0.0, 0, 0])
+            total[0] += qty
+            total[1] += spend
+            total[2] += sign
+            prices = self._prices.setdefault(item, [])
+            entry = (fecha, e['id'], int(e['precio_unit']))
+            if sign > 0:
+                bisect.insort(prices, entry)
+            else:
+                i = bisect.bisect_left(prices, entry)
+                if i < len(prices) and prices[i] == entry:
+                    del prices[i]
+            if total[2] <= 0:
+                for table in (self.weekly, self.monthly, self.totals, self._prices):
+                    table.pop(item, None)
+
+    def on_event(self, event):
+        t, d = event.topic, event.data
+        if t == events.EXPENSE_ADDED:
+            for e in d['expenses']:
+                self.add(e)
+        elif t == events.EXPENSE_DELETED:
+            self.add(d['expense'], -1)
+        elif t == events.EXPENSE_DATE_CHANGED:
+            self.add(d['previous'], -1)
+            self.add(d['expense'])
+        elif t == events.RESYNC and d.get('store') != "pedidos" and self._manager is not None:
+            self.rebuild(self._manager.expenses)
+
+    # --- queries ---
+
+    def summary(self, item=None):
+        """Totals and prices per item, biggest spend first (or one item's dict)."""
+        catalog = self._manager.cost_dict if self._manager is not None else {}
+        with self._lock:
+            names = [item] if item is not None else list(self.totals)
+            out = []
+            for name in names:
+                total = self.totals.get(name)
+                if total is None:
+                    continue
+                fecha, _, latest = self._prices[name][-1]
+                listed = catalog.get(name)
+                diff = change(latest, listed) if listed is not None and latest != listed else None
+                out.append({
+                    "insumo": name,
+                    "cantidad": total[0],
+                    "gasto": total[1],
+                    "compras": total[2],
+                    "precio_promedio": total[1] / total[0] if total[0] else 0.0,
+                    "ultimo_precio": latest,
+                    "ultima_compra": fecha,
+                    "precio_catalogo": listed,
+                    "cambio_precio": diff,
+                })
+        if item is not None:
+            return out[0] if out else None
+        return sorted(out, key=lambda r: r["gasto"], reverse=True)
+
+    def price_changes(self):
+        """Items whose last purchase price differs from the catalog, largest change first."""
+        changed = [r for r in self.summary() if r["cambio_precio"] is not None]
+        return sorted(changed, key=lambda r: abs(r["cambio_precio"]["pct"] or 0), reverse=True)
+
+    def series(self, item, freq="M", start=None, end=None):
+        """[(period, quantity, spend, average unit price)] for one item, oldest first (cents).
+
+        freq "W" keys periods by their Monday, "M" by "YYYY-MM"; start/end
+        (dates or strings) bound the periods included.
+        """
+        table = self.weekly if freq == "W" else self.monthly
+        key = week_of if freq == "W" else month_of
+        lo = key(start) if start is not None else None
+        hi = key(end) if end is not None else None
+        with self._lock:
+            cells = sorted(table.get(item, {}).items())
+        return [(period, q, s, s / q if q else 0.0) for period, (q, s, _) in cells
+                if (lo is None or period >= lo) and (hi is None or period <= hi)]
+
+    def period_spend(self, period, freq="M"):
+        """{item: spend} for one week (its Monday) or month ("YYYY-MM")."""
+        table = self.weekly if freq == "W" else self.monthly
+        with self._lock:
+            return {item: cells[period][1] for item, cells in table.items() if period in cells}